@@ -32,8 +32,12 @@ class AIService:
         self._lock = threading.Lock()
         
         # 启动时自动初始化模型
-        print("AI服务已创建，准备初始化模型...")
-        self.initialize_model()
+        # 多进程部署(KYOPS_COLLECTOR_MODE=shared)时每个Web进程都会导入本模块，改为首次对话时再加载
+        if os.environ.get('KYOPS_COLLECTOR_MODE', 'embedded') == 'shared':
+            print("AI服务已创建，模型将在首次对话时加载")
+        else:
+            print("AI服务已创建，准备初始化模型...")
+            self.initialize_model()
         
     def initialize_model(self):
         """初始化AI模型"""
@@ -1,7 +1,7 @@
 import threading
 
 from extune import common
-from flask import Flask, render_template, jsonify, request, send_file, make_response, Response
+from flask import Flask, render_template, jsonify, request, send_file, make_response, Response, g
 import psutil
 import platform
 import socket
@@ -11,87 +11,184 @@ import json
 import time
 import shutil
 import re
+import hashlib
 from datetime import datetime, timedelta
 import requests
 from pathlib import Path
 
 # 导入AI服务
 from ai_service import ai_service
+from json_provider import FastJSONProvider, ResponseCompressor
 
 app = Flask(__name__)
 
 # 配置
 app.config['SECRET_KEY'] = 'your-secret-key-here'
+# 所有jsonify使用orjson加速（未安装时退回标准库），大于1KB的响应按Accept-Encoding压缩
+app.json = FastJSONProvider(app)
+response_compressor = ResponseCompressor(min_size=1024)
+
+# 采集模式：embedded 在本进程内运行采集器（默认，适用于单进程开发服务器）
+#          shared   采集器由collector_daemon.py独立运行并写入共享内存，本进程只读取，可用多进程WSGI服务器部署
+from collector_daemon import (COLLECTORS, SCHEDULER_REGION, SECURITY_REGION, SHARED_SNAPSHOT_PATH, METRICS_PATH,
+                              ROLLUP_MAX_SERIES, start_collectors, start_security_collectors)
+COLLECTOR_MODE = os.environ.get('KYOPS_COLLECTOR_MODE', 'embedded')
+
+# 实时指标历史：各采集器每个周期写入环形缓冲区，通过/api/metrics/history查询
+# 需在采集器启动前创建，保留时长和序列数上限决定内存占用上限
+# 原始样本同时汇总为10秒/1分钟/1小时精度并持久化到内存映射文件，重启后历史不丢失
+# shared模式下汇总文件由采集进程写入，本进程只读打开
+import atexit
+from extune.common.metric_store import MetricStore
+from extune.common.metric_rollup import MetricRollup
+
+metric_rollup_lock = threading.Lock()
+
+
+def open_metric_rollup():
+    '''
+        打开指标汇总文件, 失败时返回None
+    '''
+    try:
+        rollup = MetricRollup(METRICS_PATH, max_series=ROLLUP_MAX_SERIES, readonly=COLLECTOR_MODE == 'shared')
+        atexit.register(rollup.close)
+        return rollup
+    except Exception as e:
+        print(f"无法打开指标汇总文件: {e}")
+        return None
+
+
+def get_metric_rollup():
+    '''
+        shared模式下采集进程可能晚于Web进程创建汇总文件, 尚未打开时在每次查询时重试
+    '''
+    global metric_rollup
+    if metric_rollup is None and COLLECTOR_MODE == 'shared':
+        with metric_rollup_lock:
+            if metric_rollup is None:
+                metric_rollup = open_metric_rollup()
+    return metric_rollup
+
+
+metric_rollup = open_metric_rollup()
+metric_store = MetricStore(retention=24 * 3600, max_series=1000,
+                           rollup=metric_rollup if COLLECTOR_MODE != 'shared' else None)
+
+# 实时指标推送（/api/stream/metrics），同样需在采集器启动前创建
+from extune.common.metric_stream import MetricBroadcaster
+metric_broadcaster = MetricBroadcaster(max_subscribers=100, serialize=app.json.dumps_bytes)
+
+from extune.common.global_call import GlobalCall
+if COLLECTOR_MODE == 'shared':
+    from extune.common.shared_snapshot import SharedSnapshotReader
+    shared_snapshots = SharedSnapshotReader(SHARED_SNAPSHOT_PATH)
+    print(f"共享采集模式，读取采集进程快照: {SHARED_SNAPSHOT_PATH}")
+else:
+    shared_snapshots = None
+    start_collectors(interval=2)
+
+# 共享进程表：由RealTimeCPU每个采集周期刷新，各接口只读取缓存结果
+# 实时采集未运行时，超过PROCESS_TABLE_MAX_AGE秒才重新扫描一次/proc
+from extune.common.process_table import ProcessTable
+process_table = ProcessTable()
+PROCESS_TABLE_MAX_AGE = 2
+
+# 各实时采集器由同一个调度器按固定频率触发，运行记录通过/api/collectors查询
+from extune.common.collector_scheduler import CollectorScheduler
+
+# 实时采集数据不可用时的psutil后备采样：embedded模式下后台周期采样，shared模式下由接口在结果过期时采样
+from extune.common.psutil_sampler import PsutilCpuSampler
+cpu_fallback_sampler = PsutilCpuSampler()
+
+
+def sync_shared_snapshots():
+    """shared模式：读取采集进程新写入的快照，更新GlobalCall并推送给本进程的订阅者"""
+    for name, attr, topic in COLLECTORS:
+        snapshot = shared_snapshots.read(name)
+        if snapshot is None:
+            continue
+        setattr(GlobalCall, attr, snapshot)
+        if topic is not None:
+            metric_broadcaster.publish(topic, snapshot.seq, snapshot)
+
+
+if COLLECTOR_MODE == 'shared':
+    # 只读取共享内存，不在每个Web进程中重复采样
+    CollectorScheduler().register('SharedSnapshotSync', sync_shared_snapshots, 0.5)
+else:
+    CollectorScheduler().register('PsutilCpuSampler', cpu_fallback_sampler.sample, 2)
+CollectorScheduler().start()
+
+# 采集器以带序号的只读快照发布数据，轮询接口按快照序号缓存序列化结果并支持ETag/304
+from extune.common.snapshot import Snapshot, SerializedCache, snapshot_key
+response_cache = SerializedCache()
+
+
+def serialize_json(data):
+    """序列化为JSON字节（与jsonify使用同一编码器）"""
+    return app.json.dumps_bytes(data)
+
+
+def snapshot_response(name, key, build):
+    """返回缓存的JSON响应；key为None（采集未运行）时每次重新构建且不带ETag"""
+    body, etag = response_cache.get(name, key, lambda: serialize_json(build()))
+    response = Response(body, mimetype='application/json')
+    if etag is not None:
+        response.set_etag(etag)
+        # 浏览器每次都需携带If-None-Match重新验证
+        response.headers['Cache-Control'] = 'no-cache'
+        response.make_conditional(request)
+    return response
+
+
+# 请求合并：路径和查询参数相同的请求并发到达时只执行一次，其余请求等待并共享结果；
+# ttl大于0时结果在完成后继续复用ttl秒，用于执行外部命令或遍历全部连接等开销较大的接口
+from functools import wraps
+from extune.common.single_flight import SingleFlight
+request_coalescer = SingleFlight()
 
-# 初始化实时CPU监控
-try:
-    from extune.category.get_cpu_info import RealTimeCPU
-    from extune.common.global_call import GlobalCall
-    real_time_cpu_monitor = RealTimeCPU(interval=2)
-    real_time_cpu_monitor.start_broadcasting()
-    print("CPU实时监控已启动")
-except ImportError as e:
-    print(f"无法导入实时CPU监控: {e}")
-    real_time_cpu_monitor = None
-except Exception as e:
-    print(f"启动实时CPU监控失败: {e}")
-    real_time_cpu_monitor = None
-
-# 初始化实时内存监控
-try:
-    from extune.category.get_memory_info import RealTimeMemory
-    from extune.common.global_call import GlobalCall
-    real_time_memory_monitor = RealTimeMemory(interval=2)
-    real_time_memory_monitor.start_broadcasting()
-    print("内存实时监控已启动")
-except ImportError as e:
-    print(f"无法导入实时内存监控: {e}")
-    real_time_memory_monitor = None
-except Exception as e:
-    print(f"启动实时内存监控失败: {e}")
-    real_time_memory_monitor = None
-
-# 初始化实时网络监控
-try:
-    from extune.category.get_net_info import RealTimeNet
-    from extune.common.global_call import GlobalCall
-    real_time_net_monitor = RealTimeNet(interval=2)
-    real_time_net_monitor.start_broadcasting()
-    print("网络实时监控已启动")
-except ImportError as e:
-    print(f"无法导入实时网络监控: {e}")
-    real_time_net_monitor = None
-except Exception as e:
-    print(f"启动实时网络监控失败: {e}")
-    real_time_net_monitor = None
-
-# 初始化实时磁盘监控
-try:
-    from extune.category.get_disk_info import RealTimeDisk
-    from extune.common.global_call import GlobalCall
-    real_time_disk_monitor = RealTimeDisk(interval=2)
-    real_time_disk_monitor.start_broadcasting()
-    print("磁盘实时监控已启动")
-except ImportError as e:
-    print(f"无法导入实时磁盘监控: {e}")
-    real_time_disk_monitor = None
-except Exception as e:
-    print(f"启动实时磁盘监控失败: {e}")
-    real_time_disk_monitor = None
-
-try:
-    from extune.category.get_system_message import RealTimeSysMessage
-    from extune.common.global_call import GlobalCall
-    real_time_sys_message_monitor = RealTimeSysMessage(interval=2)
-    real_time_sys_message_monitor.start_broadcasting()
-    print("系统消息实时监控已启动")
-except ImportError as e:
-    print(f"无法导入系统消息实时监控: {e}")
-    real_time_sys_message_monitor = None
-except Exception as e:
-    print(f"启动系统消息实时监控失败: {e}")
-    real_time_sys_message_monitor = None
 
+def coalesce_request(ttl=0):
+    """合并相同请求的装饰器，放在@app.route之下；5xx响应只与并发请求共享，不保留"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            def run():
+                response = app.make_response(view(*args, **kwargs))
+                return response.get_data(), response.status_code, list(response.headers.items())
+            # 每个请求使用独立的Response对象，after_request中的修改互不影响
+            body, status, headers = request_coalescer.do(
+                request.method + ' ' + request.full_path, run, ttl,
+                cacheable=lambda result: result[1] < 500)
+            return Response(body, status=status, headers=headers)
+        return wrapper
+    return decorator
+
+
+# 请求统计：记录各路由的耗时分布、进行中请求数、响应大小和错误数，通过/api/internal/request-stats查询
+# 最先注册的after_request最后执行，记录的是压缩后的响应大小
+from extune.common.request_metrics import RequestMetrics
+request_metrics = RequestMetrics()
+
+
+@app.before_request
+def begin_request_metrics():
+    rule = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+    g.metrics_key = '{} {}'.format(request.method, rule)
+    g.metrics_start = request_metrics.begin(g.metrics_key)
+
+
+@app.after_request
+def end_request_metrics(response):
+    if 'metrics_start' in g:
+        request_metrics.end(g.metrics_key, g.metrics_start, response.status_code, response.content_length)
+    return response
+
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    if 'metrics_start' in g:
+        request_metrics.finish(g.metrics_key)
 
 
 # 添加CORS支持
@@ -102,6 +199,12 @@ def after_request(response):
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
     return response
 
+
+# 响应压缩
+@app.after_request
+def compress_response(response):
+    return response_compressor(request, response)
+
 def get_external_ip():
     """获取外部IP地址"""
     try:
@@ -148,10 +251,190 @@ def format_uptime(seconds):
     else:
         return f"{minutes}分钟"
 
+EXTUNE_DATA_PATH = os.path.join(os.path.dirname(__file__), 'extune', 'extunerData')
+
+
+def read_extune_file(file_name):
+    """读取extune输出的数据文件，不存在时返回None"""
+    file_path = os.path.join(EXTUNE_DATA_PATH, file_name)
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def load_cpu_facts():
+    """解析CPU信息"""
+    result = {}
+    cpu_content = read_extune_file('CPUInfo.txt')
+    if cpu_content is None:
+        return result
+
+    # 提取CPU型号
+    cpu_match = re.search(r'Model name:\s*(.+)', cpu_content)
+    if cpu_match:
+        result['cpu_model'] = cpu_match.group(1).strip()
+
+    # 提取CPU架构
+    arch_match = re.search(r'Architecture:\s*(.+)', cpu_content)
+    if arch_match:
+        result['cpu_architecture'] = arch_match.group(1).strip()
+
+    # 提取CPU核心数
+    cpu_count_match = re.search(r'CPU\(s\):\s*(\d+)', cpu_content)
+    if cpu_count_match:
+        result['cpu_count'] = int(cpu_count_match.group(1))
+    return result
+
+
+def load_memory_facts():
+    """解析内存信息"""
+    result = {}
+    mem_content = read_extune_file('memInfo.txt')
+    if mem_content is None:
+        return result
+
+    # 提取总内存
+    mem_total_match = re.search(r'MemTotal:\s*(\d+)\s*kB', mem_content)
+    if mem_total_match:
+        mem_kb = int(mem_total_match.group(1))
+        mem_bytes = mem_kb * 1024
+        result['memory_total'] = format_bytes(mem_bytes)
+
+    # 提取空闲内存
+    mem_free_match = re.search(r'MemFree:\s*(\d+)\s*kB', mem_content)
+    if mem_free_match:
+        mem_free_kb = int(mem_free_match.group(1))
+        mem_free_bytes = mem_free_kb * 1024
+        result['memory_free'] = format_bytes(mem_free_bytes)
+    return result
+
+
+def load_disk_facts():
+    """解析磁盘信息"""
+    result = {}
+    disk_content = read_extune_file('diskInfo.txt')
+    if disk_content is None:
+        return result
+
+    # 提取磁盘总容量
+    disk_match = re.search(r'Disk /dev/sda: ([\d.]+) GiB', disk_content)
+    if disk_match:
+        disk_gb = float(disk_match.group(1))
+        disk_bytes = int(disk_gb * 1024 * 1024 * 1024)
+        result['disk_total'] = format_bytes(disk_bytes)
+        result['disk_info'] = f"sda: {disk_gb} GiB"
+    return result
+
+
+def load_network_facts():
+    """解析网络信息"""
+    result = {}
+    net_content = read_extune_file('netInfo.txt')
+    if net_content is None:
+        return result
+
+    # 提取网络接口信息
+    interface_match = re.search(r'NAME\s+UUID\s+TYPE\s+DEVICE\s*\n(\w+)', net_content)
+    if interface_match:
+        result['network_info'] = interface_match.group(1)
+
+    # 提取内部IP（从网络配置中获取）
+    # 这里需要根据实际的网络配置格式调整
+    ip_match = re.search(r'inet (192\.168\.\d+\.\d+)', net_content)
+    if ip_match:
+        result['internal_ip'] = ip_match.group(1)
+    return result
+
+
+def load_sys_param_facts():
+    """解析系统参数信息"""
+    result = {}
+    sys_content = read_extune_file('sysParamInfo.txt')
+    if sys_content is None:
+        return result
+
+    # 从sysctl输出中提取主机名
+    hostname_match = re.search(r'kernel\.hostname = (.+)', sys_content)
+    if hostname_match:
+        result['hostname'] = hostname_match.group(1).strip()
+
+    # 从sysctl输出中提取内核版本
+    kernel_match = re.search(r'kernel\.osrelease = (.+)', sys_content)
+    if kernel_match:
+        result['kernel_version'] = kernel_match.group(1).strip()
+
+    # 从sysctl输出中提取操作系统类型
+    os_match = re.search(r'kernel\.ostype = (.+)', sys_content)
+    if os_match:
+        result['system_name'] = os_match.group(1).strip()
+
+    # 尝试获取更详细的系统版本信息
+    kylin_match = re.search(r'kernel\.kylinversion = (.+)', sys_content)
+    if kylin_match:
+        result['os_version'] = kylin_match.group(1).strip()
+    return result
+
+
+def load_sys_message_facts():
+    """解析系统消息以获取GCC版本"""
+    result = {}
+    sys_msg_content = read_extune_file('systemMessage.txt')
+    if sys_msg_content is None:
+        return result
+
+    # 提取GCC版本
+    gcc_match = re.search(r'gcc version ([\d.]+)', sys_msg_content)
+    if gcc_match:
+        result['gcc_version'] = gcc_match.group(1)
+    return result
+
+
+def load_glibc_facts():
+    """获取Glibc版本（需要执行命令）"""
+    try:
+        glibc_result = subprocess.run(['ldd', '--version'], capture_output=True, text=True, timeout=5)
+        if glibc_result.returncode == 0:
+            glibc_match = re.search(r'ldd \(GNU libc\) ([\d.]+)', glibc_result.stdout)
+            if glibc_match:
+                return {'glibc_version': glibc_match.group(1)}
+    except:
+        pass
+    return {'glibc_version': '未知'}
+
+
+def load_jdk_facts():
+    """获取JDK版本"""
+    try:
+        java_result = subprocess.run(['java', '-version'], capture_output=True, text=True, timeout=5)
+        if java_result.returncode == 0:
+            java_match = re.search(r'version "([^"]+)"', java_result.stderr)
+            if java_match:
+                return {'jdk_version': java_match.group(1)}
+        return {}
+    except:
+        return {'jdk_version': '未安装'}
+
+
+# 主机信息注册表：extune数据文件按修改时间失效，命令输出和外网IP按有效期在后台刷新
+from extune.common.host_facts import HostFactsRegistry
+host_facts = HostFactsRegistry()
+for fact_name, fact_loader, fact_file in (
+        ('cpu', load_cpu_facts, 'CPUInfo.txt'),
+        ('memory', load_memory_facts, 'memInfo.txt'),
+        ('disk', load_disk_facts, 'diskInfo.txt'),
+        ('network', load_network_facts, 'netInfo.txt'),
+        ('sys_param', load_sys_param_facts, 'sysParamInfo.txt'),
+        ('sys_message', load_sys_message_facts, 'systemMessage.txt')):
+    host_facts.register(fact_name, fact_loader, files=[os.path.join(EXTUNE_DATA_PATH, fact_file)], default={})
+host_facts.register('glibc', load_glibc_facts, ttl=24 * 3600, background=True, default={})
+host_facts.register('jdk', load_jdk_facts, ttl=3600, background=True, default={})
+host_facts.register('external_ip', get_external_ip, ttl=600, background=True, default='获取中')
+host_facts.prefetch()
+
+
 def parse_extune_data():
-    """解析extune输出的数据文件"""
-    extune_data_path = os.path.join(os.path.dirname(__file__), 'extune', 'extunerData')
-    
+    """解析extune输出的数据文件（各项结果由主机信息注册表缓存）"""
     result = {
         'hostname': '未知',
         'system_name': '未知',
@@ -175,137 +458,11 @@ def parse_extune_data():
     }
     
     try:
-        # 解析CPU信息
-        cpu_file = os.path.join(extune_data_path, 'CPUInfo.txt')
-        if os.path.exists(cpu_file):
-            with open(cpu_file, 'r', encoding='utf-8') as f:
-                cpu_content = f.read()
-                
-                # 提取CPU型号
-                cpu_match = re.search(r'Model name:\s*(.+)', cpu_content)
-                if cpu_match:
-                    result['cpu_model'] = cpu_match.group(1).strip()
-                
-                # 提取CPU架构
-                arch_match = re.search(r'Architecture:\s*(.+)', cpu_content)
-                if arch_match:
-                    result['cpu_architecture'] = arch_match.group(1).strip()
-                
-                # 提取CPU核心数
-                cpu_count_match = re.search(r'CPU\(s\):\s*(\d+)', cpu_content)
-                if cpu_count_match:
-                    result['cpu_count'] = int(cpu_count_match.group(1))
-        
-        # 解析内存信息
-        mem_file = os.path.join(extune_data_path, 'memInfo.txt')
-        if os.path.exists(mem_file):
-            with open(mem_file, 'r', encoding='utf-8') as f:
-                mem_content = f.read()
-                
-                # 提取总内存
-                mem_total_match = re.search(r'MemTotal:\s*(\d+)\s*kB', mem_content)
-                if mem_total_match:
-                    mem_kb = int(mem_total_match.group(1))
-                    mem_bytes = mem_kb * 1024
-                    result['memory_total'] = format_bytes(mem_bytes)
-                
-                # 提取空闲内存
-                mem_free_match = re.search(r'MemFree:\s*(\d+)\s*kB', mem_content)
-                if mem_free_match:
-                    mem_free_kb = int(mem_free_match.group(1))
-                    mem_free_bytes = mem_free_kb * 1024
-                    result['memory_free'] = format_bytes(mem_free_bytes)
-        
-        # 解析磁盘信息
-        disk_file = os.path.join(extune_data_path, 'diskInfo.txt')
-        if os.path.exists(disk_file):
-            with open(disk_file, 'r', encoding='utf-8') as f:
-                disk_content = f.read()
-                
-                # 提取磁盘总容量
-                disk_match = re.search(r'Disk /dev/sda: ([\d.]+) GiB', disk_content)
-                if disk_match:
-                    disk_gb = float(disk_match.group(1))
-                    disk_bytes = int(disk_gb * 1024 * 1024 * 1024)
-                    result['disk_total'] = format_bytes(disk_bytes)
-                    result['disk_info'] = f"sda: {disk_gb} GiB"
-        
-        # 解析网络信息
-        net_file = os.path.join(extune_data_path, 'netInfo.txt')
-        if os.path.exists(net_file):
-            with open(net_file, 'r', encoding='utf-8') as f:
-                net_content = f.read()
-                
-                # 提取网络接口信息
-                interface_match = re.search(r'NAME\s+UUID\s+TYPE\s+DEVICE\s*\n(\w+)', net_content)
-                if interface_match:
-                    result['network_info'] = interface_match.group(1)
-                
-                # 提取内部IP（从网络配置中获取）
-                # 这里需要根据实际的网络配置格式调整
-                ip_match = re.search(r'inet (192\.168\.\d+\.\d+)', net_content)
-                if ip_match:
-                    result['internal_ip'] = ip_match.group(1)
-        
-        # 解析系统参数信息
-        sys_file = os.path.join(extune_data_path, 'sysParamInfo.txt')
-        if os.path.exists(sys_file):
-            with open(sys_file, 'r', encoding='utf-8') as f:
-                sys_content = f.read()
-                
-                # 从sysctl输出中提取主机名
-                hostname_match = re.search(r'kernel\.hostname = (.+)', sys_content)
-                if hostname_match:
-                    result['hostname'] = hostname_match.group(1).strip()
-                
-                # 从sysctl输出中提取内核版本
-                kernel_match = re.search(r'kernel\.osrelease = (.+)', sys_content)
-                if kernel_match:
-                    result['kernel_version'] = kernel_match.group(1).strip()
-                
-                # 从sysctl输出中提取操作系统类型
-                os_match = re.search(r'kernel\.ostype = (.+)', sys_content)
-                if os_match:
-                    result['system_name'] = os_match.group(1).strip()
-                
-                # 尝试获取更详细的系统版本信息
-                kylin_match = re.search(r'kernel\.kylinversion = (.+)', sys_content)
-                if kylin_match:
-                    result['os_version'] = kylin_match.group(1).strip()
-        
-        # 解析系统消息以获取GCC版本
-        sys_msg_file = os.path.join(extune_data_path, 'systemMessage.txt')
-        if os.path.exists(sys_msg_file):
-            with open(sys_msg_file, 'r', encoding='utf-8') as f:
-                sys_msg_content = f.read()
-                
-                # 提取GCC版本
-                gcc_match = re.search(r'gcc version ([\d.]+)', sys_msg_content)
-                if gcc_match:
-                    result['gcc_version'] = gcc_match.group(1)
-        
-        # 尝试获取Glibc版本（通常需要执行命令）
-        try:
-            glibc_result = subprocess.run(['ldd', '--version'], capture_output=True, text=True, timeout=5)
-            if glibc_result.returncode == 0:
-                glibc_match = re.search(r'ldd \(GNU libc\) ([\d.]+)', glibc_result.stdout)
-                if glibc_match:
-                    result['glibc_version'] = glibc_match.group(1)
-        except:
-            result['glibc_version'] = '未知'
-        
-        # 尝试获取JDK版本
-        try:
-            java_result = subprocess.run(['java', '-version'], capture_output=True, text=True, timeout=5)
-            if java_result.returncode == 0:
-                java_match = re.search(r'version "([^"]+)"', java_result.stderr)
-                if java_match:
-                    result['jdk_version'] = java_match.group(1)
-        except:
-            result['jdk_version'] = '未安装'
-        
-        # 获取外部IP（实时获取）
-        result['external_ip'] = get_external_ip()
+        for fact_name in ('cpu', 'memory', 'disk', 'network', 'sys_param', 'sys_message', 'glibc', 'jdk'):
+            result.update(host_facts.get(fact_name))
+
+        # 获取外部IP（后台定期刷新，直接取最近一次结果）
+        result['external_ip'] = host_facts.get('external_ip')
         
         # 计算运行天数（使用psutil获取）
         try:
@@ -392,191 +549,188 @@ def get_system_info_json():
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/system-status')
-def system_status():
-    """获取系统状态信息（使用实时CPU数据）"""
-    try:
-        # 从全局广播获取CPU数据
-        cpu_data = GlobalCall.real_time_cpu_data
-        if not cpu_data:
-            # 如果实时数据不可用，使用psutil作为后备
-            cpu_percent = psutil.cpu_percent(interval=1)
-            cpu_percent_per_core = [psutil.cpu_percent(interval=1, percpu=True)[i] for i in range(psutil.cpu_count())]
-            cpu_count = psutil.cpu_count()
-            cpu_name = f"Unknown CPU ({cpu_count} cores)"
-            load_avg = psutil.getloadavg() if hasattr(psutil, 'getloadavg') else [0, 0, 0]
-            cpu_freq = psutil.cpu_freq().current if hasattr(psutil, 'cpu_freq') else 0
-            logical_cpu_count = psutil.cpu_count(logical=True)
-            usr = 0
-            nice = 0
-            sys = 0
-            iowait = 0
-            irq = 0
-            soft = 0
-            steal = 0
-            guest = 0
-            gnice = 0
-            idle = 0
-            # 进程信息
-            processes = []
-            for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
-                try:
-                    proc_info = proc.info
-                    if proc_info['cpu_percent'] > 0 or proc_info['memory_percent'] > 0:
-                        processes.append(proc_info)
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    continue
-
-            # 按CPU使用率排序，取前10个
-            top_processes = sorted(processes, key=lambda x: x['cpu_percent'] or 0, reverse=True)[:10]
+def build_system_status(cpu_data, memory_data, net_data, disk_data, now):
+    """根据各采集器快照整合系统状态数据；快照为空时使用psutil作为后备"""
+    if not cpu_data:
+        # 如果实时数据不可用，使用psutil作为后备
+        cpu_percent, cpu_percent_per_core = cpu_fallback_sampler.get()
+        cpu_count = psutil.cpu_count()
+        cpu_name = f"Unknown CPU ({cpu_count} cores)"
+        load_avg = psutil.getloadavg() if hasattr(psutil, 'getloadavg') else [0, 0, 0]
+        cpu_freq = psutil.cpu_freq().current if hasattr(psutil, 'cpu_freq') else 0
+        logical_cpu_count = psutil.cpu_count(logical=True)
+        usr = 0
+        nice = 0
+        sys = 0
+        iowait = 0
+        irq = 0
+        soft = 0
+        steal = 0
+        guest = 0
+        gnice = 0
+        idle = 0
+        # 进程信息：读取共享进程表，取CPU占用前10的进程
+        top_processes = process_table.top(10, max_age=PROCESS_TABLE_MAX_AGE)
 
-        else:
-            # 使用RealTimeCPU提供的数据
-            cpu_percent = cpu_data['total_usage']
-            cpu_percent_per_core = cpu_data['core_usage']
-            cpu_count = cpu_data['cpu_count']
-            cpu_name = cpu_data['model_name']
-            load_avg = cpu_data['load_avg']
-            cpu_freq = cpu_data['cpu_freq']
-            logical_cpu_count = cpu_data['logical_cpu_count']
-            top_processes = cpu_data['top_processes']
-            usr = cpu_data['usr']
-            nice = cpu_data['nice']
-            sys = cpu_data['sys']
-            iowait = cpu_data['iowait']
-            irq = cpu_data['irq']
-            soft = cpu_data['soft']
-            steal = cpu_data['steal']
-            guest = cpu_data['guest']
-            gnice = cpu_data['gnice']
-            idle = cpu_data['idle']
-
-        # 从全局广播获取内存数据
-        memory_data = GlobalCall.real_time_mem_data
-        if not memory_data:
-            # 如果实时内存数据不可用，使用psutil作为后备
-            memory = psutil.virtual_memory()
-            swap = psutil.swap_memory()
-        else:
-            # 使用RealTimeMemory提供的数据
-            memory = type('obj', (object,), {
-                'total': memory_data['mem_total'],
-                'used': memory_data['mem_used'],
-                'free': memory_data['mem_free'],
-                'percent': memory_data['mem_percent'],
-                'cached': memory_data['mem_cached'],
-                'buffers': memory_data['mem_buffers']
-            })()
-            swap = type('obj', (object,), {
-                'total': memory_data['swap_total'],
-                'used': memory_data['swap_used'],
-                'free': memory_data['swap_free'],
-                'percent': memory_data['swap_percent']
-            })()
-
-        # 网络详细信息 - 从全局广播获取网络数据
-        net_data = GlobalCall.real_time_net_data
-        if not net_data:
-            # 如果实时网络数据不可用，使用psutil作为后备
-            net_io = psutil.net_io_counters()
-            net_interfaces = {}
-            rx_speed = 0.0
-            tx_speed = 0.0
-        else:
-            # 使用RealTimeNet提供的数据
-            net_io = net_data.get('net_io', {})
-            net_interfaces = net_data.get('net_interfaces', {})
-            rx_speed = net_data.get('total_rx_speed', 0.0)
-            tx_speed = net_data.get('total_tx_speed', 0.0)
+    else:
+        # 使用RealTimeCPU提供的数据
+        cpu_percent = cpu_data['total_usage']
+        cpu_percent_per_core = cpu_data['core_usage']
+        cpu_count = cpu_data['cpu_count']
+        cpu_name = cpu_data['model_name']
+        load_avg = cpu_data['load_avg']
+        cpu_freq = cpu_data['cpu_freq']
+        logical_cpu_count = cpu_data['logical_cpu_count']
+        top_processes = cpu_data['top_processes']
+        usr = cpu_data['usr']
+        nice = cpu_data['nice']
+        sys = cpu_data['sys']
+        iowait = cpu_data['iowait']
+        irq = cpu_data['irq']
+        soft = cpu_data['soft']
+        steal = cpu_data['steal']
+        guest = cpu_data['guest']
+        gnice = cpu_data['gnice']
+        idle = cpu_data['idle']
+
+    if not memory_data:
+        # 如果实时内存数据不可用，使用psutil作为后备
+        memory = psutil.virtual_memory()
+        swap = psutil.swap_memory()
+    else:
+        # 使用RealTimeMemory提供的数据
+        memory = type('obj', (object,), {
+            'total': memory_data['mem_total'],
+            'used': memory_data['mem_used'],
+            'free': memory_data['mem_free'],
+            'percent': memory_data['mem_percent'],
+            'cached': memory_data['mem_cached'],
+            'buffers': memory_data['mem_buffers']
+        })()
+        swap = type('obj', (object,), {
+            'total': memory_data['swap_total'],
+            'used': memory_data['swap_used'],
+            'free': memory_data['swap_free'],
+            'percent': memory_data['swap_percent']
+        })()
+
+    # 网络详细信息
+    if not net_data:
+        # 如果实时网络数据不可用，使用psutil作为后备
+        net_io = psutil.net_io_counters()
+        net_interfaces = {}
+        rx_speed = 0.0
+        tx_speed = 0.0
+    else:
+        # 使用RealTimeNet提供的数据
+        net_io = net_data.get('net_io', {})
+        net_interfaces = net_data.get('net_interfaces', {})
+        rx_speed = net_data.get('total_rx_speed', 0.0)
+        tx_speed = net_data.get('total_tx_speed', 0.0)
+
+
+    if not disk_data:
+        # 如果实时数据不可用，使用psutil作为后备
+        disk_usage = []
+        partitions = psutil.disk_partitions()
+        for partition in partitions:
+            try:
+                usage = psutil.disk_usage(partition.mountpoint)
+                disk_usage.append({
+                    'device': partition.device,
+                    'mountpoint': partition.mountpoint,
+                    'fstype': partition.fstype,
+                    'total': usage.total,
+                    'used': usage.used,
+                    'free': usage.free,
+                    'percent': usage.percent,
+                    'utilization': 0.0
+                })
+            except Exception:
+                continue
 
+        disk_io = psutil.disk_io_counters()
+        disk_io_data = {
+            'read_bytes': disk_io.read_bytes if disk_io else 0,
+            'write_bytes': disk_io.write_bytes if disk_io else 0,
+            'read_count': disk_io.read_count if disk_io else 0,
+            'write_count': disk_io.write_count if disk_io else 0,
+        }
+        total_utilization = psutil.disk_io_counters(perdisk=True)
+    else:
+        # 使用RealTimeDisk提供的数据
+        disk_usage = disk_data['disk_usage']
+        disk_io_data = disk_data['disk_io']
+        total_utilization = disk_data['total_utilization']
+
+
+    """整合数据"""
+    return {
+        'cpu_usage': cpu_percent,
+        'cpu_percent_per_core': cpu_percent_per_core,
+        'cpu_model': cpu_name,
+        'cpu_count': cpu_count,
+        'cpu_frequency': cpu_freq,
+        'cpu_details': {
+            'usr': usr,
+            'nice': nice,
+            'sys': sys,
+            'iowait': iowait,
+            'irq': irq,
+            'soft': soft,
+            'steal': steal,
+            'guest': guest,
+            'gnice': gnice,
+            'idle': idle
+        },
+        'logical_cpu_count': logical_cpu_count,
+        'load_avg': load_avg,
+        'top_processes': top_processes,
+        'memory_usage': memory.percent,
+        'memory_total': {  # 内存信息
+            'memory_percent': memory.percent,
+            'memory_used': memory.used,
+            'memory_total': memory.total,
+            'memory_free': memory.free,
+            'memory_cached': memory.cached,
+            'memory_buffers': memory.buffers,
 
-        # 从全局广播获取磁盘数据
-        disk_data = GlobalCall.real_time_disk_data
-        if not disk_data:
-            # 如果实时数据不可用，使用psutil作为后备
-            disk_usage = []
-            partitions = psutil.disk_partitions()
-            for partition in partitions:
-                try:
-                    usage = psutil.disk_usage(partition.mountpoint)
-                    disk_usage.append({
-                        'device': partition.device,
-                        'mountpoint': partition.mountpoint,
-                        'fstype': partition.fstype,
-                        'total': usage.total,
-                        'used': usage.used,
-                        'free': usage.free,
-                        'percent': usage.percent,
-                        'utilization': 0.0
-                    })
-                except Exception:
-                    continue
-
-            disk_io = psutil.disk_io_counters()
-            disk_io_data = {
-                'read_bytes': disk_io.read_bytes if disk_io else 0,
-                'write_bytes': disk_io.write_bytes if disk_io else 0,
-                'read_count': disk_io.read_count if disk_io else 0,
-                'write_count': disk_io.write_count if disk_io else 0,
-            }
-            total_utilization = psutil.disk_io_counters(perdisk=True)
-        else:
-            # 使用RealTimeDisk提供的数据
-            disk_usage = disk_data['disk_usage']
-            disk_io_data = disk_data['disk_io']
-            total_utilization = disk_data['total_utilization']
+            # 交换内存信息
+            'swap_percent': swap.percent,
+            'swap_used': swap.used,
+            'swap_total': swap.total,
+            'swap_free': swap.free
+        },
+        'disk_info': {
+            'disk_usage': disk_usage,
+            'disk_io': disk_io_data,
+            'total_utilization': total_utilization
+        },
+        'net_interfaces': net_interfaces,
+        'net_io': net_io,
+        'rx_speed': rx_speed,
+        'tx_speed': tx_speed,
+        'current_time': now.strftime('%H:%M'),
+        'current_date': now.strftime('%Y/%m/%d'),
+        'day_of_week': now.strftime('%A')
+    }
 
 
-        """整合数据"""
-        return jsonify({
-            'cpu_usage': cpu_percent,
-            'cpu_percent_per_core': cpu_percent_per_core,
-            'cpu_model': cpu_name,
-            'cpu_count': cpu_count,
-            'cpu_frequency': cpu_freq,
-            'cpu_details': {
-                'usr': usr,
-                'nice': nice,
-                'sys': sys,
-                'iowait': iowait,
-                'irq': irq,
-                'soft': soft,
-                'steal': steal,
-                'guest': guest,
-                'gnice': gnice,
-                'idle': idle
-            },
-            'logical_cpu_count': logical_cpu_count,
-            'load_avg': load_avg,
-            'top_processes': top_processes,
-            'memory_usage': memory.percent,
-            'memory_total': {  # 内存信息
-                'memory_percent': memory.percent,
-                'memory_used': memory.used,
-                'memory_total': memory.total,
-                'memory_free': memory.free,
-                'memory_cached': memory.cached,
-                'memory_buffers': memory.buffers,
-
-                # 交换内存信息
-                'swap_percent': swap.percent,
-                'swap_used': swap.used,
-                'swap_total': swap.total,
-                'swap_free': swap.free
-            },
-            'disk_info': {
-                'disk_usage': disk_usage,
-                'disk_io': disk_io_data,
-                'total_utilization': total_utilization
-            },
-            'net_interfaces': net_interfaces,
-            'net_io': net_io,
-            'rx_speed': rx_speed,
-            'tx_speed': tx_speed,
-            'current_time': datetime.now().strftime('%H:%M'),
-            'current_date': datetime.now().strftime('%Y/%m/%d'),
-            'day_of_week': datetime.now().strftime('%A')
-        })
+@app.route('/api/system-status')
+def system_status():
+    """获取系统状态信息（使用实时CPU数据）
+    同一组采集快照只序列化一次，客户端携带If-None-Match且数据未更新时返回304
+    """
+    try:
+        # 从全局广播获取各采集器的快照
+        snapshots = (GlobalCall.real_time_cpu_data, GlobalCall.real_time_mem_data,
+                     GlobalCall.real_time_net_data, GlobalCall.real_time_disk_data)
+        now = datetime.now()
+        key = snapshot_key(*snapshots)
+        if key is not None:
+            # 响应中包含精确到分钟的当前时间
+            key += (now.strftime('%Y%m%d%H%M'),)
+        return snapshot_response('system-status', key, lambda: build_system_status(*snapshots, now))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -664,14 +818,16 @@ def parse_info_txt(content):
     return data
 
 @app.route('/api/system-info')
+@coalesce_request(ttl=2)
 def get_system_info():
     """获取详细系统信息"""
     try:
         # 从extune数据文件获取基本信息
         extune_data = parse_extune_data()
         
-        # 获取实时性能数据
-        cpu_percent = psutil.cpu_percent(interval=1)
+        # 获取实时性能数据（CPU使用率取最近一次采样结果，不阻塞等待）
+        cpu_data = GlobalCall.real_time_cpu_data
+        cpu_percent = cpu_data['total_usage'] if cpu_data else cpu_fallback_sampler.get()[0]
         cpu_freq = psutil.cpu_freq()
         memory = psutil.virtual_memory()
         swap = psutil.swap_memory()
@@ -772,96 +928,106 @@ ALERT_THRESHOLDS = {
 ALERT_CLEAR_TIME = 300  # 5分钟内无再次触发则清除
 
 
-@app.route('/api/check-alert')
-def check_alert():
+def evaluate_alerts():
+    """根据最新的实时数据检查各项阈值，返回当前报警列表"""
+    current_time = time.time()
+
+    # 1. 清除过期的报警
+    with alert_lock:
+        # 移除超过清除时间的报警
+        performanceAlert[:] = [alert for alert in performanceAlert
+                               if current_time - alert_history.get(alert["alert_code"], 0) <= ALERT_CLEAR_TIME]
+
+        # 更新报警历史中过期的条目
+        for code in list(alert_history.keys()):
+            if current_time - alert_history[code] > ALERT_CLEAR_TIME:
+                del alert_history[code]
+
+    # 2. 获取实时性能数据
+    # 使用GlobalCall的实时数据（参考/api/performance-data的实现）
     try:
-        current_time = time.time()
+        # 获取CPU数据
+        cpu_data = GlobalCall.real_time_cpu_data
+        if not cpu_data:
+            return list(performanceAlert)
 
-        # 1. 清除过期的报警
-        with alert_lock:
-            # 移除超过清除时间的报警
-            performanceAlert[:] = [alert for alert in performanceAlert
-                                   if current_time - alert_history.get(alert["alert_code"], 0) <= ALERT_CLEAR_TIME]
+        # 获取内存数据
+        memory_data = GlobalCall.real_time_mem_data
+        if not memory_data:
+            return list(performanceAlert)
 
-            # 更新报警历史中过期的条目
-            for code in list(alert_history.keys()):
-                if current_time - alert_history[code] > ALERT_CLEAR_TIME:
-                    del alert_history[code]
+        # 获取磁盘数据
+        disk_data = GlobalCall.real_time_disk_data
+        if not disk_data:
+            return list(performanceAlert)
 
-        # 2. 获取实时性能数据
-        # 使用GlobalCall的实时数据（参考/api/performance-data的实现）
-        try:
-            # 获取CPU数据
-            cpu_data = GlobalCall.real_time_cpu_data
-            if not cpu_data:
-                return jsonify(performanceAlert)
-
-            # 获取内存数据
-            memory_data = GlobalCall.real_time_mem_data
-            if not memory_data:
-                return jsonify(performanceAlert)
-
-            # 获取磁盘数据
-            disk_data = GlobalCall.real_time_disk_data
-            if not disk_data:
-                return jsonify(performanceAlert)
-
-            # 获取网络数据
-            net_data = GlobalCall.real_time_net_data
-            if not net_data:
-                return jsonify(performanceAlert)
+        # 获取网络数据
+        net_data = GlobalCall.real_time_net_data
+        if not net_data:
+            return list(performanceAlert)
 
-        except Exception as e:
-            print(f"获取性能数据失败: {e}")
-            return jsonify(performanceAlert)
-
-        # 3. 检查各项阈值
-        with alert_lock:
-            # 检查CPU负载
-            if cpu_data['total_usage'] > ALERT_THRESHOLDS["cpu-overload"]:
-                update_alert("cpu-overload",
-                             f"CPU使用率过高: {cpu_data['total_usage']:.2f}%",
+    except Exception as e:
+        print(f"获取性能数据失败: {e}")
+        return list(performanceAlert)
+
+    # 3. 检查各项阈值
+    with alert_lock:
+        # 检查CPU负载
+        if cpu_data['total_usage'] > ALERT_THRESHOLDS["cpu-overload"]:
+            update_alert("cpu-overload",
+                         f"CPU使用率过高: {cpu_data['total_usage']:.2f}%",
+                         current_time)
+
+        # 检查内存使用
+        if memory_data['mem_percent'] > ALERT_THRESHOLDS["memory-overload"]:
+            update_alert("memory-overload",
+                         f"内存使用率过高: {memory_data['mem_percent']:.2f}%",
+                         current_time)
+
+        # 检查磁盘空间
+        for partition in disk_data['disk_usage']:
+            if partition['percent'] > ALERT_THRESHOLDS["disk-space-overload"]:
+                update_alert("disk-space-overload",
+                             f"磁盘 {partition['mountpoint']} 空间不足: {partition['percent']:.2f}%",
                              current_time)
 
-            # 检查内存使用
-            if memory_data['mem_percent'] > ALERT_THRESHOLDS["memory-overload"]:
-                update_alert("memory-overload",
-                             f"内存使用率过高: {memory_data['mem_percent']:.2f}%",
+        # 检查磁盘IO（取活动率最高的设备，附带延迟和队列深度）
+        busiest_device, busiest_stats = None, None
+        for device, stats in disk_data['disk_io'].items():
+            if stats.get('utilization', 0) > (busiest_stats or {}).get('utilization', 0):
+                busiest_device, busiest_stats = device, stats
+
+        if busiest_stats and busiest_stats['utilization'] > ALERT_THRESHOLDS["disk-io-overload"]:
+            update_alert("disk-io-overload",
+                         f"磁盘 {busiest_stats.get('name', busiest_device)} IO负载过高: "
+                         f"{busiest_stats['utilization']:.2f}% "
+                         f"(r_await {busiest_stats.get('r_await', 0):.2f}ms, "
+                         f"w_await {busiest_stats.get('w_await', 0):.2f}ms, "
+                         f"aqu-sz {busiest_stats.get('aqu_sz', 0):.2f})",
+                         current_time)
+
+        # 检查网络负载
+        net_util = max(net_data.get('total_rx_speed', 0), net_data.get('total_tx_speed', 0))
+        if net_util > ALERT_THRESHOLDS["network-overload"]:
+            update_alert("network-overload",
+                         f"网络负载过高: {(net_util / 1024 /1024):.2f} MB/s",
+                         current_time)
+
+        # 检查高负载进程
+        for proc in cpu_data.get('top_processes', [])[:5]:  # 检查前5个高负载进程
+            if proc.get('cpu_percent', 0) > ALERT_THRESHOLDS["high-process-load"]:
+                update_alert("high-process-load",
+                             f"进程 {proc.get('command', '未知')} 占用过高CPU: {proc['cpu_percent']}%",
                              current_time)
 
-            # 检查磁盘空间
-            for partition in disk_data['disk_usage']:
-                if partition['percent'] > ALERT_THRESHOLDS["disk-space-overload"]:
-                    update_alert("disk-space-overload",
-                                 f"磁盘 {partition['mountpoint']} 空间不足: {partition['percent']:.2f}%",
-                                 current_time)
-
-            # 检查磁盘IO
-            max_io_util = 0.0
-            for device, stats in disk_data['disk_io'].items():
-                if 'utilization' in stats and stats['utilization'] > max_io_util:
-                    max_io_util = stats['utilization']
-
-            if max_io_util > ALERT_THRESHOLDS["disk-io-overload"]:
-                update_alert("disk-io-overload",
-                             f"磁盘IO负载过高: {max_io_util:.2f}%",
-                             current_time)
 
-            # 检查网络负载
-            net_util = max(net_data.get('total_rx_speed', 0), net_data.get('total_tx_speed', 0))
-            if net_util > ALERT_THRESHOLDS["network-overload"]:
-                update_alert("network-overload",
-                             f"网络负载过高: {(net_util / 1024 /1024):.2f} MB/s",
-                             current_time)
+    return list(performanceAlert)
 
-            # 检查高负载进程
-            for proc in cpu_data.get('top_processes', [])[:5]:  # 检查前5个高负载进程
-                if proc.get('cpu_percent', 0) > ALERT_THRESHOLDS["high-process-load"]:
-                    update_alert("high-process-load",
-                                 f"进程 {proc.get('command', '未知')} 占用过高CPU: {proc['cpu_percent']}%",
-                                 current_time)
 
-        return jsonify(performanceAlert)
+@app.route('/api/check-alert')
+def check_alert():
+    try:
+        return jsonify(evaluate_alerts())
 
     except Exception as e:
         print(f"报警检查错误: {e}")
@@ -902,28 +1068,199 @@ def get_system_log():
         return jsonify({'error': str(e)}), 500
 
 
+def get_collector_stats():
+    """采集器调度记录；shared模式下读取采集进程写入的记录，采集进程未运行时返回None"""
+    if COLLECTOR_MODE == 'shared':
+        return shared_snapshots.read(SCHEDULER_REGION, only_new=False)
+    return CollectorScheduler().get_stats()
+
+
+@app.route('/api/collectors')
+def get_collectors_status():
+    """获取各实时采集器的调度记录（最近耗时、最近成功时间、失败/跳过次数）"""
+    try:
+        stats = get_collector_stats()
+        if stats is None:
+            return jsonify({'error': '采集进程未运行'}), 503
+        return jsonify(stats)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/internal/request-stats')
+def get_request_stats():
+    """获取各路由的请求统计（请求数、错误数、响应字节数、进行中请求数、耗时p50/p95/p99）及请求合并次数"""
+    try:
+        return jsonify(dict(request_metrics.get_stats(), coalescing=request_coalescer.get_stats()))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/metrics/history')
+def get_metrics_history():
+    """查询实时指标历史
+    参数: series 逗号分隔的序列名, 支持通配符(如 cpu.core.*); 省略时返回可查询的序列名列表
+          from/to 起止时间(Unix时间戳), 负数表示相对当前的秒数, 默认最近1小时
+          step 聚合步长(秒), 默认2
+          agg 汇总数据的聚合方式(avg/min/max/last), 默认avg
+    步长不小于最小汇总精度或起始时间超出内存保留时长时, 从持久化的汇总数据中选择满足步长的最粗精度查询
+    (1分钟及更粗的汇总只保存整机汇总序列, 不含cpu.core.*等明细序列)
+    dropped_series 为所查询的存储因序列数已满而未记录的序列数
+    """
+    try:
+        rollup = get_metric_rollup()
+        # shared模式下只能查询采集进程写入的汇总数据, 汇总文件尚不可用时不返回空结果
+        if COLLECTOR_MODE == 'shared' and rollup is None:
+            return jsonify({'error': '指标汇总数据暂不可用，采集进程可能尚未启动'}), 503
+
+        series = request.args.get('series', '').strip()
+        if not series:
+            return jsonify({
+                'series': rollup.list_series() if COLLECTOR_MODE == 'shared' else metric_store.list_series(),
+                'dropped_series': rollup.get_dropped_count() if COLLECTOR_MODE == 'shared'
+                else metric_store.get_dropped_count(),
+                'memory_usage': metric_store.get_memory_usage(),
+                'rollup_tiers': rollup.get_tiers() if rollup is not None else []
+            })
+
+        now = time.time()
+        start = request.args.get('from', -3600, type=float)
+        end = request.args.get('to', now, type=float)
+        step = request.args.get('step', 2, type=float)
+        if start < 0:
+            start = now + start
+        if end < 0:
+            end = now + end
+        if step <= 0 or end < start:
+            return jsonify({'error': '无效的时间范围或步长'}), 400
+        # 限制返回的点数，避免过小的步长生成超大响应
+        max_points = 10000
+        if (end - start) / step > max_points:
+            step = (end - start) / max_points
+
+        agg = request.args.get('agg', 'avg')
+        if agg not in MetricRollup.AGGREGATES:
+            return jsonify({'error': f'不支持的聚合方式: {agg}'}), 400
+
+        patterns = [p.strip() for p in series.split(',') if p.strip()]
+        # shared模式下原始样本保存在采集进程中，只能查询汇总数据
+        if rollup is not None and (COLLECTOR_MODE == 'shared'
+                                   or step >= rollup.get_min_resolution()
+                                   or start < now - metric_store.retention):
+            resolution, timestamps, values = rollup.query(patterns, start, end, step, now, agg)
+            step = max(step, resolution)
+            dropped = rollup.get_dropped_count()
+        else:
+            resolution = 'raw'
+            timestamps, values = metric_store.query(patterns, start, end, step)
+            dropped = metric_store.get_dropped_count()
+        return jsonify({
+            'step': step,
+            'resolution': resolution,
+            'timestamps': timestamps,
+            'series': values,
+            'dropped_series': dropped
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# /api/processes 对外字段名与进程表字段的对应关系
+PROCESS_API_FIELDS = {
+    'pid': 'pid',
+    'ppid': 'ppid',
+    'name': 'name',
+    'username': 'user',
+    'status': 'status',
+    'cpu_percent': 'cpu_percent',
+    'memory_percent': 'mem_percent',
+    'rss': 'res',
+    'vms': 'virt',
+    'num_threads': 'threads',
+    'nice': 'ni',
+    'create_time': 'create_time'
+}
+
 @app.route('/api/processes')
 def get_processes():
-    """获取进程列表"""
+    """获取进程列表
+
+    查询参数（均可选）：
+        sort    排序字段，默认cpu_percent
+        order   desc/asc，默认desc
+        user    按用户名过滤
+        state   按状态过滤（状态字母或状态名，如R/running）
+        name    按进程名正则过滤
+        offset  分页起始位置，默认0
+        limit   每页数量，默认返回全部
+        fields  逗号分隔的返回字段，默认全部
+    满足条件的进程总数通过响应头X-Total-Count返回
+    """
     try:
+        sort_field = request.args.get('sort', 'cpu_percent')
+        if sort_field not in PROCESS_API_FIELDS:
+            return jsonify({'error': f'不支持的排序字段: {sort_field}'}), 400
+
+        fields = request.args.get('fields')
+        fields = [f for f in fields.split(',') if f in PROCESS_API_FIELDS] if fields else list(PROCESS_API_FIELDS)
+
+        name = request.args.get('name')
+        try:
+            name = re.compile(name) if name else None
+        except re.error as e:
+            return jsonify({'error': f'无效的进程名正则: {e}'}), 400
+
+        try:
+            offset = max(int(request.args.get('offset', 0)), 0)
+            limit = request.args.get('limit')
+            limit = max(int(limit), 0) if limit is not None else None
+        except ValueError:
+            return jsonify({'error': 'offset/limit必须为整数'}), 400
+
+        total, page = process_table.query(
+            sort_key=PROCESS_API_FIELDS[sort_field],
+            reverse=request.args.get('order', 'desc') != 'asc',
+            user=request.args.get('user') or None,
+            state=request.args.get('state') or None,
+            name=name,
+            offset=offset,
+            limit=limit,
+            max_age=PROCESS_TABLE_MAX_AGE
+        )
+
         processes = []
-        for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent', 'status', 'create_time', 'username']):
-            try:
-                proc_info = proc.info
+        for proc in page:
+            proc_info = {field: proc[PROCESS_API_FIELDS[field]] for field in fields}
+            if 'create_time' in proc_info:
                 proc_info['create_time'] = datetime.fromtimestamp(proc_info['create_time']).strftime('%H:%M:%S')
-                processes.append(proc_info)
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                pass
-        
-        # 按CPU使用率排序
-        processes.sort(key=lambda x: x['cpu_percent'] or 0, reverse=True)
-        return jsonify(processes)
+            processes.append(proc_info)
+
+        response = jsonify(processes)
+        response.headers['X-Total-Count'] = str(total)
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# 目录列表缓存：scandir读取后按目录缓存，目录项增删由inotify事件（不可用时按目录修改时间）使缓存失效，子项大小和时间按max_age定时刷新
+from extune.common.dir_listing import DirectoryListingCache, ENTRY_NAME, ENTRY_IS_DIR, ENTRY_SIZE, \
+    ENTRY_MTIME, ENTRY_MODE, ENTRY_UID, ENTRY_GID
+dir_listing_cache = DirectoryListingCache()
+FILES_PAGE_LIMIT = 500
+FILES_PAGE_MAX_LIMIT = 5000
+
+
 @app.route('/api/files')
 def list_files():
-    """列出指定目录下的文件和文件夹"""
+    """列出指定目录下的文件和文件夹（文件夹在前，分页返回）
+
+    查询参数（均可选）：
+        path    目录路径，默认/
+        sort    name/size/modified，默认name
+        order   asc/desc，默认asc
+        limit   每页数量，默认500，最大5000
+        cursor  上一页返回的next_cursor
+        q       名称过滤（不区分大小写的子串匹配），作用于整个目录而非已加载的页；翻页时需与cursor一起传递
+    """
     try:
         # 获取路径参数
         path = request.args.get('path', '/')
@@ -949,51 +1286,49 @@ def list_files():
             path = os.path.dirname(path)
             if not os.path.isdir(path):
                 path = '/'
+
+        sort = request.args.get('sort', 'name')
+        if sort not in DirectoryListingCache.SORT_KEYS:
+            return jsonify({'error': f'不支持的排序字段: {sort}'}), 400
+        reverse = request.args.get('order', 'asc') == 'desc'
+        try:
+            limit = min(max(int(request.args.get('limit', FILES_PAGE_LIMIT)), 1), FILES_PAGE_MAX_LIMIT)
+        except ValueError:
+            return jsonify({'error': 'limit必须为整数'}), 400
+        cursor = request.args.get('cursor') or None
+        query = request.args.get('q', '').strip()
         
         # 尝试读取目录内容
         try:
-            file_list = os.listdir(path)
+            entries, total, next_cursor = dir_listing_cache.page(path, sort, reverse, cursor, limit, query)
         except PermissionError:
             path = '/'
-            file_list = os.listdir(path)
+            entries, total, next_cursor = dir_listing_cache.page(path, sort, reverse, None, limit, query)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         items = []
-        for item_name in file_list:
-            try:
-                item_path = os.path.join(path, item_name)
-                
-                # 跳过隐藏文件
-                if item_name.startswith('.'):
-                    continue
-                
-                stat_info = os.stat(item_path)
-                is_directory = os.path.isdir(item_path)
-                
-                item_data = {
-                    'name': item_name,
-                    'path': item_path,
-                    'is_dir': is_directory,
-                    'size': stat_info.st_size if not is_directory else 0,
-                    'size_formatted': format_bytes(stat_info.st_size) if not is_directory else '',
-                    'modified': datetime.fromtimestamp(stat_info.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
-                    'permissions': oct(stat_info.st_mode)[-3:],
-                    'owner': stat_info.st_uid,
-                    'group': stat_info.st_gid
-                }
-                
-                items.append(item_data)
-                
-            except (OSError, PermissionError):
-                continue
-        
-        # 排序：文件夹在前，文件在后
-        items.sort(key=lambda x: (not x['is_dir'], x['name'].lower()))
+        for entry in entries:
+            is_directory = entry[ENTRY_IS_DIR]
+            items.append({
+                'name': entry[ENTRY_NAME],
+                'path': os.path.join(path, entry[ENTRY_NAME]),
+                'is_dir': is_directory,
+                'size': entry[ENTRY_SIZE],
+                'size_formatted': format_bytes(entry[ENTRY_SIZE]) if not is_directory else '',
+                'modified': datetime.fromtimestamp(entry[ENTRY_MTIME]).strftime('%Y-%m-%d %H:%M:%S'),
+                'permissions': oct(entry[ENTRY_MODE])[-3:],
+                'owner': entry[ENTRY_UID],
+                'group': entry[ENTRY_GID]
+            })
         
         response_data = {
             'current_path': path,
             'parent_path': os.path.dirname(path) if path != '/' else None,
             'items': items,
-            'total_items': len(items)
+            'total_items': total,
+            'next_cursor': next_cursor,
+            'query': query
         }
         
         return jsonify(response_data)
@@ -1004,6 +1339,7 @@ def list_files():
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
 @app.route('/api/file-system-diagnosis')
+@coalesce_request(ttl=10)
 def file_system_diagnosis():
     """文件系统诊断 - 检查文件系统访问状态"""
     try:
@@ -1104,6 +1440,7 @@ def file_system_diagnosis():
         return jsonify({'error': f'Diagnosis failed: {str(e)}'}), 500
 
 @app.route('/api/network-connections')
+@coalesce_request(ttl=2)
 def get_network_connections():
     """获取网络连接信息"""
     try:
@@ -1167,6 +1504,7 @@ def get_network_interfaces():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/network-stats')
+@coalesce_request(ttl=1)
 def get_network_stats():
     """获取网络统计信息"""
     try:
@@ -1187,335 +1525,468 @@ def get_network_stats():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/performance-data')
-def get_performance_data():
-    """获取详细的性能监控数据"""
-    try:
-        # CPU详细信息 - 从全局广播获取CPU数据
-        cpu_data = GlobalCall.real_time_cpu_data
-        if not cpu_data:
-            # 如果实时数据不可用，使用psutil作为后备
-            cpu_percent = psutil.cpu_percent(interval=1)
-            cpu_percent_per_core = [psutil.cpu_percent(interval=1, percpu=True)[i] for i in range(psutil.cpu_count())]
-            cpu_count = psutil.cpu_count()
-            cpu_name = f"Unknown CPU ({cpu_count} cores)"
-            load_avg = psutil.getloadavg() if hasattr(psutil, 'getloadavg') else [0, 0, 0]
-            cpu_freq = psutil.cpu_freq().current if hasattr(psutil, 'cpu_freq') else 0
-            logical_cpu_count = psutil.cpu_count(logical=True)
-            usr = 0
-            nice = 0
-            sys = 0
-            iowait = 0
-            irq = 0
-            soft = 0
-            steal = 0
-            guest = 0
-            gnice = 0
-            idle = 0
-            # 进程信息
-            processes = []
-            for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
-                try:
-                    proc_info = proc.info
-                    if proc_info['cpu_percent'] > 0 or proc_info['memory_percent'] > 0:
-                        processes.append(proc_info)
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    continue
+def build_performance_data(cpu_data, memory_data, disk_data, net_data):
+    """根据各采集器快照整合详细性能数据；快照为空时使用psutil作为后备"""
+    # CPU详细信息
+    if not cpu_data:
+        # 如果实时数据不可用，使用psutil作为后备
+        cpu_percent, cpu_percent_per_core = cpu_fallback_sampler.get()
+        cpu_count = psutil.cpu_count()
+        cpu_name = f"Unknown CPU ({cpu_count} cores)"
+        load_avg = psutil.getloadavg() if hasattr(psutil, 'getloadavg') else [0, 0, 0]
+        cpu_freq = psutil.cpu_freq().current if hasattr(psutil, 'cpu_freq') else 0
+        logical_cpu_count = psutil.cpu_count(logical=True)
+        usr = 0
+        nice = 0
+        sys = 0
+        iowait = 0
+        irq = 0
+        soft = 0
+        steal = 0
+        guest = 0
+        gnice = 0
+        idle = 0
+        # 进程信息：读取共享进程表，取CPU占用前10的进程
+        top_processes = process_table.top(10, max_age=PROCESS_TABLE_MAX_AGE)
 
-            # 按CPU使用率排序，取前10个
-            top_processes = sorted(processes, key=lambda x: x['cpu_percent'] or 0, reverse=True)[:10]
+    else:
+        # 使用RealTimeCPU提供的数据
+        cpu_percent = cpu_data['total_usage']
+        cpu_percent_per_core = cpu_data['core_usage']
+        cpu_count = cpu_data['cpu_count']
+        cpu_name = cpu_data['model_name']
+        load_avg = cpu_data['load_avg']
+        cpu_freq = cpu_data['cpu_freq']
+        logical_cpu_count = cpu_data['logical_cpu_count']
+        top_processes = cpu_data['top_processes']
+        usr = cpu_data['usr']
+        nice = cpu_data['nice']
+        sys = cpu_data['sys']
+        iowait = cpu_data['iowait']
+        irq = cpu_data['irq']
+        soft = cpu_data['soft']
+        steal = cpu_data['steal']
+        guest = cpu_data['guest']
+        gnice = cpu_data['gnice']
+        idle = cpu_data['idle']
+
+    # 构建CPU频率信息
+    cpu_frequency_info = {
+        'current': cpu_freq,
+        'min': cpu_freq * 0.8,  # 假设最小值
+        'max': cpu_freq * 1.2,   # 假设最大值
+        'base': cpu_freq,
+        'turbo_max': cpu_freq * 1.2,
+        'boost': cpu_freq > (cpu_freq * 0.8 * 1.1),
+        'cores': [cpu_freq] * logical_cpu_count
+    }
 
-        else:
-            # 使用RealTimeCPU提供的数据
-            cpu_percent = cpu_data['total_usage']
-            cpu_percent_per_core = cpu_data['core_usage']
-            cpu_count = cpu_data['cpu_count']
-            cpu_name = cpu_data['model_name']
-            load_avg = cpu_data['load_avg']
-            cpu_freq = cpu_data['cpu_freq']
-            logical_cpu_count = cpu_data['logical_cpu_count']
-            top_processes = cpu_data['top_processes']
-            usr = cpu_data['usr']
-            nice = cpu_data['nice']
-            sys = cpu_data['sys']
-            iowait = cpu_data['iowait']
-            irq = cpu_data['irq']
-            soft = cpu_data['soft']
-            steal = cpu_data['steal']
-            guest = cpu_data['guest']
-            gnice = cpu_data['gnice']
-            idle = cpu_data['idle']
-
-        # 构建CPU频率信息
-        cpu_frequency_info = {
-            'current': cpu_freq,
-            'min': cpu_freq * 0.8,  # 假设最小值
-            'max': cpu_freq * 1.2,   # 假设最大值
-            'base': cpu_freq,
-            'turbo_max': cpu_freq * 1.2,
-            'boost': cpu_freq > (cpu_freq * 0.8 * 1.1),
-            'cores': [cpu_freq] * logical_cpu_count
+    # 内存详细信息
+    if not memory_data:
+        # 如果实时内存数据不可用，使用psutil作为后备
+        memory = psutil.virtual_memory()
+        swap = psutil.swap_memory()
+    else:
+        # 使用RealTimeMemory提供的数据
+        memory = type('obj', (object,), {
+            'total': memory_data['mem_total'],
+            'used': memory_data['mem_used'],
+            'free': memory_data['mem_free'],
+            'percent': memory_data['mem_percent'],
+            'cached': memory_data['mem_cached'],
+            'buffers': memory_data['mem_buffers']
+        })()
+        swap = type('obj', (object,), {
+            'total': memory_data['swap_total'],
+            'used': memory_data['swap_used'],
+            'free': memory_data['swap_free'],
+            'percent': memory_data['swap_percent']
+        })()
+
+    # 磁盘详细信息
+    if not disk_data:
+        # 如果实时数据不可用，使用psutil作为后备
+        disk_usage = []
+        partitions = psutil.disk_partitions()
+        for partition in partitions:
+            try:
+                usage = psutil.disk_usage(partition.mountpoint)
+                disk_usage.append({
+                    'device': partition.device,
+                    'mountpoint': partition.mountpoint,
+                    'fstype': partition.fstype,
+                    'total': usage.total,
+                    'used': usage.used,
+                    'free': usage.free,
+                    'percent': usage.percent,
+                    'utilization': 0.0
+                })
+            except Exception:
+                continue
+
+        disk_io = psutil.disk_io_counters()
+        disk_io_data = {
+            'read_bytes': disk_io.read_bytes if disk_io else 0,
+            'write_bytes': disk_io.write_bytes if disk_io else 0,
+            'read_count': disk_io.read_count if disk_io else 0,
+            'write_count': disk_io.write_count if disk_io else 0,
         }
-        
-        # 内存详细信息 - 从全局广播获取内存数据
-        memory_data = GlobalCall.real_time_mem_data
-        if not memory_data:
-            # 如果实时内存数据不可用，使用psutil作为后备
-            memory = psutil.virtual_memory()
-            swap = psutil.swap_memory()
-        else:
-            # 使用RealTimeMemory提供的数据
-            memory = type('obj', (object,), {
-                'total': memory_data['mem_total'],
-                'used': memory_data['mem_used'],
-                'free': memory_data['mem_free'],
-                'percent': memory_data['mem_percent'],
-                'cached': memory_data['mem_cached'],
-                'buffers': memory_data['mem_buffers']
-            })()
-            swap = type('obj', (object,), {
-                'total': memory_data['swap_total'],
-                'used': memory_data['swap_used'],
-                'free': memory_data['swap_free'],
-                'percent': memory_data['swap_percent']
-            })()
-
-        # 磁盘详细信息 - 从全局广播获取磁盘数据
-        disk_data = GlobalCall.real_time_disk_data
-        if not disk_data:
-            # 如果实时数据不可用，使用psutil作为后备
-            disk_usage = []
-            partitions = psutil.disk_partitions()
-            for partition in partitions:
-                try:
-                    usage = psutil.disk_usage(partition.mountpoint)
-                    disk_usage.append({
-                        'device': partition.device,
-                        'mountpoint': partition.mountpoint,
-                        'fstype': partition.fstype,
-                        'total': usage.total,
-                        'used': usage.used,
-                        'free': usage.free,
-                        'percent': usage.percent,
-                        'utilization': 0.0
-                    })
-                except Exception:
-                    continue
-
-            disk_io = psutil.disk_io_counters()
-            disk_io_data = {
-                'read_bytes': disk_io.read_bytes if disk_io else 0,
-                'write_bytes': disk_io.write_bytes if disk_io else 0,
-                'read_count': disk_io.read_count if disk_io else 0,
-                'write_count': disk_io.write_count if disk_io else 0,
-            }
-            total_utilization = psutil.disk_io_counters(perdisk=True) if hasattr(psutil, 'disk_io_counters') else {}
-        else:
-            # 使用RealTimeDisk提供的数据
-            disk_usage = disk_data['disk_usage']
-            disk_io_data = disk_data['disk_io']
-            total_utilization = disk_data['total_utilization']
+        total_utilization = psutil.disk_io_counters(perdisk=True) if hasattr(psutil, 'disk_io_counters') else {}
+    else:
+        # 使用RealTimeDisk提供的数据
+        disk_usage = disk_data['disk_usage']
+        disk_io_data = disk_data['disk_io']
+        total_utilization = disk_data['total_utilization']
 
 
 
-        # 网络详细信息 - 从全局广播获取网络数据
-        net_data = GlobalCall.real_time_net_data
-        if not net_data:
-            # 如果实时网络数据不可用，使用psutil作为后备
-            net_io = psutil.net_io_counters()
-            net_interfaces = {}
-            rx_speed = 0.0
-            tx_speed = 0.0
-        else:
-            # 使用RealTimeNet提供的数据
-            net_io = net_data.get('net_io', {})
-            net_interfaces = net_data.get('net_interfaces', {})
-            rx_speed = net_data.get('total_rx_speed', 0.0)
-            tx_speed = net_data.get('total_tx_speed', 0.0)
-
-            # 计算总的网络IO统计
-            total_io = {
-                'bytes_sent': 0,
-                'bytes_recv': 0,
-                'packets_sent': 0,
-                'packets_recv': 0,
-                'errin': 0,
-                'errout': 0,
-                'dropin': 0,
-                'dropout': 0
+    # 网络详细信息
+    if not net_data:
+        # 如果实时网络数据不可用，使用psutil作为后备
+        net_io = psutil.net_io_counters()
+        net_interfaces = {}
+        rx_speed = 0.0
+        tx_speed = 0.0
+    else:
+        # 使用RealTimeNet提供的数据
+        net_io = net_data.get('net_io', {})
+        net_interfaces = net_data.get('net_interfaces', {})
+        rx_speed = net_data.get('total_rx_speed', 0.0)
+        tx_speed = net_data.get('total_tx_speed', 0.0)
+
+        # 计算总的网络IO统计
+        total_io = {
+            'bytes_sent': 0,
+            'bytes_recv': 0,
+            'packets_sent': 0,
+            'packets_recv': 0,
+            'errin': 0,
+            'errout': 0,
+            'dropin': 0,
+            'dropout': 0
+        }
+
+        for iface, stats in net_io.items():
+            for key in total_io.keys():
+                total_io[key] += stats.get(key, 0)
+
+
+    # 电池信息（如果是笔记本电脑）
+    battery = None
+    try:
+        battery_info = psutil.sensors_battery()
+        if battery_info:
+            battery = {
+                'percent': battery_info.percent,
+                'secsleft': battery_info.secsleft,
+                'power_plugged': battery_info.power_plugged
             }
+    except AttributeError:
+        pass
+
+    # # 获取CPU名称 - 从system_info.json文件中读取
+    # cpu_name = "Unknown CPU"
+    # try:
+    #     system_info_path = os.path.join(os.path.dirname(__file__), 'system_info.json')
+    #     if os.path.exists(system_info_path):
+    #         with open(system_info_path, 'r', encoding='utf-8') as f:
+    #             system_info_data = json.load(f)
+    #             cpu_name = system_info_data.get('cpu_info', 'Unknown CPU')
+    # except Exception as e:
+    #     print(f"读取system_info.json失败: {e}")
+    #     # 如果读取失败，使用platform.processor()作为备选
+    #     cpu_name = platform.processor()
+    #     if not cpu_name or cpu_name.strip() == '':
+    #         cpu_name = f"Unknown CPU ({cpu_count} cores)"
+
+    return {
+        # CPU信息
+        'cpu_percent': cpu_percent,
+        'cpu_percent_per_core': cpu_percent_per_core,
+        'cpu_average': cpu_percent,  # 直接使用总使用率
+        'cpu_name': cpu_name,
+        'cpu_frequency': cpu_frequency_info,
+        'cpu_count_physical': cpu_count,
+        'cpu_count_logical': logical_cpu_count,
+        'load_avg': load_avg,
+        'cpu_details': {
+            'usr': usr,
+            'nice': nice,
+            'sys': sys,
+            'iowait': iowait,
+            'irq': irq,
+            'soft': soft,
+            'steal': steal,
+            'guest': guest,
+            'gnice': gnice,
+            'idle': idle
+        },
+
+        # 内存信息
+        'memory_percent': memory.percent,
+        'memory_used': memory.used,
+        'memory_total': memory.total,
+        'memory_free': memory.free,
+        'memory_cached': memory.cached,
+        'memory_buffers': memory.buffers,
+        # 内存明细（Dirty/Slab/Committed_AS等）及缺页、换页、回收速率
+        'memory_details': memory_data if memory_data else {},
+
+        # 交换内存信息
+        'swap_percent': swap.percent,
+        'swap_used': swap.used,
+        'swap_total': swap.total,
+        'swap_free': swap.free,
+
+        # 磁盘信息
+        'disk_usage': disk_usage,
+        'disk_io': disk_io_data,
+        'total_utilization': total_utilization,
+
+        # 网络信息
+        'network_io': total_io if net_data else {
+            'bytes_sent': net_io.bytes_sent,
+            'bytes_recv': net_io.bytes_recv,
+            'packets_sent': net_io.packets_sent,
+            'packets_recv': net_io.packets_recv,
+            'errin': net_io.errin,
+            'errout': net_io.errout,
+            'dropin': net_io.dropin,
+            'dropout': net_io.dropout,
+        },
+        'rx_speed': rx_speed,
+        'tx_speed': tx_speed,
+        'network_interfaces': net_interfaces,
+
+        # 进程信息
+        'top_processes': top_processes,
+        'process_count': cpu_data.get('process_count') if cpu_data else len(process_table.snapshot(PROCESS_TABLE_MAX_AGE)),
+
+        # 电池信息
+        'battery': battery,
+
+        # 系统信息
+        'boot_time': psutil.boot_time(),
+        # 数据时间：使用最近一次采集的时间，无快照时为当前时间
+        'timestamp': max((d.timestamp for d in (cpu_data, memory_data, disk_data, net_data)
+                          if isinstance(d, Snapshot)), default=time.time())
+    }
+
+# 性能数据中基本不变的静态信息，增量帧中不包含，通过/api/performance-data/static单独获取
+STATIC_PERFORMANCE_KEYS = ('cpu_name', 'cpu_count_physical', 'cpu_count_logical',
+                           'network_interfaces', 'battery', 'boot_time')
+# 性能数据帧历史：每组新快照生成一帧，增量模式下只返回相对客户端已有帧变化的部分
+from extune.common.delta_frames import FrameHistory
+performance_frames = FrameHistory(serialize_json, depth=30, keyframe_interval=30,
+                                  exclude=STATIC_PERFORMANCE_KEYS)
 
-            for iface, stats in net_io.items():
-                for key in total_io.keys():
-                    total_io[key] += stats.get(key, 0)
-        
 
-        # 电池信息（如果是笔记本电脑）
-        battery = None
+def current_performance_payload():
+    """返回(快照序号组合, 性能数据)；采集未运行时序号组合为None，数据每次重新构建"""
+    snapshots = (GlobalCall.real_time_cpu_data, GlobalCall.real_time_mem_data,
+                 GlobalCall.real_time_disk_data, GlobalCall.real_time_net_data)
+    key = snapshot_key(*snapshots)
+    if key is None:
+        return None, build_performance_data(*snapshots)
+    return key, performance_frames.get_payload(key, lambda: build_performance_data(*snapshots))
+
+
+@app.route('/api/performance-data')
+def get_performance_data():
+    """获取详细的性能监控数据
+    同一组采集快照只序列化一次，客户端携带If-None-Match且数据未更新时返回304
+    参数: since 客户端已有的帧号（上一帧的seq），指定时返回增量帧（JSON Patch，不含静态信息）；
+          基准帧未知、过旧或早于最近关键帧时返回完整帧，首次请求可传空的since=
+          帧号由快照序号组成，进程重启或请求到其他Web进程后不会与之前的帧混淆
+    """
+    try:
+        key, payload = current_performance_payload()
+        since = request.args.get('since')
+        if since is not None:
+            if key is None:
+                # 采集未运行，没有可作为基准的帧
+                data = {k: v for k, v in payload.items() if k not in STATIC_PERFORMANCE_KEYS}
+                return jsonify({'seq': None, 'type': 'full', 'data': data})
+            _, body = performance_frames.get_frame(since)
+            return Response(body, mimetype='application/json')
+        return snapshot_response('performance-data', key, lambda: payload)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/performance-data/static')
+def get_performance_static_data():
+    """获取性能数据中的静态信息（CPU型号、核数、网卡地址、开机时间等），支持ETag/304"""
+    try:
+        _, payload = current_performance_payload()
+        static = {k: payload[k] for k in STATIC_PERFORMANCE_KEYS if k in payload}
+        body = serialize_json(static)
+        response = Response(body, mimetype='application/json')
+        response.set_etag(hashlib.md5(body).hexdigest())
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# 实时指标推送：cpu/mem/net/disk主题由各采集器每个周期发布，
+# performance与alerts主题由下面的任务汇总后发布，每个主题每次只序列化一次，所有连接共享
+STREAM_PUBLISH_INTERVAL = 1
+STREAM_KEEPALIVE = 15
+stream_state = {'performance_key': None, 'performance_frame': None, 'status_key': None,
+                'alerts_body': None, 'alerts_seq': 0}
+
+
+def publish_stream_topics():
+    """快照或报警有变化时推送performance和alerts主题"""
+    snapshots = (GlobalCall.real_time_cpu_data, GlobalCall.real_time_mem_data,
+                 GlobalCall.real_time_disk_data, GlobalCall.real_time_net_data)
+    key = snapshot_key(*snapshots)
+    if key is not None and key != stream_state['performance_key']:
+        # 与/api/performance-data共用同一份序列化结果
+        body, _ = response_cache.get('performance-data', key,
+                                     lambda: serialize_json(performance_frames.get_payload(
+                                         key, lambda: build_performance_data(*snapshots))))
+        metric_broadcaster.publish('performance', max(key), body=body)
+        stream_state['performance_key'] = key
+        # 增量帧相对上一次推送的帧；客户端错过某一帧时按帧号通过/api/performance-data?since=补齐
+        frame, body = performance_frames.get_frame(stream_state['performance_frame'])
+        metric_broadcaster.publish('performance-delta', max(key), body=body)
+        stream_state['performance_frame'] = frame
+
+    # 系统状态（与/api/system-status相同），只在有订阅者时生成
+    if metric_broadcaster.has_subscribers('status'):
+        status_snapshots = (GlobalCall.real_time_cpu_data, GlobalCall.real_time_mem_data,
+                            GlobalCall.real_time_net_data, GlobalCall.real_time_disk_data)
+        now = datetime.now()
+        status_key = snapshot_key(*status_snapshots)
+        if status_key is not None:
+            seq = max(status_key)
+            # 与/api/system-status相同的缓存键，响应中包含精确到分钟的当前时间
+            status_key += (now.strftime('%Y%m%d%H%M'),)
+            if status_key != stream_state['status_key']:
+                body, _ = response_cache.get('system-status', status_key,
+                                             lambda: serialize_json(build_system_status(*status_snapshots, now)))
+                metric_broadcaster.publish('status', seq, body=body)
+                stream_state['status_key'] = status_key
+
+    alerts_body = serialize_json(evaluate_alerts())
+    if alerts_body != stream_state['alerts_body']:
+        stream_state['alerts_seq'] += 1
+        metric_broadcaster.publish('alerts', stream_state['alerts_seq'], body=alerts_body)
+        stream_state['alerts_body'] = alerts_body
+
+
+CollectorScheduler().register('MetricStreamPublisher', publish_stream_topics, STREAM_PUBLISH_INTERVAL)
+CollectorScheduler().start()
+
+
+@app.route('/api/stream/metrics')
+def stream_metrics():
+    """SSE推送实时指标，替代前端定时轮询
+    参数: topics 逗号分隔的主题(cpu/mem/net/disk/alerts/status/performance/performance-delta)，默认cpu,mem,net,disk,alerts
+          status推送与/api/system-status相同的数据
+          performance-delta推送与/api/performance-data?since=格式相同的增量帧
+    客户端处理较慢时每个主题只保留最新一条待发送消息，不会积压
+    """
+    topics = [t.strip() for t in request.args.get('topics', 'cpu,mem,net,disk,alerts').split(',') if t.strip()]
+    unknown = [t for t in topics if t not in MetricBroadcaster.TOPICS]
+    if not topics or unknown:
+        return jsonify({'error': f'不支持的主题: {",".join(unknown)}',
+                        'topics': list(MetricBroadcaster.TOPICS)}), 400
+
+    subscription = metric_broadcaster.subscribe(topics)
+    if subscription is None:
+        return jsonify({'error': '订阅连接数已达上限'}), 503
+
+    def generate():
         try:
-            battery_info = psutil.sensors_battery()
-            if battery_info:
-                battery = {
-                    'percent': battery_info.percent,
-                    'secsleft': battery_info.secsleft,
-                    'power_plugged': battery_info.power_plugged
-                }
-        except AttributeError:
-            pass
-        
-        # # 获取CPU名称 - 从system_info.json文件中读取
-        # cpu_name = "Unknown CPU"
-        # try:
-        #     system_info_path = os.path.join(os.path.dirname(__file__), 'system_info.json')
-        #     if os.path.exists(system_info_path):
-        #         with open(system_info_path, 'r', encoding='utf-8') as f:
-        #             system_info_data = json.load(f)
-        #             cpu_name = system_info_data.get('cpu_info', 'Unknown CPU')
-        # except Exception as e:
-        #     print(f"读取system_info.json失败: {e}")
-        #     # 如果读取失败，使用platform.processor()作为备选
-        #     cpu_name = platform.processor()
-        #     if not cpu_name or cpu_name.strip() == '':
-        #         cpu_name = f"Unknown CPU ({cpu_count} cores)"
-        
-        return jsonify({
-            # CPU信息
-            'cpu_percent': cpu_percent,
-            'cpu_percent_per_core': cpu_percent_per_core,
-            'cpu_average': cpu_percent,  # 直接使用总使用率
-            'cpu_name': cpu_name,
-            'cpu_frequency': cpu_frequency_info,
-            'cpu_count_physical': cpu_count,
-            'cpu_count_logical': logical_cpu_count,
-            'load_avg': load_avg,
-            'cpu_details': {
-                'usr': usr,
-                'nice': nice,
-                'sys': sys,
-                'iowait': iowait,
-                'irq': irq,
-                'soft': soft,
-                'steal': steal,
-                'guest': guest,
-                'gnice': gnice,
-                'idle': idle
-            },
+            # 断线后浏览器3秒后自动重连
+            yield b'retry: 3000\n\n'
+            while True:
+                messages = subscription.get(timeout=STREAM_KEEPALIVE)
+                if subscription.closed:
+                    break
+                # 无新数据时发送注释行保持连接
+                yield b''.join(messages) if messages else b': keepalive\n\n'
+        finally:
+            metric_broadcaster.unsubscribe(subscription)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
-            # 内存信息
-            'memory_percent': memory.percent,
-            'memory_used': memory.used,
-            'memory_total': memory.total,
-            'memory_free': memory.free,
-            'memory_cached': memory.cached,
-            'memory_buffers': memory.buffers,
 
-            # 交换内存信息
-            'swap_percent': swap.percent,
-            'swap_used': swap.used,
-            'swap_total': swap.total,
-            'swap_free': swap.free,
-            
-            # 磁盘信息
-            'disk_usage': disk_usage,
-            'disk_io': disk_io_data,
-            'total_utilization': total_utilization,
-            
-            # 网络信息
-            'network_io': total_io if net_data else {
-                'bytes_sent': net_io.bytes_sent,
-                'bytes_recv': net_io.bytes_recv,
-                'packets_sent': net_io.packets_sent,
-                'packets_recv': net_io.packets_recv,
-                'errin': net_io.errin,
-                'errout': net_io.errout,
-                'dropin': net_io.dropin,
-                'dropout': net_io.dropout,
-            },
-            'rx_speed': rx_speed,
-            'tx_speed': tx_speed,
-            'network_interfaces': net_interfaces,
-            
-            # 进程信息
-            'top_processes': top_processes,
-            'process_count': len(list(psutil.process_iter())),
-            
-            # 电池信息
-            'battery': battery,
-            
-            # 系统信息
-            'boot_time': psutil.boot_time(),
-            'timestamp': time.time()
-        })
+@app.route('/api/stream/stats')
+def get_stream_stats():
+    """获取推送连接数和因客户端处理慢而被覆盖的消息数"""
+    try:
+        return jsonify(metric_broadcaster.get_stats())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+
+# Prometheus/OpenMetrics指标导出：各采集器快照序号不变时直接返回缓存的文本，
+# 即每个采集周期只生成一次；请求统计等自身指标随之按采集周期更新
+from extune.common import openmetrics
+PROCESS_START_TIME = time.time()
+
+
+def build_openmetrics(cpu, mem, net, disk):
+    """生成所有采集指标及KY-ops自身指标的OpenMetrics文本"""
+    builder = openmetrics.OpenMetricsBuilder()
+    openmetrics.add_cpu_metrics(builder, cpu)
+    openmetrics.add_memory_metrics(builder, mem)
+    openmetrics.add_network_metrics(builder, net)
+    openmetrics.add_disk_metrics(builder, disk)
+    openmetrics.add_collector_metrics(builder, get_collector_stats() or {})
+    openmetrics.add_request_metrics(builder, request_metrics.get_histograms())
+    stream_stats = metric_broadcaster.get_stats()
+    builder.gauge('stream_subscribers', 'Connected SSE subscribers', stream_stats['subscribers'])
+    builder.gauge('start_time_seconds', 'Start time of this KY-ops process', PROCESS_START_TIME)
+    return builder.render()
+
+
+@app.route('/metrics')
+def get_openmetrics():
+    """Prometheus抓取接口（OpenMetrics文本格式）"""
+    snapshots = (GlobalCall.real_time_cpu_data, GlobalCall.real_time_mem_data,
+                 GlobalCall.real_time_net_data, GlobalCall.real_time_disk_data)
+    body, etag = response_cache.get('openmetrics', snapshot_key(*snapshots),
+                                    lambda: build_openmetrics(*snapshots))
+    response = Response(body, content_type=openmetrics.CONTENT_TYPE)
+    if etag is not None:
+        # 同一份文本的压缩结果按ETag缓存
+        response.set_etag(etag)
+    return response
+
+
+# 安全状态：防火墙和软件更新状态在后台按较长周期刷新（apt list --upgradable耗时数秒且需要apt锁），
+# 登录失败次数由认证日志增量计数，接口只读取缓存结果
+# shared模式下这些任务只在采集进程中运行，结果写入共享快照，各Web进程不重复执行外部命令和读取认证日志
+if COLLECTOR_MODE == 'shared':
+    def get_security_facts():
+        return shared_snapshots.read(SECURITY_REGION, only_new=False)
+else:
+    get_security_facts = start_security_collectors()
+# 到期的后台信息按周期刷新，不依赖接口访问触发
+CollectorScheduler().register('HostFactsRefresh', host_facts.prefetch, 60)
+CollectorScheduler().start()
+
+
 @app.route('/api/security-status')
 def get_security_status():
-    """获取安全状态信息"""
+    """获取安全状态信息（读取后台缓存，不在请求中执行外部命令）"""
     try:
-        # 检查防火墙状态 (Windows)
-        firewall_active = False
-        try:
-            if platform.system() == 'Windows':
-                firewall_result = subprocess.run(['netsh', 'advfirewall', 'show', 'allprofiles', 'state'], 
-                                               capture_output=True, text=True, shell=True)
-                firewall_active = 'ON' in firewall_result.stdout
-            else:
-                firewall_result = subprocess.run(['ufw', 'status'], capture_output=True, text=True)
-                firewall_active = 'Status: active' in firewall_result.stdout
-        except:
-            firewall_active = True  # 默认假设防火墙开启
-        
-        # 检查Windows Defender状态
-        antivirus_active = False
-        try:
-            if platform.system() == 'Windows':
-                defender_result = subprocess.run(['powershell', '-Command', 
-                    'Get-MpComputerStatus | Select-Object -ExpandProperty RealTimeProtectionEnabled'], 
-                    capture_output=True, text=True, shell=True)
-                antivirus_active = 'True' in defender_result.stdout
-            else:
-                antivirus_active = True  # Linux系统默认假设有防护
-        except:
-            antivirus_active = True
-        
-        # 检查系统更新状态
-        updates_available = 0
-        try:
-            if platform.system() == 'Windows':
-                # Windows更新检查
-                update_result = subprocess.run(['powershell', '-Command', 
-                    'Get-WindowsUpdate -AcceptAll | Measure-Object | Select-Object -ExpandProperty Count'], 
-                    capture_output=True, text=True, shell=True)
-                try:
-                    updates_available = int(update_result.stdout.strip())
-                except:
-                    updates_available = 3  # 模拟数据
-            else:
-                # Linux更新检查
-                update_result = subprocess.run(['apt', 'list', '--upgradable'], capture_output=True, text=True)
-                updates_available = len(update_result.stdout.split('\n')) - 2
-        except:
-            updates_available = 3  # 模拟数据
-        
-        # 检查登录失败次数
-        failed_logins = 0
-        try:
-            if platform.system() == 'Windows':
-                # Windows事件日志检查
-                event_result = subprocess.run(['powershell', '-Command', 
-                    'Get-EventLog -LogName Security -InstanceId 4625 -Newest 10 | Measure-Object | Select-Object -ExpandProperty Count'], 
-                    capture_output=True, text=True, shell=True)
-                try:
-                    failed_logins = int(event_result.stdout.strip())
-                except:
-                    failed_logins = 0
-            else:
-                auth_log = subprocess.run(['grep', 'Failed password', '/var/log/auth.log'], capture_output=True, text=True)
-                failed_logins = len(auth_log.stdout.split('\n')) - 1
-        except:
-            failed_logins = 0
-        
+        facts = get_security_facts()
+        if facts is None:
+            return jsonify({'error': '采集进程未运行'}), 503
+        firewall_active = facts['firewall_active']
+        antivirus_active = facts['antivirus_active']
+        updates_available = facts['updates_available']
+        # 最近24小时的登录失败次数
+        failed_logins = facts['failed_logins']
+
         # 计算总体安全评分
         security_score = 100
         if not firewall_active:
@@ -1528,66 +1999,67 @@ def get_security_status():
             security_score -= 10
         
         security_level = "excellent" if security_score >= 90 else "good" if security_score >= 70 else "warning" if security_score >= 50 else "critical"
-        
+
+        last_check = facts['last_check']
+        updates_checked = facts['updates_checked']
         return jsonify({
             'firewall_active': firewall_active,
             'antivirus_active': antivirus_active,
             'updates_available': updates_available,
             'failed_logins': failed_logins,
+            'failed_logins_last_hour': facts['failed_logins_last_hour'],
             'security_score': security_score,
             'security_level': security_level,
-            'last_check': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'last_check': datetime.fromtimestamp(last_check or time.time()).strftime('%Y-%m-%d %H:%M:%S'),
             'threats_blocked': 0,  # 模拟数据
             'permission_requests': 2,  # 模拟数据
             'last_scan': datetime.now().strftime('%Y-%m-%d'),
-            'definitions_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            'definitions_updated': datetime.fromtimestamp(updates_checked or time.time()).strftime('%Y-%m-%d %H:%M:%S')
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# 文件完整性扫描：后台任务计算系统目录下文件的摘要，与上一次完成的扫描结果（基线）比较
+from extune.common.integrity_scanner import IntegrityScanner
+integrity_scanner = IntegrityScanner(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                  'integrity', 'baseline.json'))
+
+
 @app.route('/api/security-scan', methods=['POST'])
 def start_security_scan():
-    """启动安全扫描"""
+    """启动安全扫描（quick: 可执行文件和引导目录，full: 另含/etc和系统库目录）"""
     try:
-        scan_type = request.json.get('type', 'quick')
-        
-        # 模拟扫描过程
-        scan_results = {
-            'scan_id': f"scan_{int(time.time())}",
-            'type': scan_type,
-            'status': 'running',
-            'progress': 0,
-            'files_scanned': 0,
-            'threats_found': 0,
-            'estimated_time': 300 if scan_type == 'full' else 60,
-            'start_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        
-        return jsonify(scan_results)
+        scan_type = (request.get_json(silent=True) or {}).get('type', 'quick')
+        if scan_type not in integrity_scanner.roots:
+            return jsonify({'error': f'不支持的扫描类型: {scan_type}'}), 400
+
+        status, created = integrity_scanner.start(scan_type)
+        if not created:
+            return jsonify(dict(status, error='已有扫描正在进行')), 409
+        return jsonify(status)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/security-scan/<scan_id>')
 def get_scan_status(scan_id):
-    """获取扫描状态"""
+    """获取扫描状态（进度、吞吐量、与基线的差异）"""
     try:
-        # 模拟扫描进度
-        import random
-        progress = min(random.randint(10, 100), 100)
-        files_scanned = progress * 10
-        threats_found = random.randint(0, 2) if progress > 80 else 0
-        
-        scan_status = {
-            'scan_id': scan_id,
-            'status': 'completed' if progress >= 100 else 'running',
-            'progress': progress,
-            'files_scanned': files_scanned,
-            'threats_found': threats_found,
-            'estimated_time': max(0, 60 - (progress * 0.6)),
-            'current_file': f'C:\\Windows\\System32\\file_{files_scanned}.dll' if progress < 100 else 'Scan completed'
-        }
-        
-        return jsonify(scan_status)
+        status = integrity_scanner.get(scan_id)
+        if status is None:
+            return jsonify({'error': '扫描任务不存在'}), 404
+        return jsonify(status)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/cancel-scan', methods=['POST'])
+def cancel_security_scan():
+    """取消扫描，未指定scan_id时取消当前正在进行的扫描"""
+    try:
+        scan_id = (request.get_json(silent=True) or {}).get('scan_id')
+        cancelled_id = integrity_scanner.cancel(scan_id)
+        if cancelled_id is None:
+            return jsonify({'error': '没有正在进行的扫描'}), 404
+        return jsonify({'success': True, 'scan_id': cancelled_id})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -2122,9 +2594,27 @@ def get_ai_model_info():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# 大文件分段查看：文本文件按窗口读取，编码和行索引按文件版本缓存
+from extune.common.text_viewer import TextFileViewer
+text_viewer = TextFileViewer()
+PREVIEW_WINDOW_BYTES = 64 * 1024
+PREVIEW_MAX_WINDOW_BYTES = 1024 * 1024
+PREVIEW_WINDOW_LINES = 1000
+PREVIEW_MAX_WINDOW_LINES = 10000
+
+
 @app.route('/api/file-preview')
 def file_preview():
-    """文件预览API - 获取文件内容用于预览"""
+    """文件预览API - 获取文件内容用于预览
+
+    文本文件按窗口分段返回，查询参数（均可选，互斥，默认从文件开头读取）：
+        offset     从该字节偏移之后的第一个行首开始
+        line       从该行（从1开始）开始
+        before     读取结束于该字节偏移的窗口，用于向前翻页
+        tail       为1时读取文件末尾
+    以及 max_bytes（默认64KB，最大1MB）、max_lines（默认1000，最大10000）限制窗口大小
+    响应中的window给出窗口的起止字节偏移，翻页时分别作为下一次请求的before/offset
+    """
     try:
         file_path = request.args.get('path')
         if not file_path:
@@ -2153,9 +2643,32 @@ def file_preview():
         file_name = os.path.basename(file_path)
         file_ext = os.path.splitext(file_name)[1].lower()
         
-        # 文件大小限制（10MB）
+        # 文本文件类型
+        text_extensions = {
+            '.txt', '.log', '.md', '.py', '.js', '.html', '.css', '.json', '.xml', '.yml', '.yaml',
+            '.conf', '.cfg', '.ini', '.sh', '.bat', '.ps1', '.sql', '.csv', '.tsv', '.properties',
+            '.dockerfile', '.gitignore', '.gitattributes', '.env', '.htaccess', '.robots'
+        }
+        
+        # 图像文件类型
+        image_extensions = {
+            '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.svg', '.ico', '.tiff', '.tif'
+        }
+        
+        # PDF文件类型
+        pdf_extensions = {'.pdf'}
+        
+        # 扩展名未知但内容为文本的文件（如轮转后的syslog.1）也按文本查看
+        is_text = file_ext in text_extensions or file_ext == ''
+        if not is_text and file_ext not in image_extensions and file_ext not in pdf_extensions:
+            try:
+                is_text = text_viewer.detect_encoding(file_path) is not None
+            except OSError:
+                is_text = False
+        
+        # 文本文件分段读取，其他类型限制文件大小（10MB）
         max_size = 10 * 1024 * 1024
-        if file_size > max_size:
+        if file_size > max_size and not is_text:
             return jsonify({
                 'error': f'文件过大（{format_bytes(file_size)}），无法预览',
                 'file_info': {
@@ -2178,56 +2691,32 @@ def file_preview():
             }
         }
         
-        # 文本文件类型
-        text_extensions = {
-            '.txt', '.log', '.md', '.py', '.js', '.html', '.css', '.json', '.xml', '.yml', '.yaml',
-            '.conf', '.cfg', '.ini', '.sh', '.bat', '.ps1', '.sql', '.csv', '.tsv', '.properties',
-            '.dockerfile', '.gitignore', '.gitattributes', '.env', '.htaccess', '.robots'
-        }
-        
-        # 图像文件类型
-        image_extensions = {
-            '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.svg', '.ico', '.tiff', '.tif'
-        }
-        
-        # PDF文件类型
-        pdf_extensions = {'.pdf'}
-        
-        if file_ext in text_extensions or file_ext == '':
-            # 尝试读取为文本文件
+        if is_text:
+            # 文本文件：按窗口读取
             try:
-                # 尝试不同的编码
-                encodings = ['utf-8', 'gbk', 'gb2312', 'latin-1', 'ascii']
-                content = None
-                used_encoding = None
-                
-                for encoding in encodings:
-                    try:
-                        with open(file_path, 'r', encoding=encoding) as f:
-                            content = f.read()
-                            used_encoding = encoding
-                            break
-                    except UnicodeDecodeError:
-                        continue
-                
-                if content is not None:
-                    # 限制预览内容长度
-                    max_content_length = 50000  # 50KB
-                    if len(content) > max_content_length:
-                        content = content[:max_content_length] + '\n\n... (文件内容过长，已截断)'
-                    
-                    response_data.update({
-                        'type': 'text',
-                        'content': content,
-                        'encoding': used_encoding,
-                        'lines': len(content.split('\n'))
-                    })
+                window_args = {}
+                if request.args.get('tail') == '1':
+                    window_args['before'] = file_size
                 else:
-                    response_data.update({
-                        'type': 'unsupported',
-                        'message': '无法读取文件内容（编码不支持）'
-                    })
-                    
+                    for name in ('offset', 'line', 'before'):
+                        if request.args.get(name) is not None:
+                            window_args[name] = int(request.args.get(name))
+                            break
+                window_args['max_bytes'] = min(max(int(request.args.get('max_bytes', PREVIEW_WINDOW_BYTES)), 1),
+                                               PREVIEW_MAX_WINDOW_BYTES)
+                window_args['max_lines'] = min(max(int(request.args.get('max_lines', PREVIEW_WINDOW_LINES)), 1),
+                                               PREVIEW_MAX_WINDOW_LINES)
+            except ValueError:
+                return jsonify({'error': 'offset/line/before/max_bytes/max_lines必须为整数'}), 400
+
+            try:
+                window = text_viewer.read_window(file_path, **window_args)
+                response_data.update(window, type='text')
+            except ValueError:
+                response_data.update({
+                    'type': 'unsupported',
+                    'message': '无法读取文件内容（二进制文件）'
+                })
             except Exception as e:
                 response_data.update({
                     'type': 'error',
@@ -2262,6 +2751,31 @@ def file_preview():
         traceback.print_exc()
         return jsonify({'error': f'预览文件失败: {str(e)}'}), 500
 
+# 文件发送：支持Range/206（含多区间）和ETag/Last-Modified条件请求
+# 运行在提供wsgi.file_wrapper的服务器（如gunicorn）上时由服务器以sendfile零拷贝发送
+from extune.common import file_range
+
+
+def send_file_ranged(file_path, mimetype, as_attachment=False, download_name=None):
+    """发送文件，处理Range、If-Range、If-None-Match和If-Modified-Since请求头"""
+    import urllib.parse
+    status, headers, body = file_range.build_file_response(
+        file_path, mimetype, request.headers,
+        file_wrapper=request.environ.get('wsgi.file_wrapper'),
+        head=request.method == 'HEAD'
+    )
+    response = Response(body, status=status, headers=headers, direct_passthrough=True)
+    disposition = 'attachment' if as_attachment else 'inline'
+    if download_name:
+        try:
+            download_name.encode('ascii')
+            disposition += '; filename="{}"'.format(download_name.replace('\\', '\\\\').replace('"', '\\"'))
+        except UnicodeEncodeError:
+            disposition += "; filename*=UTF-8''{}".format(urllib.parse.quote(download_name, safe=''))
+    response.headers['Content-Disposition'] = disposition
+    return response
+
+
 @app.route('/api/pdf-viewer')
 def pdf_viewer():
     """PDF查看器API - 专门用于PDF文件预览"""
@@ -2291,21 +2805,13 @@ def pdf_viewer():
         if not os.path.isfile(file_path):
             return jsonify({'error': '指定路径不是文件'}), 400
         
-        # 创建响应
-        response = make_response(send_file(
-            file_path,
-            mimetype='application/pdf',
-            as_attachment=False
-        ))
+        # 创建响应：PDF阅读器翻页时按Range只请求需要的部分
+        response = send_file_ranged(file_path, 'application/pdf')
         
-        # 设置PDF预览的HTTP头部
-        response.headers['Content-Type'] = 'application/pdf'
-        response.headers['Content-Disposition'] = 'inline'
+        # 设置PDF预览的HTTP头部：每次使用前用ETag重新验证，未修改时返回304
         response.headers['X-Frame-Options'] = 'SAMEORIGIN'
         response.headers['Content-Security-Policy'] = "frame-ancestors 'self'"
-        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-        response.headers['Pragma'] = 'no-cache'
-        response.headers['Expires'] = '0'
+        response.headers['Cache-Control'] = 'no-cache'
         
         return response
         
@@ -2373,25 +2879,14 @@ def file_download():
         inline_types = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.svg', '.pdf'}
         as_attachment = file_ext not in inline_types
         
-        # 为PDF文件添加特殊处理
+        # 支持断点续传和条件请求
+        response = send_file_ranged(file_path, mimetype, as_attachment=as_attachment, download_name=file_name)
+        
+        # 为PDF文件添加允许iframe嵌入的头部
         if file_ext == '.pdf':
-            response = make_response(send_file(
-                file_path,
-                mimetype=mimetype,
-                as_attachment=as_attachment,
-                download_name=file_name
-            ))
-            # 添加允许iframe嵌入的头部
             response.headers['X-Frame-Options'] = 'SAMEORIGIN'
             response.headers['Content-Security-Policy'] = "frame-ancestors 'self'"
-            return response
-        else:
-            return send_file(
-                file_path,
-                mimetype=mimetype,
-                as_attachment=as_attachment,
-                download_name=file_name
-            )
+        return response
         
     except Exception as e:
         import traceback
@@ -2401,4 +2896,5 @@ def file_download():
 if __name__ == '__main__':
     print("KY-ops 智能运维管家启动中...")
     print("AI模型将在后台自动加载...")
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # 不使用调试重载器：重载器会再启动一个进程，导致采集器和AI模型重复加载
+    app.run(debug=True, use_reloader=False, threaded=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,178 @@
+"""
+文件下载带宽基准测试
+
+用法: python benchmarks/bench_file_download.py [--size MB] [--repeat N] [--url URL]
+
+在本机回环TCP连接上发送同一个文件，对比/api/file-download的几种发送方式:
+  - 8KiB分块读取后写入socket（原send_file在开发服务器上的方式）
+  - 1MiB分块读取后写入socket（file_range在没有wsgi.file_wrapper时的方式）
+  - os.sendfile零拷贝（gunicorn等服务器通过wsgi.file_wrapper使用的方式）
+以及读取末尾64KiB区间（续传/PDF翻页）与读取整个文件的耗时对比。
+指定--url（如 http://127.0.0.1:5000/api/file-download?path=/path/to/file）时另外测试运行中服务的
+整文件下载、Range请求和ETag条件请求。
+"""
+import argparse
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from extune.common.file_range import iter_file_range
+
+
+def make_file(size):
+    f = tempfile.NamedTemporaryFile(prefix='bench_download_', delete=False)
+    block = os.urandom(1024 * 1024)
+    for _ in range(size // len(block)):
+        f.write(block)
+    f.write(block[:size % len(block)])
+    f.close()
+    return f.name
+
+
+def connected_pair():
+    """返回回环TCP连接的(发送端, 接收端)"""
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    sender = socket.create_connection(listener.getsockname())
+    receiver, _ = listener.accept()
+    listener.close()
+    return sender, receiver
+
+
+def drain(sock, expected, result):
+    buf = bytearray(1024 * 1024)
+    received = 0
+    while received < expected:
+        n = sock.recv_into(buf)
+        if not n:
+            break
+        received += n
+    result.append(received)
+
+
+def send_blocks(path, sock, block_size):
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(block_size)
+            if not data:
+                break
+            sock.sendall(data)
+
+
+def send_range_iter(path, sock):
+    size = os.path.getsize(path)
+    for data in iter_file_range(open(path, 'rb'), 0, size):
+        sock.sendall(data)
+
+
+def send_zero_copy(path, sock):
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        offset = 0
+        while offset < size:
+            sent = os.sendfile(sock.fileno(), f.fileno(), offset, size - offset)
+            if sent == 0:
+                break
+            offset += sent
+
+
+def measure_transfer(send, path, repeat):
+    """返回最短传输耗时(秒)"""
+    size = os.path.getsize(path)
+    best = None
+    for _ in range(repeat):
+        sender, receiver = connected_pair()
+        result = []
+        thread = threading.Thread(target=drain, args=(receiver, size, result))
+        thread.start()
+        start = time.perf_counter()
+        send(path, sender)
+        sender.shutdown(socket.SHUT_WR)
+        thread.join()
+        elapsed = time.perf_counter() - start
+        sender.close()
+        receiver.close()
+        if result[0] != size:
+            raise RuntimeError('received {} of {} bytes'.format(result[0], size))
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_local(size_mb, repeat):
+    size = size_mb * 1024 * 1024
+    path = make_file(size)
+    try:
+        print('== 回环TCP发送 {} MiB 文件'.format(size_mb))
+        methods = [
+            ('8KiB分块', lambda p, s: send_blocks(p, s, 8192)),
+            ('1MiB分块', send_range_iter),
+        ]
+        if hasattr(os, 'sendfile'):
+            methods.append(('sendfile', send_zero_copy))
+        else:
+            print('   (当前平台不支持os.sendfile)')
+        baseline = None
+        for label, send in methods:
+            elapsed = measure_transfer(send, path, repeat)
+            baseline = baseline or elapsed
+            print('   {:<10} {:8.1f} MiB/s  ({:.1f}x)'.format(label, size_mb / elapsed, baseline / elapsed))
+
+        print('== 区间读取（续传/PDF翻页）')
+        full = min(timeit_read(path, 0, size) for _ in range(repeat))
+        tail = min(timeit_read(path, size - 65536, size) for _ in range(repeat))
+        print('   整个文件     {:10.2f} ms'.format(full * 1000))
+        print('   末尾64KiB   {:10.3f} ms  ({:.0f}x)'.format(tail * 1000, full / tail))
+    finally:
+        os.unlink(path)
+
+
+def timeit_read(path, start, end):
+    begin = time.perf_counter()
+    for _ in iter_file_range(open(path, 'rb'), start, end):
+        pass
+    return time.perf_counter() - begin
+
+
+def run_url(url, repeat):
+    import requests
+    print('== {}'.format(url))
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = requests.get(url, stream=True)
+        response.raise_for_status()
+        size = sum(len(chunk) for chunk in response.iter_content(1024 * 1024))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print('   整文件下载   {:10.1f} MiB/s  ({} 字节)'.format(size / 1048576 / best, size))
+
+    etag = response.headers.get('ETag')
+    start = time.perf_counter()
+    partial = requests.get(url, headers={'Range': 'bytes=-65536'})
+    print('   Range末尾64KiB  状态 {}  {:.2f} ms'.format(partial.status_code, (time.perf_counter() - start) * 1000))
+    if etag:
+        start = time.perf_counter()
+        cached = requests.get(url, headers={'If-None-Match': etag})
+        print('   If-None-Match   状态 {}  {:.2f} ms'.format(cached.status_code, (time.perf_counter() - start) * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=512, help='测试文件大小(MiB)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--url', help='运行中服务的文件下载地址')
+    args = parser.parse_args()
+
+    run_local(args.size, args.repeat)
+    if args.url:
+        run_url(args.url, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
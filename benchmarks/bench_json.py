@@ -0,0 +1,115 @@
+"""
+JSON序列化与响应压缩基准测试
+
+用法: python benchmarks/bench_json.py [--processes N] [--connections N] [--repeat N]
+
+以/api/processes和/api/network-connections的实际响应结构为样本，对比:
+  - 标准库json（Flask默认参数: ensure_ascii, sort_keys）与orjson（如已安装）的序列化耗时
+  - 原始大小与gzip/deflate压缩后的大小及压缩耗时
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import timeit
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def sample_processes(count):
+    """从本机进程表取样，不足count个时按已有进程复制补足"""
+    try:
+        from extune.common.process_table import ProcessTable
+        table = ProcessTable()
+        table.refresh()
+        _, processes = table.query(max_age=None)
+    except Exception:
+        processes = []
+    if not processes:
+        processes = [{
+            'pid': 1, 'ppid': 0, 'name': 'systemd', 'user': 'root', 'uid': 0, 'pr': 20, 'ni': 0,
+            'virt': 171520, 'res': 13264, 'shr': 8412, 's': 'S', 'status': 'sleeping',
+            'cpu_percent': 0.0, 'mem_percent': 0.1, 'time': '0:12.34', 'threads': 1,
+            'create_time': 1700000000.0, 'command': 'systemd'
+        }]
+    result = []
+    for i in range(count):
+        proc = dict(processes[i % len(processes)])
+        proc['pid'] = i + 1
+        proc['cpu_percent'] = round(random.random() * 100, 1)
+        result.append(proc)
+    return result
+
+
+def sample_connections(count):
+    """按/api/network-connections的结构生成连接列表"""
+    states = ['ESTABLISHED', 'LISTEN', 'TIME_WAIT', 'CLOSE_WAIT', 'NONE']
+    return [{
+        'laddr': '192.168.{}.{}'.format(random.randint(0, 255), random.randint(1, 254)),
+        'lport': random.randint(1, 65535),
+        'raddr': '10.{}.{}.{}'.format(random.randint(0, 255), random.randint(0, 255), random.randint(1, 254)),
+        'rport': random.randint(1, 65535),
+        'status': random.choice(states),
+        'pid': random.choice([None, random.randint(1, 50000)]),
+        'type': random.choice(['TCP', 'UDP'])
+    } for _ in range(count)]
+
+
+def stdlib_dumps(obj):
+    return json.dumps(obj, ensure_ascii=True, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def orjson_dumps(obj):
+    return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+
+
+def measure(func, repeat):
+    """返回单次调用的最短耗时(毫秒)"""
+    return min(timeit.repeat(func, number=1, repeat=repeat)) * 1000
+
+
+def run(name, payload, repeat):
+    print('== {} ({} 条)'.format(name, len(payload)))
+    serializers = [('json', stdlib_dumps)]
+    if orjson is not None:
+        serializers.append(('orjson', orjson_dumps))
+    else:
+        print('   (未安装orjson，仅测试标准库)')
+
+    baseline = None
+    for label, dumps in serializers:
+        ms = measure(lambda: dumps(payload), repeat)
+        baseline = baseline or ms
+        print('   {:<8} 序列化 {:8.2f} ms  ({:.1f}x)'.format(label, ms, baseline / ms))
+
+    body = serializers[-1][1](payload)
+    print('   原始大小  {:10d} 字节'.format(len(body)))
+    for label, compress in (('gzip', lambda: gzip.compress(body, compresslevel=6, mtime=0)),
+                            ('deflate', lambda: zlib.compress(body, 6))):
+        ms = measure(compress, repeat)
+        size = len(compress())
+        print('   {:<8} {:10d} 字节  ({:.1f}%)  压缩 {:.2f} ms'.format(label, size, size * 100.0 / len(body), ms))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=2000)
+    parser.add_argument('--connections', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(0)
+    run('/api/processes', sample_processes(args.processes), args.repeat)
+    run('/api/network-connections', sample_connections(args.connections), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+"""
+实时采集进程 - 独立运行各实时采集器，将采集快照写入共享内存文件供多个Web进程只读访问
+
+用法:
+  python collector_daemon.py
+  KYOPS_COLLECTOR_MODE=shared gunicorn -w 4 --threads 8 app:app
+
+默认模式(embedded)下app.py在自身进程内启动采集器，不需要本进程。
+共享文件路径默认为/dev/shm/ky-ops-snapshots，可通过KYOPS_SHARED_SNAPSHOT修改。
+指标汇总最细一层的序列数上限默认为256，可通过KYOPS_ROLLUP_MAX_SERIES修改。
+"""
+import os
+import platform
+import shutil
+import signal
+import subprocess
+import threading
+
+# (采集器名称, GlobalCall中的属性名, 推送主题)
+COLLECTORS = (
+    ('RealTimeCPU', 'real_time_cpu_data', 'cpu'),
+    ('RealTimeMemory', 'real_time_mem_data', 'mem'),
+    ('RealTimeNet', 'real_time_net_data', 'net'),
+    ('RealTimeDisk', 'real_time_disk_data', 'disk'),
+    ('RealTimeSysMessage', 'real_time_sys_message_data', None)
+)
+# 共享文件中保存调度记录(/api/collectors)的区域
+SCHEDULER_REGION = 'CollectorScheduler'
+# 共享文件中保存安全状态(/api/security-status)的区域
+SECURITY_REGION = 'SecurityStatus'
+SHARED_SNAPSHOT_PATH = os.environ.get(
+    'KYOPS_SHARED_SNAPSHOT',
+    '/dev/shm/ky-ops-snapshots' if os.path.isdir('/dev/shm') else '/tmp/ky-ops-snapshots')
+METRICS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'metrics')
+# 汇总文件最细一层(10秒精度)保存的序列数上限, 采集进程与Web进程须使用相同的值
+ROLLUP_MAX_SERIES = int(os.environ.get('KYOPS_ROLLUP_MAX_SERIES', 256))
+SECURITY_UPDATES_TTL = 3600
+SECURITY_FIREWALL_TTL = 300
+AUTH_LOG_INTERVAL = 10
+
+
+def start_collectors(interval=2):
+    """启动各实时采集器，返回{采集器名称: 采集器实例}，启动失败的为None"""
+    monitors = {}
+
+    # 初始化实时CPU监控
+    try:
+        from extune.category.get_cpu_info import RealTimeCPU
+        monitors['RealTimeCPU'] = RealTimeCPU(interval=interval)
+        monitors['RealTimeCPU'].start_broadcasting()
+        print("CPU实时监控已启动")
+    except ImportError as e:
+        print(f"无法导入实时CPU监控: {e}")
+        monitors['RealTimeCPU'] = None
+    except Exception as e:
+        print(f"启动实时CPU监控失败: {e}")
+        monitors['RealTimeCPU'] = None
+
+    # 初始化实时内存监控
+    try:
+        from extune.category.get_memory_info import RealTimeMemory
+        monitors['RealTimeMemory'] = RealTimeMemory(interval=interval)
+        monitors['RealTimeMemory'].start_broadcasting()
+        print("内存实时监控已启动")
+    except ImportError as e:
+        print(f"无法导入实时内存监控: {e}")
+        monitors['RealTimeMemory'] = None
+    except Exception as e:
+        print(f"启动实时内存监控失败: {e}")
+        monitors['RealTimeMemory'] = None
+
+    # 初始化实时网络监控
+    try:
+        from extune.category.get_net_info import RealTimeNet
+        monitors['RealTimeNet'] = RealTimeNet(interval=interval)
+        monitors['RealTimeNet'].start_broadcasting()
+        print("网络实时监控已启动")
+    except ImportError as e:
+        print(f"无法导入实时网络监控: {e}")
+        monitors['RealTimeNet'] = None
+    except Exception as e:
+        print(f"启动实时网络监控失败: {e}")
+        monitors['RealTimeNet'] = None
+
+    # 初始化实时磁盘监控
+    try:
+        from extune.category.get_disk_info import RealTimeDisk
+        monitors['RealTimeDisk'] = RealTimeDisk(interval=interval)
+        monitors['RealTimeDisk'].start_broadcasting()
+        print("磁盘实时监控已启动")
+    except ImportError as e:
+        print(f"无法导入实时磁盘监控: {e}")
+        monitors['RealTimeDisk'] = None
+    except Exception as e:
+        print(f"启动实时磁盘监控失败: {e}")
+        monitors['RealTimeDisk'] = None
+
+    try:
+        from extune.category.get_system_message import RealTimeSysMessage
+        monitors['RealTimeSysMessage'] = RealTimeSysMessage(interval=interval)
+        monitors['RealTimeSysMessage'].start_broadcasting()
+        print("系统消息实时监控已启动")
+    except ImportError as e:
+        print(f"无法导入系统消息实时监控: {e}")
+        monitors['RealTimeSysMessage'] = None
+    except Exception as e:
+        print(f"启动系统消息实时监控失败: {e}")
+        monitors['RealTimeSysMessage'] = None
+
+    return monitors
+
+
+def load_firewall_state():
+    """检查防火墙状态"""
+    try:
+        if platform.system() == 'Windows':
+            firewall_result = subprocess.run(['netsh', 'advfirewall', 'show', 'allprofiles', 'state'],
+                                             capture_output=True, text=True, shell=True, timeout=30)
+            return 'ON' in firewall_result.stdout
+        firewall_result = subprocess.run(['ufw', 'status'], capture_output=True, text=True, timeout=30)
+        return 'Status: active' in firewall_result.stdout
+    except:
+        return True  # 默认假设防火墙开启
+
+
+def load_antivirus_state():
+    """检查Windows Defender状态，Linux系统默认假设有防护"""
+    try:
+        if platform.system() == 'Windows':
+            defender_result = subprocess.run(['powershell', '-Command',
+                'Get-MpComputerStatus | Select-Object -ExpandProperty RealTimeProtectionEnabled'],
+                capture_output=True, text=True, shell=True, timeout=60)
+            return 'True' in defender_result.stdout
+        return True
+    except:
+        return True
+
+
+def load_updates_available():
+    """检查可更新的软件包数量"""
+    if platform.system() == 'Windows':
+        update_result = subprocess.run(['powershell', '-Command',
+            'Get-WindowsUpdate -AcceptAll | Measure-Object | Select-Object -ExpandProperty Count'],
+            capture_output=True, text=True, shell=True, timeout=600)
+        return int(update_result.stdout.strip())
+    if shutil.which('apt'):
+        update_result = subprocess.run(['apt', 'list', '--upgradable'], capture_output=True, text=True, timeout=600)
+        # 跳过"Listing..."标题行
+        return sum(1 for line in update_result.stdout.splitlines() if '/' in line)
+    for command in ('dnf', 'yum'):
+        if shutil.which(command):
+            # 有可更新包时返回码为100，每个包一行（名称、版本、仓库）
+            update_result = subprocess.run([command, 'check-update', '-q'],
+                                           capture_output=True, text=True, timeout=600)
+            return sum(1 for line in update_result.stdout.splitlines() if len(line.split()) == 3)
+    return 0
+
+
+def start_security_collectors():
+    """注册安全状态的后台刷新任务（防火墙/更新检查、认证日志计数），返回读取当前安全状态的函数"""
+    from extune.common.auth_failures import AuthFailureCounter
+    from extune.common.collector_scheduler import CollectorScheduler
+    from extune.common.host_facts import HostFactsRegistry
+
+    host_facts = HostFactsRegistry()
+    host_facts.register('firewall_active', load_firewall_state, ttl=SECURITY_FIREWALL_TTL, background=True,
+                        default=True)
+    host_facts.register('antivirus_active', load_antivirus_state, ttl=SECURITY_FIREWALL_TTL, background=True,
+                        default=True)
+    host_facts.register('updates_available', load_updates_available, ttl=SECURITY_UPDATES_TTL, background=True,
+                        default=0)
+    host_facts.prefetch()
+    # 到期的后台信息按周期刷新，不依赖接口访问触发
+    CollectorScheduler().register('HostFactsRefresh', host_facts.prefetch, 60)
+
+    auth_failure_counter = AuthFailureCounter(bucket=60, retention=24 * 3600)
+    CollectorScheduler().register('AuthFailureCounter', auth_failure_counter.update, AUTH_LOG_INTERVAL)
+
+    def get_security_facts():
+        fact_status = host_facts.get_status()
+        return {
+            'firewall_active': host_facts.get('firewall_active'),
+            'antivirus_active': host_facts.get('antivirus_active'),
+            'updates_available': host_facts.get('updates_available'),
+            'failed_logins': auth_failure_counter.count(24 * 3600),
+            'failed_logins_last_hour': auth_failure_counter.count(3600),
+            'last_check': max(fact_status[name]['load_time']
+                              for name in ('firewall_active', 'antivirus_active', 'updates_available')),
+            'updates_checked': fact_status['updates_available']['load_time']
+        }
+    return get_security_facts
+
+
+def main():
+    from extune.common.collector_scheduler import CollectorScheduler, RealTimeCollector
+    from extune.common.metric_rollup import MetricRollup
+    from extune.common.metric_store import MetricStore
+    from extune.common.shared_snapshot import SharedSnapshotWriter
+    from extune.common.snapshot import Snapshot
+
+    # 汇总文件只由本进程写入，Web进程以只读方式查询
+    try:
+        metric_rollup = MetricRollup(METRICS_PATH, max_series=ROLLUP_MAX_SERIES)
+    except Exception as e:
+        print(f"无法打开指标汇总文件: {e}")
+        metric_rollup = None
+    MetricStore(retention=24 * 3600, max_series=1000, rollup=metric_rollup)
+
+    writer = SharedSnapshotWriter(SHARED_SNAPSHOT_PATH,
+                                  [c[0] for c in COLLECTORS] + [SCHEDULER_REGION, SECURITY_REGION])
+    RealTimeCollector.listeners.append(writer.write)
+    print(f"共享快照文件: {SHARED_SNAPSHOT_PATH}")
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop_event.set())
+
+    start_collectors()
+    get_security_facts = start_security_collectors()
+    try:
+        while not stop_event.wait(1):
+            writer.write(SCHEDULER_REGION, Snapshot(CollectorScheduler().get_stats()))
+            writer.write(SECURITY_REGION, Snapshot(get_security_facts()))
+    finally:
+        # stop等待进行中的采集结束, 之后不会再有写入, 可以关闭映射
+        CollectorScheduler().stop()
+        RealTimeCollector.listeners.remove(writer.write)
+        writer.close()
+        if metric_rollup is not None:
+            metric_rollup.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -18,6 +18,9 @@ try:
     from common.global_parameter import GlobalParameter
     from common.config import Config
     from common.log import Logger
+    from common.process_table import ProcessTable
+    from common.collector_scheduler import RealTimeCollector
+    from common.snapshot import Snapshot
 except:
     from ..common.customizefunctionthread import CustomizeFunctionThread
     from ..common.file import FileOperation
@@ -26,11 +29,15 @@ except:
     from ..common.global_parameter import GlobalParameter
     from ..common.config import Config
     from ..common.log import Logger
+    from ..common.process_table import ProcessTable
+    from ..common.collector_scheduler import RealTimeCollector
+    from ..common.snapshot import Snapshot
 
 
 import threading
 import time
 import subprocess
+import os
 import re
 import json
 try:
@@ -39,11 +46,93 @@ except:
     from ..common.global_call import GlobalCall
 
 
-class RealTimeCPU:
-    def __init__(self, interval=2):
-        self.interval = interval
-        self._stop_event = threading.Event()
-        self.thread = None
+class ProcStatSampler:
+    '''
+        基于/proc/stat的CPU使用率采样器
+        每次采样只读取一次/proc/stat, 与上一次快照的jiffies差值计算各状态占比,
+        字段含义与mpstat一致
+    '''
+    PROC_STAT = '/proc/stat'
+    # /proc/stat中cpu行各列依次对应的字段
+    FIELDS = ('user', 'nice', 'system', 'idle', 'iowait', 'irq', 'softirq', 'steal', 'guest', 'guest_nice')
+
+    def __init__(self):
+        # 上一次快照 {'cpu': (...), 'cpu0': (...), ...}
+        self.__prev = {}
+
+    def __read_snapshot(self):
+        '''
+            读取/proc/stat中所有cpu行, 返回{名称: jiffies元组}
+        '''
+        snapshot = {}
+        with open(self.PROC_STAT, 'r') as f:
+            for line in f:
+                if not line.startswith('cpu'):
+                    # cpu行位于文件开头, 遇到其他行即可结束
+                    break
+                parts = line.split()
+                values = [int(v) for v in parts[1:len(self.FIELDS) + 1]]
+                # 老内核可能缺少steal/guest/guest_nice列
+                values.extend([0] * (len(self.FIELDS) - len(values)))
+                snapshot[parts[0]] = tuple(values)
+        return snapshot
+
+    @staticmethod
+    def __calc_percent(cur, prev):
+        '''
+            根据两次快照的差值计算各状态百分比(与mpstat口径一致)
+        '''
+        delta = [max(c - p, 0) for c, p in zip(cur, prev)]
+        user, nice, system, idle, iowait, irq, softirq, steal, guest, guest_nice = delta
+        # user/nice已包含guest/guest_nice, 总量中不重复计算
+        total = user + nice + system + idle + iowait + irq + softirq + steal
+        if total <= 0:
+            return None
+
+        def pct(v):
+            return v * 100.0 / total
+
+        return {
+            'usr': pct(max(user - guest, 0)),
+            'nice': pct(max(nice - guest_nice, 0)),
+            'sys': pct(system),
+            'iowait': pct(iowait),
+            'irq': pct(irq),
+            'soft': pct(softirq),
+            'steal': pct(steal),
+            'guest': pct(guest),
+            'gnice': pct(guest_nice),
+            'idle': pct(idle)
+        }
+
+    def sample(self):
+        '''
+            采样一次, 返回(总体各状态百分比, 每个核心使用率列表)
+            首次采样时没有上一次快照, 以开机以来的累计值计算
+        '''
+        cur = self.__read_snapshot()
+        zero = (0,) * len(self.FIELDS)
+
+        total = self.__calc_percent(cur.get('cpu', zero), self.__prev.get('cpu', zero))
+        core_usage = []
+        # 按核心编号排序, 保证与mpstat输出顺序一致
+        cores = sorted((name for name in cur if name != 'cpu'), key=lambda n: int(n[3:]))
+        for name in cores:
+            core = self.__calc_percent(cur[name], self.__prev.get(name, zero))
+            core_usage.append(100.0 - core['idle'] if core else 0.0)
+
+        self.__prev = cur
+        return total, core_usage
+
+
+class RealTimeCPU(RealTimeCollector):
+    TOPIC = 'cpu'
+
+    def __init__(self, interval=2, top_n=10):
+        super().__init__(interval)
+        self.top_n = top_n
+        self.__sampler = ProcStatSampler()
+        self.__process_table = ProcessTable()
         self.data = {
             'model_name': '',
             'total_usage': 0.0,
@@ -52,121 +141,80 @@ class RealTimeCPU:
             'load_avg': [0.0, 0.0, 0.0],  # 1分钟,5分钟,15分钟平均负载
             'cpu_freq': 0.0,  # CPU当前频率
             'logical_cpu_count': 0,  # 逻辑CPU数量
-            'top_processes': []  # top进程列表
+            'top_processes': [],  # top进程列表
+            'process_count': 0  # 进程总数
         }
         # 添加广播功能
         GlobalCall.real_time_cpu_data = self.data
 
-    def __collect_real_time_data(self):
-        """使用命令行工具采集实时CPU数据"""
+    @staticmethod
+    def __read_cpuinfo():
+        '''
+            读取/proc/cpuinfo, 返回(CPU型号, 当前平均频率MHz)
+        '''
+        model_name = ''
+        freqs = []
+        with open('/proc/cpuinfo', 'r') as f:
+            for line in f:
+                if line.startswith('model name') and not model_name:
+                    model_name = line.split(':', 1)[1].strip()
+                elif line.startswith('cpu MHz'):
+                    try:
+                        freqs.append(float(line.split(':', 1)[1]))
+                    except ValueError:
+                        continue
+        cpu_freq = sum(freqs) / len(freqs) if freqs else 0.0
+        return model_name, cpu_freq
+
+    def _get_metric_series(self):
+        """需要保存历史的CPU指标"""
+        data = self.data
+        series = {'cpu.total': data['total_usage']}
+        for key in ('usr', 'nice', 'sys', 'iowait', 'irq', 'soft', 'steal', 'guest', 'gnice', 'idle'):
+            series['cpu.' + key] = data[key]
+        for i, usage in enumerate(data['core_usage']):
+            series['cpu.core.{}'.format(i)] = usage
+        if data['load_avg']:
+            series['cpu.load1'], series['cpu.load5'], series['cpu.load15'] = data['load_avg'][:3]
+        return series
+
+    def _collect_real_time_data(self):
+        """读取/proc文件系统采集实时CPU数据"""
         try:
-            # 1. 获取CPU使用率
-            cmd = "mpstat -P ALL 1 1"
-            output = subprocess.check_output(cmd, shell=True, text=True)
-            lines = output.splitlines()
-            core_data = []
-            total_usage = 0.0
-            cpu_counter = 0
-            usr = 0.0
-            nice = 0.0
-            sys = 0.0
-            iowait = 0.0
-            irq = 0.0
-            soft = 0.0
-            steal = 0.0
-            guest = 0.0
-            gnice = 0.0
-            idle = 0.0
-
-            for line in lines:
-                if line.startswith('Average:') or line.startswith('平均时间:'):
-                    parts = line.split()
-                    if parts[1] == 'all':
-                        total_usage = 100.0 - float(parts[11])  # 100 - %idle
-                        # %usr   %nice    %sys %iowait    %irq   %soft  %steal  %guest  %gnice   %idle
-                        usr = float(parts[2])
-                        nice = float(parts[3])
-                        sys = float(parts[4])
-                        iowait = float(parts[5])
-                        irq = float(parts[6])
-                        soft = float(parts[7])
-                        steal = float(parts[8])
-                        guest = float(parts[9])
-                        gnice = float(parts[10])
-                        idle = float(parts[11])
-                    elif parts[1].isdigit():
-                        core_id = int(parts[1])
-                        cpu_counter = cpu_counter + 1
-                        idle = float(parts[11])
-                        usage = 100.0 - idle
-                        core_data.append(usage)
-
-            # 2. 获取CPU型号
-            cmd = "cat /proc/cpuinfo | grep 'model name' | head -n 1"
-            output = subprocess.check_output(cmd, shell=True, text=True)
-            model_name = ''
-            for line in output.splitlines():
-                if line.startswith('model name'):
-                    parts = line.split(':')
-                    model_name = parts[1].strip()
-                    break
+            # 1. 获取CPU使用率(/proc/stat差值)
+            total, core_data = self.__sampler.sample()
+            total = total or {}
+            usr = total.get('usr', 0.0)
+            nice = total.get('nice', 0.0)
+            sys = total.get('sys', 0.0)
+            iowait = total.get('iowait', 0.0)
+            irq = total.get('irq', 0.0)
+            soft = total.get('soft', 0.0)
+            steal = total.get('steal', 0.0)
+            guest = total.get('guest', 0.0)
+            gnice = total.get('gnice', 0.0)
+            idle = total.get('idle', 100.0)
+            total_usage = 100.0 - idle
+            cpu_counter = len(core_data)
+
+            # 2. 获取CPU型号和频率
+            model_name, cpu_freq = self.__read_cpuinfo()
 
             # 3. 获取平均负载
             with open('/proc/loadavg', 'r') as f:
                 load_avg_str = f.read().split()
                 load_avg = list(map(float, load_avg_str[:3]))
 
-            # 4. 获取CPU频率
-            cmd = "lscpu | grep 'CPU MHz' | awk '{print $NF}'"
-            output = subprocess.check_output(cmd, shell=True, text=True)
-            cpu_freq = float(output.strip())
-
-            # 5. 获取逻辑CPU数量
-            cmd = "nproc"
-            output = subprocess.check_output(cmd, shell=True, text=True)
-            logical_cpu_count = int(output.strip())
-
-            # 6. 获取top进程信息
-            cmd = "top -b -n 1"
-            output = subprocess.check_output(cmd, shell=True, text=True)
-            processes = []
-            header_passed = False  # 添加标志位跟踪是否已过表头
+            # 4. 获取逻辑CPU数量
+            logical_cpu_count = os.cpu_count() or cpu_counter
 
-            for line in output.splitlines():
-                # 跳过空行
-                if not line.strip():
-                    continue
-
-                parts = line.split()
-
-                # 检测表头行 ("PID USER ... %CPU %MEM ...")
-                if not header_passed and '%CPU' in line:
-                    header_passed = True
-                    continue  # 跳过表头行
-
-                # 只处理包含数字PID的行
-                if header_passed and parts[0].isdigit() and len(parts) >= 12:
-                    try:
-                        processes.append({
-                            'pid': parts[0],
-                            'user': parts[1],
-                            'pr': parts[2],
-                            'ni': parts[3],
-                            'virt': parts[4],
-                            'res': parts[5],
-                            'shr': parts[6],
-                            's': parts[7],
-                            'cpu_percent': float(parts[8]),
-                            'mem_percent': float(parts[9]),
-                            'time': parts[10],
-                            'command': ' '.join(parts[11:])
-                        })
-                    except (ValueError, IndexError):
-                        # 忽略转换错误
-                        continue
+            # 5. 扫描进程表, 取CPU占用最高的进程
+            self.__process_table.refresh()
+            processes = self.__process_table.top(self.top_n)
+            process_count = self.__process_table.count()
 
             # 更新数据
-            self.data = {
+            self.data = Snapshot({
                 'model_name': model_name,
                 'total_usage': total_usage,
                 'core_usage': core_data,
@@ -175,6 +223,7 @@ class RealTimeCPU:
                 'cpu_freq': cpu_freq,
                 'logical_cpu_count': logical_cpu_count,
                 'top_processes': processes,
+                'process_count': process_count,
                 'usr': usr,
                 'nice': nice,
                 'sys': sys,
@@ -185,38 +234,13 @@ class RealTimeCPU:
                 'guest': guest,
                 'gnice': gnice,
                 'idle': idle
-            }
+            })
             # 广播数据
             GlobalCall.real_time_cpu_data = self.data
 
         except Exception as e:
             print(f"Error collecting CPU data: {e}")
-
-    def start_broadcasting(self):
-        """启动广播线程"""
-        if self.thread is not None and self.thread.is_alive():
-            return
-
-        self._stop_event.clear()
-        self.thread = threading.Thread(target=self._broadcast_loop)
-        self.thread.daemon = True
-        self.thread.start()
-
-    def _broadcast_loop(self):
-        """广播循环"""
-        while not self._stop_event.is_set():
-            self.__collect_real_time_data()
-            time.sleep(self.interval)
-
-    def stop_broadcasting(self):
-        """停止广播"""
-        self._stop_event.set()
-        if self.thread is not None:
-            self.thread.join(timeout=1)
-
-    def get_current_data(self):
-        """获取当前CPU数据"""
-        return self.data
+            raise
 
 
 # 在 CPUInfo 类中添加实时监控功能
@@ -15,6 +15,8 @@ try:
     from common.config import Config
     from common.log import Logger
     from common.global_call import GlobalCall
+    from common.collector_scheduler import RealTimeCollector
+    from common.snapshot import Snapshot
 except:
     from ..common.file import FileOperation
     from ..common.command import Command
@@ -22,6 +24,8 @@ except:
     from ..common.config import Config
     from ..common.log import Logger
     from ..common.global_call import GlobalCall
+    from ..common.collector_scheduler import RealTimeCollector
+    from ..common.snapshot import Snapshot
 
 import threading
 import time
@@ -31,12 +35,125 @@ import os
 import psutil
 
 
-class RealTimeDisk:
+class DiskStatsSampler:
+    '''
+        基于/proc/diskstats的磁盘IO采样器, 按与上一次快照的差值计算iostat -x口径的指标
+        默认只统计整盘(/sys/block下的设备, 包括dm-*、md*), 分区可通过include_partitions开启
+    '''
+    DISKSTATS = '/proc/diskstats'
+    SYS_BLOCK = '/sys/block/'
+    SECTOR_SIZE = 512
+    # 不参与统计的虚拟设备
+    IGNORE_PREFIXES = ('ram', 'zram')
+
+    def __init__(self, include_partitions=False):
+        self.include_partitions = include_partitions
+        self.__prev = {}
+        self.__prev_time = None
+
+    def __list_whole_disks(self):
+        try:
+            return set(os.listdir(self.SYS_BLOCK))
+        except OSError:
+            return set()
+
+    @classmethod
+    def __get_display_name(cls, device):
+        '''
+            dm设备显示为LVM等映射名, 例如dm-0 -> vg-root
+        '''
+        try:
+            with open(f'{cls.SYS_BLOCK}{device}/dm/name', 'r') as f:
+                return f.read().strip() or device
+        except OSError:
+            return device
+
+    def __read_snapshot(self):
+        '''
+            读取/proc/diskstats, 返回{设备: 计数元组}
+        '''
+        whole_disks = self.__list_whole_disks()
+        snapshot = {}
+        with open(self.DISKSTATS, 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 14:
+                    continue
+                device = parts[2]
+                if device.startswith(self.IGNORE_PREFIXES):
+                    continue
+                is_partition = device not in whole_disks
+                if is_partition and not self.include_partitions:
+                    continue
+                # 读完成数、读合并数、读扇区、读耗时、写完成数、写合并数、写扇区、写耗时、
+                # 进行中IO数、IO耗时(io_ticks)、加权IO耗时(time_in_queue)
+                snapshot[device] = (is_partition, tuple(int(v) for v in parts[3:14]))
+        return snapshot
+
+    def sample(self):
+        '''
+            采样一次, 返回{设备: 指标字典}; 首次采样无差值, 速率类指标为0
+        '''
+        now = time.time()
+        cur = self.__read_snapshot()
+        elapsed = now - self.__prev_time if self.__prev_time is not None else 0.0
+        result = {}
+        for device, (is_partition, stats) in cur.items():
+            (rd_ios, rd_merges, rd_sectors, rd_ticks,
+             wr_ios, wr_merges, wr_sectors, wr_ticks,
+             in_flight, io_ticks, time_in_queue) = stats
+            # 长时间没有IO的loop设备等不输出
+            if device.startswith('loop') and rd_ios == 0 and wr_ios == 0:
+                continue
+
+            metrics = {
+                'name': self.__get_display_name(device),
+                'is_partition': is_partition,
+                'read_bytes': rd_sectors * self.SECTOR_SIZE,
+                'write_bytes': wr_sectors * self.SECTOR_SIZE,
+                'read_count': rd_ios,
+                'write_count': wr_ios,
+                'in_flight': in_flight
+            }
+            prev = self.__prev.get(device)
+            if prev is not None and elapsed > 0:
+                # 计数器回绕或设备重建时差值为负, 按0处理
+                d = [max(c - p, 0) for c, p in zip(stats, prev[1])]
+                (d_rd_ios, d_rd_merges, d_rd_sectors, d_rd_ticks,
+                 d_wr_ios, d_wr_merges, d_wr_sectors, d_wr_ticks,
+                 _, d_io_ticks, d_time_in_queue) = d
+                metrics.update({
+                    'r_s': d_rd_ios / elapsed,
+                    'w_s': d_wr_ios / elapsed,
+                    'rmb_s': d_rd_sectors * self.SECTOR_SIZE / 1048576.0 / elapsed,
+                    'wmb_s': d_wr_sectors * self.SECTOR_SIZE / 1048576.0 / elapsed,
+                    'rrqm_s': d_rd_merges / elapsed,
+                    'wrqm_s': d_wr_merges / elapsed,
+                    'r_await': d_rd_ticks / d_rd_ios if d_rd_ios else 0.0,
+                    'w_await': d_wr_ticks / d_wr_ios if d_wr_ios else 0.0,
+                    'aqu_sz': d_time_in_queue / (elapsed * 1000.0),
+                    'utilization': min(d_io_ticks / (elapsed * 10.0), 100.0)
+                })
+            else:
+                metrics.update(dict.fromkeys(
+                    ('r_s', 'w_s', 'rmb_s', 'wmb_s', 'rrqm_s', 'wrqm_s',
+                     'r_await', 'w_await', 'aqu_sz', 'utilization'), 0.0))
+            result[device] = metrics
+
+        self.__prev = cur
+        self.__prev_time = now
+        return result
+
+
+class RealTimeDisk(RealTimeCollector):
+    TOPIC = 'disk'
+
+    # 保存历史的设备级指标
+    HISTORY_FIELDS = ('r_s', 'w_s', 'rmb_s', 'wmb_s', 'r_await', 'w_await', 'aqu_sz', 'utilization')
+
     def __init__(self, interval=2):
-        self.interval = interval
-        self._stop_event = threading.Event()
-        self.thread = None
-        self.prev_io_counters = None  # 新增：用于存储上一次的IO计数器
+        super().__init__(interval)
+        self.__sampler = DiskStatsSampler()
         self.data = {
             'disk_usage': [],
             'disk_io': {},  # 修改为字典，按设备名存储
@@ -45,7 +162,15 @@ class RealTimeDisk:
         # 添加广播功能
         GlobalCall.real_time_disk_data = self.data
 
-    def __collect_real_time_data(self):
+    def _get_metric_series(self):
+        """需要保存历史的磁盘IO指标"""
+        series = {'disk.total_utilization': self.data['total_utilization']}
+        for device, io in self.data['disk_io'].items():
+            for key in self.HISTORY_FIELDS:
+                series['disk.{}.{}'.format(device, key)] = io[key]
+        return series
+
+    def _collect_real_time_data(self):
         try:
             # 1. 收集磁盘使用情况
             disk_usage = []
@@ -65,82 +190,26 @@ class RealTimeDisk:
                 except Exception:
                     continue
 
-            # 2. 修改：按设备收集磁盘IO和活动率
-            disk_io_data = {}
-            total_utilization = 0.0
-
-            # 获取每个设备的IO计数器
-            per_disk_io = psutil.disk_io_counters(perdisk=True)
-            current_io = per_disk_io
-
-            if self.prev_io_counters is not None:
-                for device, io in current_io.items():
-                    if device in self.prev_io_counters:
-                        prev_io = self.prev_io_counters[device]
-
-                        # 计算活动率
-                        utilization = 0.0
-                        if hasattr(io, 'busy_time') and hasattr(prev_io, 'busy_time'):
-                            busy_time_diff = io.busy_time - prev_io.busy_time
-                            utilization = (busy_time_diff / (self.interval * 1000)) * 100
-                        else:
-                            read_time_diff = io.read_time - prev_io.read_time
-                            write_time_diff = io.write_time - prev_io.write_time
-                            utilization = (read_time_diff + write_time_diff) / (self.interval * 10)
-
-                        # 限制在0-100%范围内
-                        utilization = max(0.0, min(100.0, utilization))
-                        total_utilization = (utilization + total_utilization) / 2.0
-
-                        # 存储设备IO信息和活动率
-                        disk_io_data[device] = {
-                            'read_bytes': io.read_bytes,
-                            'write_bytes': io.write_bytes,
-                            'read_count': io.read_count,
-                            'write_count': io.write_count,
-                            'utilization': utilization  # 将活动率存入IO信息
-                        }
-
-            # 更新上一次的IO计数器
-            self.prev_io_counters = current_io
+            # 2. 按设备采集/proc/diskstats, 计算iostat口径的IO指标
+            disk_io_data = self.__sampler.sample()
+
+            # 3. 平均活动率只统计物理整盘, dm/md设备的IO已计入底层磁盘
+            physical = [io['utilization'] for device, io in disk_io_data.items()
+                        if not io['is_partition'] and not device.startswith(('dm-', 'md', 'loop'))]
+            total_utilization = sum(physical) / len(physical) if physical else 0.0
 
             # 更新数据
-            self.data = {
+            self.data = Snapshot({
                 'disk_usage': disk_usage,
                 'disk_io': disk_io_data,  # 修改为按设备存储的结构
                 'total_utilization': total_utilization
-            }
+            })
             # 广播数据
             GlobalCall.real_time_disk_data = self.data
 
         except Exception as e:
             print(f"Error collecting disk data: {e}")
-
-    def start_broadcasting(self):
-        """启动广播线程"""
-        if self.thread is not None and self.thread.is_alive():
-            return
-
-        self._stop_event.clear()
-        self.thread = threading.Thread(target=self._broadcast_loop)
-        self.thread.daemon = True
-        self.thread.start()
-
-    def _broadcast_loop(self):
-        """广播循环"""
-        while not self._stop_event.is_set():
-            self.__collect_real_time_data()
-            time.sleep(self.interval)
-
-    def stop_broadcasting(self):
-        """停止广播"""
-        self._stop_event.set()
-        if self.thread is not None:
-            self.thread.join(timeout=1)
-
-    def get_current_data(self):
-        """获取当前磁盘数据"""
-        return self.data
+            raise
 
 class DiskInfo:
     def __init__(self, t_fileName):
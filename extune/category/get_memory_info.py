@@ -14,16 +14,19 @@ try:
     from common.file import FileOperation
     from common.global_call import GlobalCall
     from common.command import Command
+    from common.collector_scheduler import RealTimeCollector
+    from common.snapshot import Snapshot
 except:
     from ..common.global_parameter import GlobalParameter
     from ..common.log import Logger
     from ..common.file import FileOperation
     from ..common.global_call import GlobalCall
     from ..common.command import Command
+    from ..common.collector_scheduler import RealTimeCollector
+    from ..common.snapshot import Snapshot
 
 import threading
 import time
-import subprocess
 import re
 import json
 try:
@@ -32,14 +35,36 @@ except:
     from ..common.global_call import GlobalCall
 
 
-class RealTimeMemory:
+class RealTimeMemory(RealTimeCollector):
+    TOPIC = 'mem'
+
+    # /proc/meminfo中需要输出的明细字段 {meminfo字段: 输出键名}
+    MEMINFO_FIELDS = {
+        'Dirty': 'mem_dirty',
+        'Writeback': 'mem_writeback',
+        'Slab': 'mem_slab',
+        'SReclaimable': 'mem_sreclaimable',
+        'SUnreclaim': 'mem_sunreclaim',
+        'AnonHugePages': 'mem_anon_hugepages',
+        'Shmem': 'mem_shmem',
+        'Committed_AS': 'mem_committed_as',
+        'CommitLimit': 'mem_commit_limit'
+    }
+    # 需要计算每秒速率的/proc/vmstat计数器
+    VMSTAT_COUNTERS = ('pgfault', 'pgmajfault', 'pswpin', 'pswpout')
+    # pgscan/pgsteal按回收来源拆分, 求和得到总量
+    # (新内核的pgscan_anon/pgscan_file是同一总量的另一种拆分, 不能重复累加)
+    VMSTAT_RECLAIM_PREFIXES = ('_kswapd', '_direct', '_khugepaged')
+
     def __init__(self, interval=2):
-        self.interval = interval
-        self._stop_event = threading.Event()
-        self.thread = None
+        super().__init__(interval)
+        # 上一次/proc/vmstat计数及采样时间, 用于计算速率
+        self.__prev_vmstat = None
+        self.__prev_time = None
         self.data = {
             'mem_total': 0.0,
             'mem_used': 0.0,
+            'mem_free': 0.0,
             'mem_available': 0.0,
             'mem_percent': 0.0,
             'mem_cached': 0.0,
@@ -52,41 +77,95 @@ class RealTimeMemory:
         # 添加广播功能
         GlobalCall.real_time_mem_data = self.data
 
-    def __collect_real_time_data(self):
-        """使用命令行工具采集实时内存数据"""
-        try:
-            # 使用 free 命令获取内存信息
-            cmd = "free -b"
-            output = subprocess.check_output(cmd, shell=True, text=True)
+    @staticmethod
+    def __read_meminfo():
+        '''
+            读取/proc/meminfo, 返回{字段: 字节数}
+        '''
+        meminfo = {}
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 2:
+                    continue
+                value = int(parts[1])
+                # 带kB单位的字段换算为字节, HugePages_*等为个数
+                if len(parts) > 2 and parts[2] == 'kB':
+                    value *= 1024
+                meminfo[parts[0].rstrip(':')] = value
+        return meminfo
+
+    @classmethod
+    def __read_vmstat(cls):
+        '''
+            读取/proc/vmstat中需要的计数器
+        '''
+        vmstat = dict.fromkeys(cls.VMSTAT_COUNTERS + ('pgscan', 'pgsteal'), 0)
+        with open('/proc/vmstat', 'r') as f:
+            for line in f:
+                key, _, value = line.partition(' ')
+                if key in vmstat:
+                    vmstat[key] = int(value)
+                    continue
+                for prefix in ('pgscan', 'pgsteal'):
+                    if key.startswith(prefix) and key != 'pgscan_direct_throttle' \
+                            and key[len(prefix):].startswith(cls.VMSTAT_RECLAIM_PREFIXES):
+                        vmstat[prefix] += int(value)
+        return vmstat
+
+    def __calc_vmstat_rates(self, vmstat, now):
+        '''
+            与上一次采样的差值计算各计数器每秒速率, 首次采样返回0
+        '''
+        rates = {}
+        elapsed = now - self.__prev_time if self.__prev_time is not None else 0.0
+        for key, value in vmstat.items():
+            if elapsed > 0:
+                # 计数器回绕或重置时差值为负, 按0处理
+                rates[key + '_rate'] = max(value - self.__prev_vmstat[key], 0) / elapsed
+            else:
+                rates[key + '_rate'] = 0.0
+        self.__prev_vmstat = vmstat
+        self.__prev_time = now
+        return rates
 
-            # 解析输出
-            lines = output.splitlines()
-            mem_line = lines[1].split()
-            swap_line = lines[2].split()
+    def _get_metric_series(self):
+        """需要保存历史的内存指标"""
+        # mem_total -> mem.total, swap_used -> mem.swap_used
+        return {'mem.' + (key[4:] if key.startswith('mem_') else key): value
+                for key, value in self.data.items()}
+
+    def _collect_real_time_data(self):
+        """读取/proc/meminfo和/proc/vmstat采集实时内存数据"""
+        try:
+            now = time.time()
+            meminfo = self.__read_meminfo()
+            vmstat = self.__read_vmstat()
 
             # 提取内存数据（单位：字节）
-            mem_total = float(mem_line[1])
-            mem_free = float(mem_line[3])
-            if len(mem_line) > 6:
-                mem_available = float(mem_line[6])
+            mem_total = float(meminfo.get('MemTotal', 0))
+            mem_free = float(meminfo.get('MemFree', 0))
+            # 3.14以前的内核没有MemAvailable, 按free的方式估算
+            mem_buffers = float(meminfo.get('Buffers', 0))
+            mem_cached = float(meminfo.get('Cached', 0) + meminfo.get('SReclaimable', 0))
+            mem_available = float(meminfo.get('MemAvailable', mem_free + mem_buffers + mem_cached))
             mem_used = mem_total - mem_available
-            mem_buffers =log float(mem_line[5])
-            mem_cached = float(mem_line[5])
 
             # 提取交换内存数据
-            swap_total = float(swap_line[1])
-            swap_used = float(swap_line[2])
-            swap_free = float(swap_line[3])
+            swap_total = float(meminfo.get('SwapTotal', 0))
+            swap_free = float(meminfo.get('SwapFree', 0))
+            swap_used = swap_total - swap_free
 
             # 计算百分比
-            mem_percent = ((mem_total - mem_available) / mem_total) * 100 if mem_total > 0 else 0.0
+            mem_percent = (mem_used / mem_total) * 100 if mem_total > 0 else 0.0
             swap_percent = (swap_used / swap_total) * 100 if swap_total > 0 else 0.0
 
             # 更新数据
-            self.data = {
+            data = {
                 'mem_total': mem_total,
                 'mem_used': mem_used,
                 'mem_free': mem_free,
+                'mem_available': mem_available,
                 'mem_percent': mem_percent,
                 'mem_cached': mem_cached,
                 'mem_buffers': mem_buffers,
@@ -95,36 +174,18 @@ class RealTimeMemory:
                 'swap_free': swap_free,
                 'swap_percent': swap_percent,
             }
+            for field, key in self.MEMINFO_FIELDS.items():
+                data[key] = float(meminfo.get(field, 0))
+            # 缺页、换入换出、页面扫描/回收速率（次/秒）
+            data.update(self.__calc_vmstat_rates(vmstat, now))
+
+            self.data = Snapshot(data)
             # 广播数据
             GlobalCall.real_time_mem_data = self.data
 
         except Exception as e:
-            Logger().logger(f"Error collecting memory data: {e}")
-    def start_broadcasting(self):
-        """启动广播线程"""
-        if self.thread is not None and self.thread.is_alive():
-            return
-
-        self._stop_event.clear()
-        self.thread = threading.Thread(target=self._broadcast_loop)
-        self.thread.daemon = True
-        self.thread.start()
-
-    def _broadcast_loop(self):
-        """广播循环"""
-        while not self._stop_event.is_set():
-            self.__collect_real_time_data()
-            time.sleep(self.interval)
-
-    def stop_broadcasting(self):
-        """停止广播"""
-        self._stop_event.set()
-        if self.thread is not None:
-            self.thread.join(timeout=1)
-
-    def get_current_data(self):
-        """获取当前内存数据"""
-        return self.data
+            Logger().error(f"Error collecting memory data: {e}")
+            raise
 
 # memory class
 class MemInfo():
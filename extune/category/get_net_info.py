@@ -15,8 +15,12 @@ import struct
 import sys
 try:
     from common.customizefunctionthread import CustomizeFunctionThread
+    from common.collector_scheduler import RealTimeCollector
+    from common.snapshot import Snapshot
 except:
     from ..common.customizefunctionthread import CustomizeFunctionThread
+    from ..common.collector_scheduler import RealTimeCollector
+    from ..common.snapshot import Snapshot
 
 if sys.getdefaultencoding() != 'utf-8':
     reload(sys)
@@ -36,6 +40,7 @@ except:
     from ..common.command import Command
     from ..common.global_call import GlobalCall
 
+import fcntl
 import threading
 import time
 import subprocess
@@ -45,11 +50,179 @@ import json
 import socket
 
 
-class RealTimeNet:
+class InterfaceMetaCache:
+    '''
+        网卡元数据缓存(地址、MAC、链路状态、速率、MTU)
+        数据来自/sys/class/net、ioctl和/proc/net/if_inet6, 不再调用ip/ethtool命令
+        只有网卡增减或收到rtnetlink链路/地址变化通知时才重新读取
+    '''
+    SYS_NET_PATH = '/sys/class/net/'
+    SIOCGIFADDR = 0x8915
+    SIOCGIFNETMASK = 0x891b
+    # rtnetlink组播组: 链路状态、IPv4地址、IPv6地址变化
+    RTMGRP_LINK = 0x1
+    RTMGRP_IPV4_IFADDR = 0x10
+    RTMGRP_IPV6_IFADDR = 0x100
+
+    def __init__(self, max_age=60):
+        # 无法订阅netlink时的兜底刷新周期(秒)
+        self.max_age = max_age
+        self.__interfaces = None
+        self.__names = None
+        self.__timestamp = 0.0
+        self.__netlink = self.__open_netlink()
+
+    def __open_netlink(self):
+        '''
+            订阅rtnetlink变化通知, 不支持时返回None
+        '''
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+            sock.bind((0, self.RTMGRP_LINK | self.RTMGRP_IPV4_IFADDR | self.RTMGRP_IPV6_IFADDR))
+            sock.setblocking(False)
+            return sock
+        except (AttributeError, OSError) as e:
+            Logger().debug(f"rtnetlink unavailable, fall back to periodic refresh: {e}")
+            return None
+
+    def __netlink_changed(self):
+        '''
+            取出所有待处理的netlink通知, 有通知即表示网卡状态或地址发生变化
+        '''
+        if self.__netlink is None:
+            return False
+        changed = False
+        while True:
+            try:
+                if not self.__netlink.recv(65536):
+                    break
+                changed = True
+            except BlockingIOError:
+                break
+            except OSError:
+                # 接收缓冲区溢出(ENOBUFS)时部分通知已丢失, 直接按变化处理
+                changed = True
+                break
+        return changed
+
+    @staticmethod
+    def __read_sys(iface, name, default=None):
+        try:
+            with open(f'{InterfaceMetaCache.SYS_NET_PATH}{iface}/{name}', 'r') as f:
+                return f.read().strip()
+        except OSError:
+            # 例如网卡down时读取speed返回EINVAL
+            return default
+
+    def __get_ipv4(self, iface):
+        '''
+            ioctl获取网卡IPv4地址和子网掩码
+        '''
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            ifreq = struct.pack('256s', iface[:15].encode('utf-8'))
+            address = socket.inet_ntoa(fcntl.ioctl(sock.fileno(), self.SIOCGIFADDR, ifreq)[20:24])
+            netmask = socket.inet_ntoa(fcntl.ioctl(sock.fileno(), self.SIOCGIFNETMASK, ifreq)[20:24])
+        except OSError:
+            # 未配置IPv4地址
+            return None
+        finally:
+            sock.close()
+        prefix = bin(struct.unpack('>I', socket.inet_aton(netmask))[0]).count('1')
+        return {
+            'type': 'IPv4',
+            'address': address,
+            'netmask': netmask,
+            'prefix': str(prefix)
+        }
+
+    @staticmethod
+    def __get_ipv6_all():
+        '''
+            解析/proc/net/if_inet6, 返回{网卡: 第一个IPv6地址}
+        '''
+        ipv6 = {}
+        try:
+            with open('/proc/net/if_inet6', 'r') as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) < 6 or parts[5] in ipv6:
+                        continue
+                    packed = bytes.fromhex(parts[0])
+                    ipv6[parts[5]] = {
+                        'type': 'IPv6',
+                        'address': socket.inet_ntop(socket.AF_INET6, packed),
+                        'prefix': str(int(parts[2], 16))
+                    }
+        except OSError:
+            pass
+        return ipv6
+
+    def __load(self, names):
+        '''
+            重新读取所有网卡的元数据
+        '''
+        interfaces = {}
+        ipv6_all = self.__get_ipv6_all()
+        for iface in names:
+            operstate = self.__read_sys(iface, 'operstate', 'unknown')
+            speed = self.__read_sys(iface, 'speed')
+            mtu = self.__read_sys(iface, 'mtu')
+            addrs = []
+            ipv4 = self.__get_ipv4(iface)
+            if ipv4:
+                addrs.append(ipv4)
+            if iface in ipv6_all:
+                addrs.append(ipv6_all[iface])
+            mac = self.__read_sys(iface, 'address')
+            if mac and self.__read_sys(iface, 'type') == '1':
+                # ARPHRD_ETHER, 与ip命令的link/ether一致
+                addrs.append({
+                    'type': 'MAC',
+                    'address': mac
+                })
+            interfaces[iface] = {
+                'stats': {
+                    'is_up': 'up' in operstate.lower(),
+                    'speed': int(speed) if speed and speed.lstrip('-').isdigit() else 0,
+                    'mtu': int(mtu) if mtu and mtu.isdigit() else 1500
+                },
+                'addrs': addrs,
+                # carrier为1相当于ethtool的"Link detected: yes"
+                'link_detected': self.__read_sys(iface, 'carrier') == '1'
+            }
+        return interfaces
+
+    def get(self, names=None):
+        '''
+            返回网卡元数据; names为本次/proc/net/dev中的网卡, 网卡增减时刷新缓存
+        '''
+        if names is None:
+            names = os.listdir(self.SYS_NET_PATH) if os.path.exists(self.SYS_NET_PATH) else []
+        names = sorted(names)
+        changed = self.__netlink_changed()
+        if (changed or self.__interfaces is None or names != self.__names
+                or (self.__netlink is None and time.time() - self.__timestamp > self.max_age)):
+            self.__interfaces = self.__load(names)
+            self.__names = names
+            self.__timestamp = time.time()
+        return self.__interfaces
+
+    def get_active_interface(self):
+        '''
+            第一个检测到链路连接的网卡
+        '''
+        for iface, info in (self.__interfaces or {}).items():
+            if info['link_detected']:
+                return iface
+        return ""
+
+
+class RealTimeNet(RealTimeCollector):
+    TOPIC = 'net'
+
     def __init__(self, interval=2):
-        self.interval = interval
-        self._stop_event = threading.Event()
-        self.thread = None
+        super().__init__(interval)
         self.data = {
             'net_interface': '',
             'rx_speed': 0.0,  # 下行速度 (KB/s)
@@ -61,110 +234,20 @@ class RealTimeNet:
         GlobalCall.real_time_net_data = self.data
         # 初始化最后一次统计值
         self.last_stats = {}
-        # 状态信息更新计数器
-        self.status_counter = 0
-
-    def __get_all_interfaces(self):
-        """获取所有网络接口"""
-        ifc_all_dir = '/sys/class/net/'
-        if not os.path.exists(ifc_all_dir):
-            return []
-        return os.listdir(ifc_all_dir)
+        # 网卡元数据缓存
+        self.__meta_cache = InterfaceMetaCache()
 
-    def __get_interface_stats(self):
-        """获取网络接口统计信息（类似psutil）"""
+    def __get_interface_stats(self, names=None):
+        """获取网络接口状态和地址信息（缓存，网卡变化时才刷新）"""
         interfaces = {}
-
-        # 1. 获取网络接口状态
-        net_if_stats = {}
         try:
-            for iface in self.__get_all_interfaces():
-                operstate_path = f'/sys/class/net/{iface}/operstate'
-                speed_path = f'/sys/class/net/{iface}/speed'
-                mtu_path = f'/sys/class/net/{iface}/mtu'
-
-                is_up = False
-                speed = 0
-                mtu = 1500
-
-                if os.path.exists(operstate_path):
-                    with open(operstate_path, 'r') as f:
-                        is_up = 'up' in f.read().strip().lower()
-
-                if os.path.exists(speed_path):
-                    try:
-                        with open(speed_path, 'r') as f:
-                            speed = int(f.read().strip())
-                    except:
-                        pass
-
-                if os.path.exists(mtu_path):
-                    try:
-                        with open(mtu_path, 'r') as f:
-                            mtu = int(f.read().strip())
-                    except:
-                        pass
-
-                net_if_stats[iface] = {
-                    'is_up': is_up,
-                    'speed': speed,
-                    'mtu': mtu
+            for iface, info in self.__meta_cache.get(names).items():
+                interfaces[iface] = {
+                    'stats': info['stats'],
+                    'addrs': info['addrs']
                 }
         except Exception as e:
             Logger().error(f"Error getting interface stats: {e}")
-
-        # 2. 获取网络接口地址信息
-        net_if_addrs = {}
-        try:
-            for iface in self.__get_all_interfaces():
-                addrs = []
-                try:
-                    # 使用ip命令获取地址信息
-                    cmd = f"ip addr show {iface}"
-                    result = Command.cmd_run(cmd)
-
-                    # 解析IPv4地址
-                    ipv4_match = re.search(r'inet (\d+\.\d+\.\d+\.\d+/\d+)', result)
-                    if ipv4_match:
-                        ip, prefix = ipv4_match.group(1).split('/')
-                        addrs.append({
-                            'type': 'IPv4',
-                            'address': ip,
-                            'netmask': self.prefix_to_netmask(int(prefix)),
-                            'prefix': prefix
-                        })
-
-                    # 解析IPv6地址
-                    ipv6_match = re.search(r'inet6 ([a-f0-9:]+/\d+)', result)
-                    if ipv6_match:
-                        ip, prefix = ipv6_match.group(1).split('/')
-                        addrs.append({
-                            'type': 'IPv6',
-                            'address': ip,
-                            'prefix': prefix
-                        })
-
-                    # 解析MAC地址
-                    mac_match = re.search(r'link/ether ([\da-f:]+)', result, re.I)
-                    if mac_match:
-                        addrs.append({
-                            'type': 'MAC',
-                            'address': mac_match.group(1)
-                        })
-                except Exception as e:
-                    Logger().error(f"Error getting addresses for {iface}: {e}")
-
-                net_if_addrs[iface] = addrs
-        except Exception as e:
-            Logger().error(f"Error getting interface addresses: {e}")
-
-        # 3. 合并结果
-        for iface in self.__get_all_interfaces():
-            interfaces[iface] = {
-                'stats': net_if_stats.get(iface, {}),
-                'addrs': net_if_addrs.get(iface, [])
-            }
-
         return interfaces
 
     def prefix_to_netmask(self, prefix):
@@ -172,20 +255,24 @@ class RealTimeNet:
         mask = (0xffffffff << (32 - prefix)) & 0xffffffff
         return socket.inet_ntoa(struct.pack('>I', mask))
 
-    def __get_active_interface(self):
-        """获取活动网卡（参考get_net_info的__get_devices_info）"""
-        for iface in self.__get_all_interfaces():
-            cmd = f"ethtool {iface} | grep 'Link detected:'"
-            result = subprocess.getoutput(cmd)
-            if 'yes' in result.lower():
-                return iface
-        return ""
+    def _get_metric_series(self):
+        """需要保存历史的网络指标"""
+        series = {
+            'net.total_rx_speed': self.data['total_rx_speed'],
+            'net.total_tx_speed': self.data['total_tx_speed']
+        }
+        for iface, stats in self.data['net_io'].items():
+            if 'rx_speed' in stats:
+                series['net.{}.rx_speed'.format(iface)] = stats['rx_speed']
+                series['net.{}.tx_speed'.format(iface)] = stats['tx_speed']
+        return series
 
-    def __collect_real_time_data(self):
+    def _collect_real_time_data(self):
         """使用/proc/net/dev采集实时网络数据"""
         try:
             # 获取所有接口的当前统计
             current_stats = {}
+            now = time.time()
             try:
                 with open('/proc/net/dev', 'r') as f:
                     lines = f.readlines()
@@ -195,41 +282,35 @@ class RealTimeNet:
                     if ':' not in line:
                         continue
 
-                    # 解析行数据
-                    parts = re.split(r'\s+', line.strip())
-                    iface = parts[0].rstrip(':')
-
-                    # 提取统计信息
-                    rx_bytes = int(parts[1])
-                    tx_bytes = int(parts[9])
-                    rx_packets = int(parts[2])
-                    tx_packets = int(parts[10])
-                    rx_errors = int(parts[3])
-                    tx_errors = int(parts[11])
-                    rx_dropped = int(parts[4])
-                    tx_dropped = int(parts[12])
+                    # 解析行数据（接口名与计数之间可能没有空格）
+                    iface, _, counters = line.partition(':')
+                    iface = iface.strip()
+                    parts = counters.split()
 
                     current_stats[iface] = {
-                        'bytes_sent': tx_bytes,
-                        'bytes_recv': rx_bytes,
-                        'packets_sent': tx_packets,
-                        'packets_recv': rx_packets,
-                        'errin': rx_errors,
-                        'errout': tx_errors,
-                        'dropin': rx_dropped,
-                        'dropout': tx_dropped,
-                        'timestamp': time.time()
+                        'bytes_sent': int(parts[8]),
+                        'bytes_recv': int(parts[0]),
+                        'packets_sent': int(parts[9]),
+                        'packets_recv': int(parts[1]),
+                        'errin': int(parts[2]),
+                        'errout': int(parts[10]),
+                        'dropin': int(parts[3]),
+                        'dropout': int(parts[11]),
+                        'timestamp': now
                     }
             except Exception as e:
                 Logger().error(f"Error reading /proc/net/dev: {e}")
 
+            # 网卡元数据走缓存，只有网卡增减或状态变化时才重新读取
+            net_interfaces = self.__get_interface_stats(list(current_stats))
+            active_iface = self.__meta_cache.get_active_interface()
+
             # 计算速度（如果存在上一次统计）
             # 初始化总速度和活动接口速度
             total_rx_speed = 0.0
             total_tx_speed = 0.0
             active_rx = 0.0
             active_tx = 0.0
-            active_iface = self.__get_active_interface()  # 提前获取活动接口
 
             if self.last_stats:
                 for iface, current in current_stats.items():
@@ -262,19 +343,8 @@ class RealTimeNet:
             # 更新最后一次统计
             self.last_stats = current_stats
 
-            # 定期更新接口状态信息（每10次循环更新一次）
-            if self.status_counter % 10 == 0:
-                net_interfaces = self.__get_interface_stats()
-                active_iface = self.__get_active_interface()
-                self.status_counter = 0
-            else:
-                net_interfaces = self.data.get('net_interfaces', {})
-                active_iface = self.data.get('net_interface', "")
-
-            self.status_counter += 1
-
             # 更新数据
-            self.data = {
+            self.data = Snapshot({
                 'net_interface': active_iface,
                 'rx_speed': active_rx,  # 使用活动接口的RX
                 'tx_speed': active_tx,  # 使用活动接口的TX
@@ -282,42 +352,14 @@ class RealTimeNet:
                 'total_tx_speed': total_tx_speed,
                 'net_io': current_stats,
                 'net_interfaces': net_interfaces
-            }
+            })
 
             # 广播数据
             GlobalCall.real_time_net_data = self.data
 
         except Exception as e:
             Logger().error(f"Error collecting network data: {e}")
-
-    def start_broadcasting(self):
-        """启动广播线程"""
-        if self.thread and self.thread.is_alive():
-            return
-
-        self._stop_event.clear()
-        self.thread = threading.Thread(target=self._broadcast_loop)
-        self.thread.daemon = True
-        self.thread.start()
-
-    def _broadcast_loop(self):
-        """广播循环"""
-        # 初始化最后一次统计
-        self.__collect_real_time_data()
-
-        while not self._stop_event.is_set():
-            self.__collect_real_time_data()
-            time.sleep(self.interval)
-
-    def stop_broadcasting(self):
-        """停止广播"""
-        self._stop_event.set()
-        if self.thread:
-            self.thread.join(timeout=1)
-
-    def get_current_data(self):
-        """获取当前网络数据"""
-        return self.data
+            raise
 
 # net class
 @DecoratorWrap.singleton
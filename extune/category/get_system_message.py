@@ -13,29 +13,40 @@
 try:
     from common.file import FileOperation
     from common.command import Command
+    from common.collector_scheduler import RealTimeCollector
+    from common.snapshot import Snapshot
 except:
     from ..common.file import FileOperation
     from ..common.command import Command
+    from ..common.collector_scheduler import RealTimeCollector
+    from ..common.snapshot import Snapshot
 
 import threading
 import time
-import subprocess
 import os
 import re
+from collections import deque
 
 try:
     from common.global_call import GlobalCall
     from common.log import Logger
+    from common.log_follower import LogFollower
 except:
     from ..common.global_call import GlobalCall
     from ..common.log import Logger
+    from ..common.log_follower import LogFollower
 
 
-class RealTimeSysMessage:
-    def __init__(self, interval=5):
-        self.interval = interval
-        self._stop_event = threading.Event()
-        self.thread = None
+# 实时系统日志: 最近日志为各日志源末尾的max_lines行; 错误日志为最近max_lines条包含错误关键字的行,
+# 启动时从日志末尾向前最多扫描ERROR_BACKFILL_BYTES字节补齐, 之后只处理新追加的行
+class RealTimeSysMessage(RealTimeCollector):
+    # 错误日志关键字
+    ERROR_PATTERN = re.compile(r'error|warning|fail|critical', re.I)
+    ERROR_BACKFILL_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, interval=5, max_lines=50):
+        super().__init__(interval)
+        self.max_lines = max_lines
         self.data = {
             'recent_logs': [],  # 最近日志
             'error_logs': [],  # 错误日志
@@ -43,6 +54,15 @@ class RealTimeSysMessage:
         }
         # 初始化日志源
         self.__find_log_sources()
+        # 每个日志源的跟随器和最近日志/错误日志环形缓冲区
+        self.__followers = {}
+        self.__recent = {}
+        self.__errors = {}
+        self.__backfilled = set()
+        for log_file in self.data['log_sources']:
+            self.__followers[log_file] = LogFollower(log_file)
+            self.__recent[log_file] = deque(maxlen=self.max_lines)
+            self.__errors[log_file] = deque(maxlen=self.max_lines)
         # 添加广播功能
         GlobalCall.real_time_sys_message_data = self.data
 
@@ -56,67 +76,47 @@ class RealTimeSysMessage:
         ]
         self.data['log_sources'] = [log for log in common_logs if os.path.exists(log)]
 
-    def __collect_real_time_data(self):
-        """采集实时系统日志数据"""
+    def _collect_real_time_data(self):
+        """增量采集实时系统日志数据（只读取新追加的内容）"""
         try:
-            # 1. 采集最近日志
             recent_logs = []
+            error_logs = []
             for log_file in self.data['log_sources']:
+                # 1. 读取新增日志行，并逐行分类
                 try:
-                    cmd = f"tail -n 50 {log_file} 2>/dev/null"
-                    output = subprocess.check_output(cmd, shell=True, text=True)
-                    recent_logs.append(f"## {log_file} ##\n{output}")
+                    follower = self.__followers[log_file]
+                    lines = follower.read_new_lines()
+                    if log_file not in self.__backfilled:
+                        # 首次读取只回读了末尾一小段, 向前补齐更早的错误日志
+                        self.__backfilled.add(log_file)
+                        self.__errors[log_file].extend(follower.read_before_start(
+                            self.ERROR_PATTERN, self.max_lines, self.ERROR_BACKFILL_BYTES))
+                    for line in lines:
+                        self.__recent[log_file].append(line)
+                        if self.ERROR_PATTERN.search(line):
+                            self.__errors[log_file].append(line)
                 except Exception as e:
                     Logger().error(f"Error reading {log_file}: {str(e)}")
 
-            # 2. 采集错误日志
-            error_logs = []
-            for log_file in self.data['log_sources']:
-                try:
-                    cmd = f"grep -E -i 'error|warning|fail|critical' {log_file} | tail -n 50 2>/dev/null"
-                    output = subprocess.check_output(cmd, shell=True, text=True)
-                    if output.strip():
-                        error_logs.append(f"## {log_file} ##\n{output}")
-                except Exception as e:
-                    Logger().error(f"Error filtering {log_file}: {str(e)}")
+                # 2. 最近日志和错误日志
+                recent = self.__recent[log_file]
+                recent_logs.append(f"## {log_file} ##\n" + ''.join(line + '\n' for line in recent))
+                errors = self.__errors[log_file]
+                if errors:
+                    error_logs.append(f"## {log_file} ##\n" + ''.join(line + '\n' for line in errors))
 
             # 3. 更新数据
-            self.data = {
+            self.data = Snapshot({
                 'recent_logs': recent_logs,
                 'error_logs': error_logs,
                 'log_sources': self.data['log_sources']  # 保持日志源不变
-            }
+            })
             # 广播数据
             GlobalCall.real_time_sys_message_data = self.data
 
         except Exception as e:
             Logger().error(f"Error collecting system logs: {str(e)}")
-
-    def start_broadcasting(self):
-        """启动广播线程"""
-        if self.thread is not None and self.thread.is_alive():
-            return
-
-        self._stop_event.clear()
-        self.thread = threading.Thread(target=self._broadcast_loop)
-        self.thread.daemon = True
-        self.thread.start()
-
-    def _broadcast_loop(self):
-        """广播循环"""
-        while not self._stop_event.is_set():
-            self.__collect_real_time_data()
-            time.sleep(self.interval)
-
-    def stop_broadcasting(self):
-        """停止广播"""
-        self._stop_event.set()
-        if self.thread is not None:
-            self.thread.join(timeout=1)
-
-    def get_current_data(self):
-        """获取当前日志数据"""
-        return self.data
+            raise
 
 # System log class
 class SysMessage():
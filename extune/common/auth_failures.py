@@ -0,0 +1,113 @@
+'''
+  Copyright (c) KylinSoft  Co., Ltd. 2024.All rights reserved.
+  extuner licensed under the Mulan Permissive Software License, Version 2.
+  See LICENSE file for more details.
+'''
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# cython:language_level=3
+
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from .log import Logger
+from .log_follower import LogFollower
+
+
+# 登录失败计数: 增量读取认证日志, 只处理新追加的行, 按时间窗口分桶计数
+# 首次打开时回读日志末尾initial_bytes字节, 用于填充最近一段时间的计数
+class AuthFailureCounter():
+    LOG_FILES = ('/var/log/auth.log', '/var/log/secure')
+    # 每次失败的登录只计一行: sshd的一次失败会同时写出"Invalid user"、pam_unix(sshd:auth)的
+    # "authentication failure"和"Failed password"三行, 只统计"Failed password";
+    # 其他服务(如sudo、su、login)没有"Failed password"行, 统计其PAM的"authentication failure"
+    FAILURE_PATTERN = re.compile(r'Failed password|\((?!sshd:)[\w-]+:auth\): authentication failure')
+    # 传统syslog时间格式(无年份), 如 "Jan  2 03:04:05"
+    SYSLOG_TIME = re.compile(r'^([A-Z][a-z]{2}) +(\d{1,2}) (\d{2}):(\d{2}):(\d{2})')
+    # RFC3339时间格式, 如 "2024-01-02T03:04:05.123456+08:00"
+    ISO_TIME = re.compile(r'^(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})')
+    MONTHS = {m: i + 1 for i, m in enumerate(
+        ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'))}
+
+    def __init__(self, bucket=60, retention=24 * 3600, initial_bytes=4 * 1024 * 1024):
+        '''
+            bucket: 计数桶的时间跨度(秒)
+            retention: 保留的时间范围(秒), 更早的桶被丢弃
+            initial_bytes: 首次读取时从日志末尾回读的字节数
+        '''
+        self.bucket = bucket
+        self.retention = retention
+        self.__lock = threading.Lock()
+        self.__followers = [LogFollower(path, initial_bytes=initial_bytes)
+                            for path in self.LOG_FILES if os.path.exists(path)]
+        # {桶起始时间: 失败次数}
+        self.__buckets = {}
+        self.__last_update = None
+
+    def __parse_time(self, line, now):
+        '''
+            解析日志行时间, 无法解析时按当前时间计
+        '''
+        match = self.SYSLOG_TIME.match(line)
+        if match:
+            month, day, hour, minute, second = match.groups()
+            year = datetime.fromtimestamp(now).year
+            try:
+                ts = datetime(year, self.MONTHS[month], int(day), int(hour), int(minute), int(second)).timestamp()
+            except (KeyError, ValueError):
+                return now
+            # 日志中没有年份, 跨年时上一年12月的记录会被算到未来
+            if ts > now + 86400:
+                ts = datetime(year - 1, self.MONTHS[month], int(day),
+                              int(hour), int(minute), int(second)).timestamp()
+            return ts
+        match = self.ISO_TIME.match(line)
+        if match:
+            try:
+                return datetime(*(int(v) for v in match.groups())).timestamp()
+            except ValueError:
+                return now
+        return now
+
+    def update(self):
+        '''
+            读取各认证日志新增的行并计数, 由调度器周期调用
+        '''
+        now = time.time()
+        failures = []
+        for follower in self.__followers:
+            try:
+                for line in follower.read_new_lines():
+                    if self.FAILURE_PATTERN.search(line):
+                        failures.append(self.__parse_time(line, now))
+            except Exception as e:
+                Logger().error("Error reading {}: {}".format(follower.path, e))
+
+        oldest = now - self.retention
+        with self.__lock:
+            for ts in failures:
+                if ts < oldest:
+                    continue
+                start = int(ts // self.bucket) * self.bucket
+                self.__buckets[start] = self.__buckets.get(start, 0) + 1
+            for start in [s for s in self.__buckets if s + self.bucket <= oldest]:
+                del self.__buckets[start]
+            self.__last_update = now
+
+    def count(self, window):
+        '''
+            最近window秒内的失败次数(按桶粒度统计)
+        '''
+        since = time.time() - window
+        with self.__lock:
+            return sum(n for start, n in self.__buckets.items() if start + self.bucket > since)
+
+    def get_stats(self):
+        with self.__lock:
+            return {
+                'log_files': [f.path for f in self.__followers],
+                'buckets': len(self.__buckets),
+                'last_update': self.__last_update
+            }
@@ -0,0 +1,210 @@
+'''
+  Copyright (c) KylinSoft  Co., Ltd. 2024.All rights reserved.
+  extuner licensed under the Mulan Permissive Software License, Version 2.
+  See LICENSE file for more details.
+'''
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# cython:language_level=3
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .decorator_wrap import DecoratorWrap
+from .log import Logger
+from .metric_store import MetricStore
+from .metric_stream import MetricBroadcaster
+
+
+# 实时采集调度器: 所有采集器共用一个调度线程和有界线程池
+@DecoratorWrap.singleton
+class CollectorScheduler():
+    def __init__(self, max_workers=4, jitter=0.05):
+        '''
+            max_workers: 同时执行采集的最大线程数
+            jitter: 每次触发时间的随机抖动, 占采集间隔的比例, 避免各采集器同时触发
+        '''
+        self.__jitter = jitter
+        self.__max_workers = max_workers
+        self.__pool = ThreadPoolExecutor(max_workers, thread_name_prefix='collector')
+        self.__lock = threading.Lock()
+        self.__wakeup = threading.Event()
+        self.__stop_event = threading.Event()
+        self.__thread = None
+        # {名称: 采集器调度信息}
+        self.__collectors = {}
+
+    def register(self, name, func, interval):
+        '''
+            注册采集器, 同名采集器重复注册时替换原有配置
+        '''
+        now = time.monotonic()
+        with self.__lock:
+            self.__collectors[name] = {
+                'func': func,
+                'interval': interval,
+                # 固定频率的时间基准: 第k次触发时间为 anchor + k * interval
+                'anchor': now,
+                'tick': 0,
+                'next_run': now,
+                'running': False,
+                'runs': 0,
+                'failures': 0,
+                'skipped': 0,
+                'last_duration': None,
+                'last_success': None,
+                'last_error': None
+            }
+        self.__wakeup.set()
+
+    def unregister(self, name):
+        with self.__lock:
+            self.__collectors.pop(name, None)
+
+    def is_registered(self, name):
+        with self.__lock:
+            return name in self.__collectors
+
+    def start(self):
+        '''
+            启动调度线程(已启动时直接返回)
+        '''
+        if self.__thread is not None and self.__thread.is_alive():
+            return
+        if self.__pool is None:
+            # stop之后重新启动
+            self.__pool = ThreadPoolExecutor(self.__max_workers, thread_name_prefix='collector')
+        self.__stop_event.clear()
+        self.__thread = threading.Thread(target=self.__schedule_loop, name='collector-scheduler')
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def stop(self):
+        '''
+            停止调度并等待进行中的采集结束; 返回后不会再有采集器运行, 可以安全释放采集器写入的资源
+        '''
+        self.__stop_event.set()
+        self.__wakeup.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        if self.__pool is not None:
+            self.__pool.shutdown(wait=True)
+            self.__pool = None
+
+    def get_stats(self):
+        '''
+            返回各采集器的运行记录(执行次数、失败次数、跳过次数、最近耗时、最近成功时间等)
+        '''
+        with self.__lock:
+            return {name: {k: v for k, v in entry.items() if k not in ('func', 'anchor', 'tick', 'next_run')}
+                    for name, entry in self.__collectors.items()}
+
+    def __run(self, name, entry):
+        '''
+            在线程池中执行一次采集并记录结果
+        '''
+        start = time.monotonic()
+        error = None
+        try:
+            entry['func']()
+        except Exception as e:
+            error = str(e)
+        duration = time.monotonic() - start
+        with self.__lock:
+            entry['running'] = False
+            entry['runs'] += 1
+            entry['last_duration'] = duration
+            if error is None:
+                entry['last_success'] = time.time()
+            else:
+                entry['failures'] += 1
+                entry['last_error'] = error
+            if duration > entry['interval']:
+                Logger().warning("collector {} took {:.3f}s, longer than its interval {}s".format(
+                    name, duration, entry['interval']))
+
+    def __advance(self, entry, now):
+        '''
+            计算下一次触发时间; 错过的触发点直接跳过而不是补跑
+        '''
+        interval = entry['interval']
+        tick = entry['tick'] + 1
+        missed = int((now - entry['anchor']) // interval) - tick + 1
+        if missed > 0:
+            entry['skipped'] += missed
+            tick += missed
+        entry['tick'] = tick
+        entry['next_run'] = entry['anchor'] + tick * interval + random.uniform(0, self.__jitter * interval)
+
+    def __schedule_loop(self):
+        while not self.__stop_event.is_set():
+            now = time.monotonic()
+            with self.__lock:
+                for name, entry in self.__collectors.items():
+                    if entry['next_run'] > now:
+                        continue
+                    if entry['running']:
+                        # 上一次采集尚未结束, 本次触发跳过, 避免任务堆积
+                        entry['skipped'] += 1
+                    else:
+                        entry['running'] = True
+                        self.__pool.submit(self.__run, name, entry)
+                    self.__advance(entry, now)
+                next_run = min((e['next_run'] for e in self.__collectors.values()), default=None)
+
+            timeout = None if next_run is None else max(next_run - time.monotonic(), 0)
+            self.__wakeup.wait(timeout)
+            self.__wakeup.clear()
+
+
+# 实时采集器基类: 子类实现_collect_real_time_data, 由CollectorScheduler统一调度
+class RealTimeCollector():
+    # 实时推送的主题名, 为None时不推送
+    TOPIC = None
+    # 每次采集完成后的回调 listener(采集器名称, 快照), 如写入共享内存
+    listeners = []
+
+    def __init__(self, interval=2):
+        self.interval = interval
+        self.data = {}
+
+    def _collect_real_time_data(self):
+        raise NotImplementedError
+
+    def _get_metric_series(self):
+        '''
+            返回需要保存历史的指标 {序列名: 数值}, 默认不保存
+        '''
+        return {}
+
+    def _tick(self):
+        '''
+            采集一次, 写入指标历史并推送给订阅者
+        '''
+        self._collect_real_time_data()
+        values = self._get_metric_series()
+        if values:
+            MetricStore().record(type(self).__name__, self.interval, time.time(), values)
+        if self.TOPIC is not None:
+            MetricBroadcaster().publish(self.TOPIC, self.data.seq, self.data)
+        for listener in self.listeners:
+            listener(type(self).__name__, self.data)
+
+    def start_broadcasting(self):
+        """注册到调度器并开始周期采集"""
+        scheduler = CollectorScheduler()
+        name = type(self).__name__
+        if scheduler.is_registered(name):
+            return
+        scheduler.register(name, self._tick, self.interval)
+        scheduler.start()
+
+    def stop_broadcasting(self):
+        """停止采集"""
+        CollectorScheduler().unregister(type(self).__name__)
+
+    def get_current_data(self):
+        """获取当前采集数据"""
+        return self.data
@@ -0,0 +1,126 @@
+'''
+  Copyright (c) KylinSoft  Co., Ltd. 2024.All rights reserved.
+  extuner licensed under the Mulan Permissive Software License, Version 2.
+  See LICENSE file for more details.
+'''
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# cython:language_level=3
+
+import threading
+from collections import OrderedDict
+
+
+def _escape(key):
+    '''
+        JSON Pointer(RFC 6901)转义
+    '''
+    return str(key).replace('~', '~0').replace('/', '~1')
+
+
+def json_diff(old, new, path='', ops=None):
+    '''
+        计算两个JSON对象的差异, 返回JSON Patch(RFC 6902)操作列表
+        字典逐键比较; 等长列表逐元素比较, 长度变化时整体替换
+    '''
+    if ops is None:
+        ops = []
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old:
+            if key not in new:
+                ops.append({'op': 'remove', 'path': path + '/' + _escape(key)})
+        for key, value in new.items():
+            child = path + '/' + _escape(key)
+            if key in old:
+                json_diff(old[key], value, child, ops)
+            else:
+                ops.append({'op': 'add', 'path': child, 'value': value})
+    elif isinstance(old, (list, tuple)) and isinstance(new, (list, tuple)) and len(old) == len(new):
+        for i, (a, b) in enumerate(zip(old, new)):
+            json_diff(a, b, '{}/{}'.format(path, i), ops)
+    elif type(old) is not type(new) or old != new:
+        ops.append({'op': 'replace', 'path': path, 'value': new})
+    return ops
+
+
+def frame_id(key):
+    '''
+        由快照序号组合生成帧号; 快照序号跨进程(共享采集模式)和重启都不会重复, 帧号同样唯一
+    '''
+    return '-'.join(str(k) for k in key)
+
+
+# 帧历史: 每组新数据以其快照序号组合作为帧号, 保留最近depth帧用于计算增量
+# 每keyframe_interval帧设一个关键帧, 增量的基准早于最近关键帧时返回完整数据, 避免客户端误差累积
+# 客户端的基准帧不在本进程的历史中(重启后或请求到了其他Web进程)时同样返回完整数据
+class FrameHistory():
+    def __init__(self, serialize, depth=30, keyframe_interval=30, exclude=()):
+        '''
+            serialize: 将响应对象序列化为字节的函数
+            exclude: 不参与增量帧的顶层键(静态信息单独获取)
+        '''
+        self.__serialize = serialize
+        self.__exclude = frozenset(exclude)
+        self.__depth = depth
+        self.__keyframe_interval = keyframe_interval
+        self.__lock = threading.Lock()
+        # {帧号: (本进程内的帧序号, 数据)}
+        self.__frames = OrderedDict()
+        self.__count = 0
+        self.__current = None
+        self.__keyframe = 0
+        # 当前帧相对各基准帧的序列化增量 {基准帧号: 字节}
+        self.__delta_cache = {}
+
+    def get_payload(self, key, build):
+        '''
+            返回key(快照序号组合)对应的数据; 与上一帧不同时调用build生成新帧
+        '''
+        fid = frame_id(key)
+        with self.__lock:
+            if fid == self.__current:
+                return self.__frames[fid][1]
+        payload = build()
+        with self.__lock:
+            if fid != self.__current:
+                self.__count += 1
+                self.__current = fid
+                self.__frames[fid] = (self.__count, payload)
+                while len(self.__frames) > self.__depth:
+                    self.__frames.popitem(last=False)
+                if (self.__count - 1) % self.__keyframe_interval == 0:
+                    self.__keyframe = self.__count
+                self.__delta_cache = {}
+            return self.__frames[self.__current][1]
+
+    def get_frame(self, since):
+        '''
+            返回(当前帧号, 当前帧相对since帧的响应(序列化字节))
+            {'seq': 当前帧号, 'type': 'delta', 'base': since, 'patch': [...]} 或
+            {'seq': 当前帧号, 'type': 'full', 'data': {...}}
+        '''
+        with self.__lock:
+            fid = self.__current
+            current = self.__frames[fid][1]
+            # 基准帧未知、已淘汰或早于最近关键帧时返回完整数据, 缓存键为None
+            entry = self.__frames.get(since)
+            base_id = since if entry is not None and entry[0] >= self.__keyframe else None
+            cached = self.__delta_cache.get(base_id)
+            if cached is not None:
+                return fid, cached
+            base = entry[1] if base_id is not None else None
+
+        if self.__exclude:
+            current = {k: v for k, v in current.items() if k not in self.__exclude}
+            if base is not None:
+                base = {k: v for k, v in base.items() if k not in self.__exclude}
+        if base_id is None:
+            frame = {'seq': fid, 'type': 'full', 'data': current}
+        else:
+            frame = {'seq': fid, 'type': 'delta', 'base': base_id, 'patch': json_diff(base, current)}
+        body = self.__serialize(frame)
+
+        with self.__lock:
+            if fid == self.__current:
+                self.__delta_cache[base_id] = body
+        return fid, body
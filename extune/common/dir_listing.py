@@ -0,0 +1,355 @@
+'''
+  Copyright (c) KylinSoft  Co., Ltd. 2024.All rights reserved.
+  extuner licensed under the Mulan Permissive Software License, Version 2.
+  See LICENSE file for more details.
+'''
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# cython:language_level=3
+
+import base64
+import bisect
+import collections
+import ctypes
+import ctypes.util
+import json
+import os
+import struct
+import threading
+import time
+from .log import Logger
+from .single_flight import SingleFlight
+
+
+# 目录项: (名称, 是否目录, 大小, 修改时间, 权限位, 属主, 属组)
+ENTRY_NAME, ENTRY_IS_DIR, ENTRY_SIZE, ENTRY_MTIME, ENTRY_MODE, ENTRY_UID, ENTRY_GID = range(7)
+
+
+def scan_directory(path, show_hidden=False):
+    '''
+        用os.scandir读取目录, 每个目录项只做一次stat(跟随符号链接, 与原os.stat一致)
+        is_dir优先使用readdir返回的类型, 只有符号链接才需要额外判断; 失效的符号链接被跳过
+    '''
+    entries = []
+    with os.scandir(path) as it:
+        for entry in it:
+            name = entry.name
+            if not show_hidden and name.startswith('.'):
+                continue
+            try:
+                st = entry.stat()
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+            entries.append((name, is_dir, 0 if is_dir else st.st_size, st.st_mtime,
+                            st.st_mode, st.st_uid, st.st_gid))
+    return entries
+
+
+# inotify封装(ctypes调用libc): 非阻塞读取, 不需要额外线程, 在每次查询缓存前取出积压的事件
+class DirectoryWatcher():
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    # 只监视目录项的增删和改名; 子文件内容/属性变化(如日志目录中持续写入的文件)不使缓存失效,
+    # 列表中的大小和修改时间由缓存的max_age定时刷新
+    WATCH_MASK = (IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+                  IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self):
+        '''
+            初始化失败(非Linux、无libc或inotify实例数达到上限)时抛出OSError
+        '''
+        libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+        self.__libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.__fd = self.__libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.__fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+    def add(self, path):
+        '''
+            监视目录, 返回watch描述符; 超出max_user_watches等失败时返回None
+        '''
+        wd = self.__libc.inotify_add_watch(self.__fd, os.fsencode(path), self.WATCH_MASK)
+        return wd if wd >= 0 else None
+
+    def remove(self, wd):
+        self.__libc.inotify_rm_watch(self.__fd, wd)
+
+    def read_events(self):
+        '''
+            取出所有已到达的事件, 返回[(wd, mask)]; 队列溢出时wd为-1
+        '''
+        events = []
+        while True:
+            try:
+                data = os.read(self.__fd, 65536)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            offset = 0
+            while offset + self.EVENT_HEADER.size <= len(data):
+                wd, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+                events.append((wd, mask))
+                offset += self.EVENT_HEADER.size + length
+        return events
+
+    def close(self):
+        os.close(self.__fd)
+
+
+# 单个目录的缓存列表, 按排序方式懒生成有序视图; 按名称过滤的视图只保留最近FILTERED_VIEWS个
+class DirectoryListing():
+    FILTERED_VIEWS = 4
+
+    def __init__(self, path, st, entries, watch):
+        self.path = path
+        # 目录自身的(设备, inode, 修改时间), 目录被替换或有增删时变化
+        self.signature = (st.st_dev, st.st_ino, st.st_mtime_ns)
+        self.entries = entries
+        self.watch = watch
+        self.stale = False
+        self.load_time = time.monotonic()
+        self.__views = {}
+        # {(排序方式, 小写过滤串): 视图}, 按访问顺序排列
+        self.__filtered = collections.OrderedDict()
+        self.__lock = threading.Lock()
+
+    def view(self, sort, query=''):
+        '''
+            返回排序视图[(目录段键列表, 目录段项), (文件段键列表, 文件段项)], 目录始终在文件前
+            每段按键升序排列, 键以名称收尾保证唯一, 可用于二分定位游标
+            query非空时只保留名称包含query(不区分大小写)的项, 键与完整视图相同
+        '''
+        with self.__lock:
+            view = self.__views.get(sort)
+            if view is None:
+                view = self.__views[sort] = self.__build_view(sort)
+            if not query:
+                return view
+            key = (sort, query.lower())
+            filtered = self.__filtered.get(key)
+            if filtered is None:
+                filtered = self.__filtered[key] = self.__filter_view(view, key[1])
+                while len(self.__filtered) > self.FILTERED_VIEWS:
+                    self.__filtered.popitem(last=False)
+            else:
+                self.__filtered.move_to_end(key)
+            return filtered
+
+    @staticmethod
+    def __filter_view(view, needle):
+        filtered = []
+        for keys, entries in view:
+            matched = [i for i, e in enumerate(entries) if needle in e[ENTRY_NAME].lower()]
+            filtered.append(([keys[i] for i in matched], [entries[i] for i in matched]))
+        return filtered
+
+    def __build_view(self, sort):
+        if sort == 'size':
+            key = lambda e: (e[ENTRY_SIZE], e[ENTRY_NAME].lower(), e[ENTRY_NAME])
+        elif sort == 'modified':
+            key = lambda e: (e[ENTRY_MTIME], e[ENTRY_NAME].lower(), e[ENTRY_NAME])
+        else:
+            key = lambda e: (e[ENTRY_NAME].lower(), e[ENTRY_NAME])
+        view = []
+        for is_dir in (True, False):
+            keyed = sorted((key(e), e) for e in self.entries if e[ENTRY_IS_DIR] == is_dir)
+            view.append(([k for k, _ in keyed], [e for _, e in keyed]))
+        return view
+
+
+# 目录列表缓存: scandir读取目录后按目录缓存, 分页通过不透明游标(上一页最后一项的排序键)实现
+# 目录项增删改名由inotify事件(没有inotify时由目录修改时间)立即使缓存失效;
+# 子项的大小和时间变化不改变目录本身, 缓存超过max_age秒后重新读取
+class DirectoryListingCache():
+    SORT_KEYS = ('name', 'size', 'modified')
+
+    def __init__(self, max_dirs=64, max_entries=500000, max_age=5, use_inotify=True):
+        '''
+            max_dirs: 缓存的目录数上限
+            max_entries: 缓存的目录项总数上限, 超出时淘汰最久未访问的目录
+            max_age: 缓存的最长使用时间(秒), 决定列表中大小和修改时间的刷新周期
+        '''
+        self.max_dirs = max_dirs
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.__lock = threading.Lock()
+        # {路径: DirectoryListing}, 按访问顺序排列
+        self.__listings = collections.OrderedDict()
+        self.__entry_count = 0
+        # {watch描述符: 路径}
+        self.__watches = {}
+        # {watch描述符: 事件计数}, 用于发现读取目录期间发生的变化
+        self.__generations = {}
+        self.__flight = SingleFlight()
+        self.__stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+        self.__watcher = None
+        if use_inotify:
+            try:
+                self.__watcher = DirectoryWatcher()
+            except (OSError, AttributeError) as e:
+                Logger().warning("inotify unavailable, directory cache falls back to mtime: {}".format(e))
+
+    def __process_events(self):
+        for wd, mask in self.__watcher.read_events():
+            if wd == -1 or mask & DirectoryWatcher.IN_Q_OVERFLOW:
+                for listing in self.__listings.values():
+                    listing.stale = True
+                self.__stats['invalidations'] += 1
+                continue
+            self.__generations[wd] = self.__generations.get(wd, 0) + 1
+            path = self.__watches.get(wd)
+            listing = self.__listings.get(path) if path is not None else None
+            if listing is not None and listing.watch == wd and not listing.stale:
+                listing.stale = True
+                self.__stats['invalidations'] += 1
+            if mask & DirectoryWatcher.IN_IGNORED:
+                # 目录被删除或所在文件系统被卸载, 内核已自动移除监视
+                self.__watches.pop(wd, None)
+                self.__generations.pop(wd, None)
+                if listing is not None and listing.watch == wd:
+                    listing.watch = None
+
+    def __is_fresh(self, listing, st):
+        if listing.stale or listing.signature != (st.st_dev, st.st_ino, st.st_mtime_ns):
+            return False
+        return time.monotonic() - listing.load_time < self.max_age
+
+    def __drop(self, path):
+        listing = self.__listings.pop(path)
+        self.__entry_count -= len(listing.entries)
+        if listing.watch is not None and self.__watches.get(listing.watch) == path:
+            self.__watcher.remove(listing.watch)
+            del self.__watches[listing.watch]
+            self.__generations.pop(listing.watch, None)
+
+    def __load(self, path):
+        '''
+            先建立监视再读取目录, 读取期间的变化会使新列表直接标记为过期
+        '''
+        watch, generation = None, 0
+        if self.__watcher is not None:
+            with self.__lock:
+                watch = self.__watcher.add(path)
+                if watch is not None:
+                    self.__watches[watch] = path
+                    generation = self.__generations.get(watch, 0)
+        st = os.stat(path)
+        entries = scan_directory(path)
+        listing = DirectoryListing(path, st, entries, watch)
+        with self.__lock:
+            if self.__watcher is not None:
+                self.__process_events()
+            if watch is not None and self.__generations.get(watch, 0) != generation:
+                listing.stale = True
+            old = self.__listings.get(path)
+            if old is not None:
+                # 目录被替换(inode变化)时旧目录的监视不再需要
+                if old.watch is not None and old.watch != watch:
+                    self.__drop(path)
+                else:
+                    del self.__listings[path]
+                    self.__entry_count -= len(old.entries)
+            self.__listings[path] = listing
+            self.__entry_count += len(entries)
+            while len(self.__listings) > 1 and (len(self.__listings) > self.max_dirs or
+                                                self.__entry_count > self.max_entries):
+                self.__drop(next(iter(self.__listings)))
+        return listing
+
+    def get(self, path):
+        '''
+            返回目录的缓存列表, 缓存缺失或失效时重新读取; 目录不可读时抛出OSError
+        '''
+        st = os.stat(path)
+        with self.__lock:
+            if self.__watcher is not None:
+                self.__process_events()
+            listing = self.__listings.get(path)
+            if listing is not None and self.__is_fresh(listing, st):
+                self.__listings.move_to_end(path)
+                self.__stats['hits'] += 1
+                return listing
+            self.__stats['misses'] += 1
+        # 同一目录的并发读取只执行一次
+        return self.__flight.do(path, lambda: self.__load(path))
+
+    @staticmethod
+    def encode_cursor(sort, reverse, segment, key):
+        data = json.dumps([sort, reverse, segment, list(key)], separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor, sort, reverse):
+        '''
+            返回(段序号, 排序键); 游标无效或与排序方式不符时抛出ValueError
+        '''
+        try:
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            cursor_sort, cursor_reverse, segment, key = json.loads(data)
+        except Exception:
+            raise ValueError("invalid cursor")
+        if cursor_sort != sort or cursor_reverse != reverse or segment not in (0, 1):
+            raise ValueError("cursor does not match sort order")
+        # 键的结构与排序视图一致: 名称排序为(小写名称, 名称), 其余为(数值, 小写名称, 名称)
+        # 类型不符的键与视图中的键比较时会抛出TypeError
+        if not isinstance(key, list) or len(key) != (2 if sort == 'name' else 3) or \
+                not all(isinstance(k, str) for k in key[-2:]) or \
+                (sort != 'name' and (isinstance(key[0], bool) or not isinstance(key[0], (int, float)))):
+            raise ValueError("invalid cursor")
+        return segment, tuple(key)
+
+    def page(self, path, sort='name', reverse=False, cursor=None, limit=500, query=''):
+        '''
+            返回(目录项列表, 目录项总数, 下一页游标或None)
+            游标记录上一页最后一项的排序键, 目录在两次请求之间发生变化时也不会重复或遗漏未变化的项
+            query非空时在整个缓存列表中按名称过滤(不区分大小写的子串匹配), 总数为匹配项数
+        '''
+        if sort not in self.SORT_KEYS:
+            raise ValueError("unknown sort key: {}".format(sort))
+        listing = self.get(path)
+        view = listing.view(sort, query)
+        total = sum(len(keys) for keys, _ in view) if query else len(listing.entries)
+        segment, after = self.decode_cursor(cursor, sort, reverse) if cursor else (0, None)
+
+        items = []
+        last = None
+        for index in range(segment, len(view)):
+            keys, entries = view[index]
+            if reverse:
+                end = bisect.bisect_left(keys, after) if index == segment and after is not None else len(keys)
+                start = max(end - (limit - len(items)), 0)
+                items.extend(reversed(entries[start:end]))
+                if start < end:
+                    last = (index, keys[start])
+                remaining = start > 0
+            else:
+                start = bisect.bisect_right(keys, after) if index == segment and after is not None else 0
+                end = min(start + (limit - len(items)), len(keys))
+                items.extend(entries[start:end])
+                if start < end:
+                    last = (index, keys[end - 1])
+                remaining = end < len(keys)
+            if len(items) >= limit:
+                if remaining or any(view[i][0] for i in range(index + 1, len(view))):
+                    next_cursor = self.encode_cursor(sort, reverse, last[0], last[1])
+                    return items, total, next_cursor
+                break
+        return items, total, None
+
+    def get_stats(self):
+        with self.__lock:
+            return dict(self.__stats, directories=len(self.__listings), entries=self.__entry_count,
+                        inotify=self.__watcher is not None, watches=len(self.__watches))
@@ -0,0 +1,208 @@
+'''
+  Copyright (c) KylinSoft  Co., Ltd. 2024.All rights reserved.
+  extuner licensed under the Mulan Permissive Software License, Version 2.
+  See LICENSE file for more details.
+'''
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# cython:language_level=3
+
+import os
+import uuid
+from email.utils import formatdate, parsedate_to_datetime
+
+
+# 无法零拷贝发送时每次读取的字节数
+BLOCK_SIZE = 1024 * 1024
+# 一个请求最多的区间数(合并后), 超出时忽略Range返回整个文件
+MAX_RANGES = 32
+
+
+def file_etag(st):
+    '''
+        强ETag: 由inode、大小和纳秒级修改时间组成, 文件被替换或修改后变化
+    '''
+    return '"{:x}-{:x}-{:x}"'.format(st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def parse_http_date(value):
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def parse_range_header(value, size):
+    '''
+        解析Range请求头, 返回按起始位置排序并合并重叠区间后的[(起始, 结束(不含))]
+        格式无效时返回None(按规范忽略Range, 返回整个文件); 所有区间都超出文件范围时返回[]
+    '''
+    if not value or not value.startswith('bytes='):
+        return None
+    ranges = []
+    for part in value[6:].split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, sep, last = part.partition('-')
+        if not sep:
+            return None
+        try:
+            if first == '':
+                # 后缀区间: 最后N字节
+                length = int(last)
+                if length < 0:
+                    return None
+                if length == 0 or size == 0:
+                    continue
+                ranges.append((max(size - length, 0), size))
+            else:
+                start = int(first)
+                end = int(last) + 1 if last else None
+                if start < 0 or (end is not None and end <= start):
+                    return None
+                if start >= size:
+                    continue
+                ranges.append((start, min(end, size) if end is not None else size))
+        except ValueError:
+            return None
+    ranges.sort()
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+    if len(merged) > MAX_RANGES:
+        return None
+    return merged
+
+
+def is_not_modified(headers, etag, mtime):
+    '''
+        If-None-Match优先于If-Modified-Since; 弱比较ETag
+    '''
+    if_none_match = headers.get('If-None-Match')
+    if if_none_match is not None:
+        if if_none_match.strip() == '*':
+            return True
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return etag in [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+    since = parse_http_date(headers.get('If-Modified-Since'))
+    return since is not None and int(mtime) <= since
+
+
+def if_range_matches(headers, etag, mtime):
+    '''
+        If-Range: ETag须强匹配, 日期须与Last-Modified一致; 不匹配时返回整个文件
+    '''
+    value = headers.get('If-Range')
+    if not value:
+        return True
+    value = value.strip()
+    if value.startswith('"') or value.startswith('W/'):
+        return value == etag
+    since = parse_http_date(value)
+    return since is not None and int(mtime) == since
+
+
+def iter_file_range(f, start, end, block_size=BLOCK_SIZE):
+    '''
+        读取[start, end)区间, 结束或被关闭时关闭文件
+    '''
+    try:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            data = f.read(min(block_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+    finally:
+        f.close()
+
+
+def iter_multipart(f, parts, block_size=BLOCK_SIZE):
+    '''
+        parts: [(分段头部字节, 起始, 结束)], 最后一项的起始和结束相同, 只输出结束分隔符
+    '''
+    try:
+        for header, start, end in parts:
+            yield header
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                data = f.read(min(block_size, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+                yield data
+    finally:
+        f.close()
+
+
+def build_file_response(path, mimetype, headers, file_wrapper=None, head=False):
+    '''
+        生成文件响应, 支持条件请求(ETag/Last-Modified)和Range(单区间及multipart/byteranges多区间)
+        headers: 请求头(支持get的映射)
+        file_wrapper: WSGI服务器提供的wsgi.file_wrapper, 如gunicorn用sendfile零拷贝发送;
+            只用于读到文件末尾的响应(整个文件或续传), 避免依赖服务器按Content-Length截断
+        返回(状态码, 响应头, 响应体可迭代对象)
+    '''
+    f = open(path, 'rb')
+    try:
+        st = os.fstat(f.fileno())
+        size = st.st_size
+        etag = file_etag(st)
+        response_headers = {
+            'ETag': etag,
+            'Last-Modified': formatdate(st.st_mtime, usegmt=True),
+            'Accept-Ranges': 'bytes'
+        }
+        if is_not_modified(headers, etag, st.st_mtime):
+            f.close()
+            return 304, response_headers, []
+
+        ranges = None
+        if headers.get('Range') and if_range_matches(headers, etag, st.st_mtime):
+            ranges = parse_range_header(headers.get('Range'), size)
+        if ranges == []:
+            f.close()
+            response_headers['Content-Range'] = 'bytes */{}'.format(size)
+            response_headers['Content-Length'] = '0'
+            return 416, response_headers, []
+
+        if ranges is not None and len(ranges) > 1:
+            boundary = uuid.uuid4().hex
+            parts = []
+            for start, end in ranges:
+                header = ('--{}\r\nContent-Type: {}\r\nContent-Range: bytes {}-{}/{}\r\n\r\n'.format(
+                    boundary, mimetype, start, end - 1, size)).encode('latin-1')
+                # 除第一段外, 分隔符前需要换行
+                parts.append((header if not parts else b'\r\n' + header, start, end))
+            parts.append(('\r\n--{}--\r\n'.format(boundary).encode('latin-1'), 0, 0))
+            response_headers['Content-Type'] = 'multipart/byteranges; boundary={}'.format(boundary)
+            response_headers['Content-Length'] = str(sum(len(h) + end - start for h, start, end in parts))
+            if head:
+                f.close()
+                return 206, response_headers, []
+            return 206, response_headers, iter_multipart(f, parts)
+
+        if ranges is None:
+            status, start, end = 200, 0, size
+        else:
+            status, (start, end) = 206, ranges[0]
+            response_headers['Content-Range'] = 'bytes {}-{}/{}'.format(start, end - 1, size)
+        response_headers['Content-Type'] = mimetype
+        response_headers['Content-Length'] = str(end - start)
+        if head:
+            f.close()
+            return status, response_headers, []
+        if file_wrapper is not None and end == size:
+            f.seek(start)
+            return status, response_headers, file_wrapper(f, BLOCK_SIZE)
+        return status, response_headers, iter_file_range(f, start, end)
+    except BaseException:
+        f.close()
+        raise
@@ -0,0 +1,131 @@
+'''
+  Copyright (c) KylinSoft  Co., Ltd. 2024.All rights reserved.
+  extuner licensed under the Mulan Permissive Software License, Version 2.
+  See LICENSE file for more details.
+'''
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# cython:language_level=3
+
+import os
+import threading
+import time
+from .decorator_wrap import DecoratorWrap
+from .log import Logger
+
+
+# 单项主机信息: 记录加载结果、加载时间和依赖文件的状态
+class HostFact():
+    def __init__(self, name, loader, ttl, files, background, default):
+        self.name = name
+        self.loader = loader
+        self.ttl = ttl
+        self.files = tuple(files)
+        self.background = background
+        self.default = default
+        self.value = default
+        self.loaded = False
+        self.load_time = 0.0
+        self.file_state = None
+        self.refreshing = False
+        # 保证同一项信息同一时刻只有一个线程在加载
+        self.lock = threading.Lock()
+
+
+# 主机信息注册表: 每项信息单独设置有效期, 依赖的文件修改后立即失效
+# 耗时较长的信息(如外网IP)在后台刷新, 调用方直接取得上一次的结果
+@DecoratorWrap.singleton
+class HostFactsRegistry():
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__facts = {}
+
+    def register(self, name, loader, ttl=None, files=(), background=False, default=None):
+        '''
+            name: 信息名称
+            loader: 无参加载函数
+            ttl: 有效期(秒), None表示只在依赖文件变化时失效
+            files: 依赖的文件, 修改时间、大小或inode变化时失效
+            background: 为True时过期后先返回旧值, 在后台线程中刷新
+            default: 首次加载完成前返回的值
+        '''
+        with self.__lock:
+            self.__facts[name] = HostFact(name, loader, ttl, files, background, default)
+
+    @staticmethod
+    def __stat_files(files):
+        state = []
+        for path in files:
+            try:
+                st = os.stat(path)
+                state.append((st.st_ino, st.st_size, st.st_mtime_ns))
+            except OSError:
+                state.append(None)
+        return tuple(state)
+
+    def __is_stale(self, fact):
+        if not fact.loaded:
+            return True
+        if fact.ttl is not None and time.time() - fact.load_time > fact.ttl:
+            return True
+        return bool(fact.files) and self.__stat_files(fact.files) != fact.file_state
+
+    def __load(self, fact):
+        with fact.lock:
+            # 等锁期间可能已被其他线程加载
+            if not self.__is_stale(fact):
+                return
+            file_state = self.__stat_files(fact.files)
+            try:
+                fact.value = fact.loader()
+            except Exception as e:
+                Logger().error("load host fact {} failed: {}".format(fact.name, e))
+                if not fact.loaded:
+                    fact.value = fact.default
+            fact.loaded = True
+            fact.load_time = time.time()
+            fact.file_state = file_state
+
+    def __load_in_background(self, fact):
+        try:
+            self.__load(fact)
+        finally:
+            fact.refreshing = False
+
+    def __refresh_async(self, fact):
+        with self.__lock:
+            if fact.refreshing:
+                return
+            fact.refreshing = True
+        thread = threading.Thread(target=self.__load_in_background, args=(fact,),
+                                  name='host-fact-{}'.format(fact.name))
+        thread.daemon = True
+        thread.start()
+
+    def get(self, name):
+        '''
+            返回信息的值; 已过期时同步重新加载, 后台刷新的信息直接返回旧值
+        '''
+        fact = self.__facts[name]
+        if self.__is_stale(fact):
+            if fact.background:
+                self.__refresh_async(fact)
+            else:
+                self.__load(fact)
+        return fact.value
+
+    def prefetch(self):
+        '''
+            在后台加载所有需要后台刷新的信息, 启动时调用
+        '''
+        for fact in list(self.__facts.values()):
+            if fact.background and self.__is_stale(fact):
+                self.__refresh_async(fact)
+
+    def get_status(self):
+        '''
+            各项信息的加载时间和有效期
+        '''
+        return {name: {'loaded': fact.loaded, 'load_time': fact.load_time, 'ttl': fact.ttl,
+                       'background': fact.background, 'refreshing': fact.refreshing}
+                for name, fact in list(self.__facts.items())}
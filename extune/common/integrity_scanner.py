@@ -0,0 +1,536 @@
+'''
+  Copyright (c) KylinSoft  Co., Ltd. 2024.All rights reserved.
+  extuner licensed under the Mulan Permissive Software License, Version 2.
+  See LICENSE file for more details.
+'''
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# cython:language_level=3
+
+import concurrent.futures
+import fcntl
+import hashlib
+import json
+import mmap
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+from .log import Logger
+
+READ_CHUNK = 1024 * 1024
+
+
+def hash_files(paths, use_mmap=True):
+    '''
+        计算一批文件的SHA-256, 返回[(路径, 摘要或None, 读取字节数, 错误信息或None)]
+        use_mmap: 通过mmap读取, 不经过Python缓冲区复制; 映射期间文件被截断时访问会触发SIGBUS,
+                  只在工作进程中使用, 否则按块read
+    '''
+    results = []
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                digest = hashlib.sha256()
+                if use_mmap:
+                    size = os.fstat(f.fileno()).st_size
+                    if size:
+                        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                            digest.update(mm)
+                else:
+                    size = 0
+                    for chunk in iter(lambda: f.read(READ_CHUNK), b''):
+                        digest.update(chunk)
+                        size += len(chunk)
+            results.append((path, digest.hexdigest(), size, None))
+        except (OSError, ValueError) as e:
+            results.append((path, None, 0, str(e)))
+    return results
+
+
+# 单次扫描任务: 记录进度、吞吐量和与上一次基线的差异
+class ScanJob():
+    # 差异列表最多返回的条目数
+    MAX_CHANGES = 1000
+
+    def __init__(self, scan_id, scan_type, roots):
+        self.scan_id = scan_id
+        self.scan_type = scan_type
+        self.roots = roots
+        self.status = 'running'
+        self.phase = 'discovering'
+        self.cancel_event = threading.Event()
+        self.finished = threading.Event()
+        self.start_time = time.time()
+        self.end_time = None
+        self.files_total = 0
+        self.files_scanned = 0
+        self.files_cached = 0
+        self.files_hashed = 0
+        self.errors = 0
+        self.bytes_to_hash = 0
+        self.bytes_hashed = 0
+        self.current_file = ''
+        self.baseline_created = False
+        self.changes = {'added': [], 'removed': [], 'modified': []}
+        self.change_counts = {'added': 0, 'removed': 0, 'modified': 0}
+        self.error = None
+
+    def add_change(self, kind, path):
+        self.change_counts[kind] += 1
+        if len(self.changes[kind]) < self.MAX_CHANGES:
+            self.changes[kind].append(path)
+
+    def to_dict(self, details=False):
+        end = self.end_time or time.time()
+        elapsed = max(end - self.start_time, 1e-6)
+        bytes_per_second = self.bytes_hashed / elapsed
+        if self.status != 'running':
+            progress = 100 if self.status == 'completed' else \
+                int(self.files_scanned * 100 / self.files_total) if self.files_total else 0
+        elif self.phase == 'discovering' or not self.files_total:
+            progress = 0
+        else:
+            progress = min(int(self.files_scanned * 100 / self.files_total), 99)
+        remaining = self.bytes_to_hash - self.bytes_hashed
+        if self.status != 'running':
+            estimated = 0
+        elif bytes_per_second > 0:
+            estimated = round(remaining / bytes_per_second, 1)
+        else:
+            estimated = None
+        result = {
+            'scan_id': self.scan_id,
+            'type': self.scan_type,
+            'roots': self.roots,
+            'status': self.status,
+            'phase': self.phase,
+            'progress': progress,
+            'files_total': self.files_total,
+            'files_scanned': self.files_scanned,
+            'files_hashed': self.files_hashed,
+            'files_cached': self.files_cached,
+            'errors': self.errors,
+            'bytes_hashed': self.bytes_hashed,
+            'files_per_second': round(self.files_scanned / elapsed, 1),
+            'mb_per_second': round(bytes_per_second / 1048576, 2),
+            'estimated_time': estimated,
+            'current_file': self.current_file if self.status == 'running' else self.status,
+            'start_time': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.start_time)),
+            'elapsed': round(elapsed, 1),
+            'baseline_created': self.baseline_created,
+            'changes_found': self.change_counts,
+            # 与基线相比内容被修改或被删除的文件视为完整性威胁
+            'threats_found': self.change_counts['modified'] + self.change_counts['removed'],
+            'error': self.error
+        }
+        if details:
+            result['changes'] = self.changes
+        return result
+
+
+# 文件完整性扫描: 后台任务遍历配置的目录, 用进程池计算摘要并与上一次完成的扫描(基线)比较
+# 基线文件同时作为摘要缓存: (inode, 大小, mtime, ctime)均未变化的文件直接沿用上次的摘要
+# 多个Web进程共用同一状态目录: 扫描进程对状态目录下的锁文件加flock, 任务状态定期写入scans/下的文件,
+# 其他进程通过状态文件查询进度, 通过取消标记文件取消扫描
+class IntegrityScanner():
+    SCAN_ROOTS = {
+        'quick': ('/usr/bin', '/usr/sbin', '/boot'),
+        'full': ('/usr/bin', '/usr/sbin', '/boot', '/etc', '/bin', '/sbin',
+                 '/usr/lib', '/usr/lib64', '/lib', '/lib64', '/usr/local')
+    }
+    STATE_VERSION = 1
+    # 每个任务提交给工作进程的文件数和字节数上限
+    BATCH_FILES = 64
+    BATCH_BYTES = 64 * 1024 * 1024
+    MAX_JOBS = 10
+    # 任务状态写入状态文件的间隔(秒)
+    REPORT_INTERVAL = 0.5
+    SCAN_ID = re.compile(r'^scan_\d+$')
+
+    def __init__(self, state_path, workers=None, roots=None):
+        '''
+            state_path: 基线文件路径
+            workers: 工作进程数, 默认为CPU数的一半
+            roots: {扫描类型: 目录列表}, 默认为SCAN_ROOTS
+        '''
+        self.state_path = state_path
+        self.workers = workers or max((os.cpu_count() or 2) // 2, 1)
+        self.roots = roots or self.SCAN_ROOTS
+        self.state_dir = os.path.dirname(os.path.abspath(state_path))
+        self.lock_path = os.path.join(self.state_dir, 'scan.lock')
+        self.jobs_dir = os.path.join(self.state_dir, 'scans')
+        self.__lock = threading.Lock()
+        self.__jobs = {}
+        self.__running = None
+        self.__lock_fd = None
+
+    def __acquire_scan_lock(self, scan_id):
+        '''
+            对锁文件加排他flock, 保证同一时刻只有一个进程在扫描和写基线; 已被其他进程持有时立即返回False
+            锁文件内容为持有者正在运行的扫描ID
+        '''
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, scan_id.encode(), 0)
+        self.__lock_fd = fd
+        return True
+
+    def __release_scan_lock(self):
+        fd, self.__lock_fd = self.__lock_fd, None
+        if fd is not None:
+            os.ftruncate(fd, 0)
+            # 关闭文件即释放flock
+            os.close(fd)
+
+    def __locked_scan_id(self):
+        '''
+            持有锁的进程正在运行的扫描ID, 没有进程在扫描时返回None
+        '''
+        try:
+            fd = os.open(self.lock_path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+            except OSError:
+                # 刚加锁尚未写入扫描ID时返回空字符串
+                return os.pread(fd, 64, 0).decode()
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            return None
+        finally:
+            os.close(fd)
+
+    def __job_path(self, scan_id):
+        return os.path.join(self.jobs_dir, scan_id + '.json')
+
+    def __cancel_path(self, scan_id):
+        return os.path.join(self.jobs_dir, scan_id + '.cancel')
+
+    def __save_job(self, job):
+        path = self.__job_path(job.scan_id)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(job.to_dict(details=True), f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def __prune_jobs(self):
+        '''
+            只保留最近MAX_JOBS个任务的状态文件
+        '''
+        names = sorted(name for name in os.listdir(self.jobs_dir) if name.endswith('.json'))
+        for name in names[:-self.MAX_JOBS]:
+            try:
+                os.remove(os.path.join(self.jobs_dir, name))
+            except OSError:
+                pass
+
+    def __report(self, job):
+        '''
+            扫描期间定期写入任务状态, 并检查其他进程写入的取消标记
+        '''
+        while not job.finished.wait(self.REPORT_INTERVAL):
+            if os.path.exists(self.__cancel_path(job.scan_id)):
+                job.cancel_event.set()
+            try:
+                self.__save_job(job)
+            except Exception as e:
+                Logger().error("save integrity scan {} status failed: {}".format(job.scan_id, e))
+
+    def __load_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('version') == self.STATE_VERSION:
+                return state['files']
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            Logger().error("load integrity baseline {} failed: {}".format(self.state_path, e))
+        return None
+
+    def __save_state(self, files):
+        directory = os.path.dirname(self.state_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.STATE_VERSION, 'updated': time.time(), 'files': files},
+                      f, separators=(',', ':'))
+        os.replace(tmp_path, self.state_path)
+
+    @classmethod
+    def __unique_roots(cls, roots):
+        '''
+            去掉不存在的目录, 以及合并/usr后指向同一位置(如/bin -> /usr/bin)或被其他目录包含的目录
+        '''
+        result = []
+        for real in sorted(set(os.path.realpath(root) for root in roots), key=len):
+            if os.path.isdir(real) and not cls.__in_roots(real, result):
+                result.append(real)
+        return result
+
+    @staticmethod
+    def __walk(root, job):
+        '''
+            遍历目录下的普通文件(不跟随符号链接), 返回[(路径, stat结果)]
+        '''
+        files = []
+        stack = [root]
+        while stack and not job.cancel_event.is_set():
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif entry.is_file(follow_symlinks=False):
+                                files.append((entry.path, entry.stat(follow_symlinks=False)))
+                        except OSError:
+                            job.errors += 1
+            except OSError:
+                job.errors += 1
+        return files
+
+    @staticmethod
+    def __in_roots(path, roots):
+        return any(path == root or path.startswith(root.rstrip('/') + '/') for root in roots)
+
+    def __create_executor(self):
+        '''
+            Linux下以fork方式创建进程池: spawn/forkserver会在子进程中重新导入主模块(app.py),
+            导致采集器再次启动; 其他平台改用线程池(hashlib计算大块数据时会释放GIL)
+        '''
+        if 'fork' in multiprocessing.get_all_start_methods():
+            return concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context('fork'))
+        return concurrent.futures.ThreadPoolExecutor(max_workers=self.workers)
+
+    def __batches(self, pending):
+        batch, batch_bytes = [], 0
+        for path, size in pending:
+            batch.append(path)
+            batch_bytes += size
+            if len(batch) >= self.BATCH_FILES or batch_bytes >= self.BATCH_BYTES:
+                yield batch
+                batch, batch_bytes = [], 0
+        if batch:
+            yield batch
+
+    def __run(self, job):
+        reporter = threading.Thread(target=self.__report, args=(job,), name='integrity-scan-report')
+        reporter.daemon = True
+        reporter.start()
+        try:
+            self.__scan(job)
+        except Exception as e:
+            Logger().error("integrity scan {} failed: {}".format(job.scan_id, e))
+            job.status = 'failed'
+            job.error = str(e)
+        finally:
+            job.end_time = time.time()
+            job.finished.set()
+            reporter.join()
+            # 最终状态写入后再释放锁, 其他进程不会把已结束的扫描误判为异常退出
+            try:
+                self.__save_job(job)
+                if os.path.exists(self.__cancel_path(job.scan_id)):
+                    os.remove(self.__cancel_path(job.scan_id))
+            except Exception as e:
+                Logger().error("save integrity scan {} status failed: {}".format(job.scan_id, e))
+            with self.__lock:
+                self.__running = None
+                self.__release_scan_lock()
+
+    @staticmethod
+    def __collect(job, digests, results):
+        for path, digest, size, error in results:
+            job.files_scanned += 1
+            job.current_file = path
+            if error is not None:
+                job.errors += 1
+                del digests[path]
+                continue
+            job.files_hashed += 1
+            job.bytes_hashed += size
+            digests[path][4] = digest
+
+    def __scan(self, job):
+        baseline = self.__load_state()
+        cache = baseline or {}
+
+        # 1. 遍历目录, 元数据未变的文件沿用缓存的摘要
+        discovered = []
+        for root in job.roots:
+            discovered.extend(self.__walk(root, job))
+        job.files_total = len(discovered)
+        digests = {}
+        pending = []
+        for path, st in discovered:
+            key = [st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns]
+            cached = cache.get(path)
+            if cached is not None and cached[:4] == key:
+                digests[path] = cached
+                job.files_cached += 1
+                job.files_scanned += 1
+            else:
+                digests[path] = key + [None]
+                pending.append((path, st.st_size))
+                job.bytes_to_hash += st.st_size
+        job.phase = 'hashing'
+
+        # 2. 进程池计算变化文件的摘要, 控制在途任务数以便及时响应取消
+        if pending and not job.cancel_event.is_set():
+            executor = self.__create_executor()
+            use_mmap = isinstance(executor, concurrent.futures.ProcessPoolExecutor)
+            batches = self.__batches(pending)
+            # {future: 文件批次}
+            in_flight = {}
+            try:
+                while not job.cancel_event.is_set():
+                    while len(in_flight) < self.workers * 2:
+                        batch = next(batches, None)
+                        if batch is None:
+                            break
+                        in_flight[executor.submit(hash_files, batch, use_mmap)] = batch
+                    if not in_flight:
+                        break
+                    done, _ = concurrent.futures.wait(
+                        in_flight, timeout=0.5, return_when=concurrent.futures.FIRST_COMPLETED)
+                    broken = False
+                    for future in done:
+                        batch = in_flight.pop(future)
+                        try:
+                            results = future.result()
+                        except BrokenProcessPool:
+                            # 工作进程异常退出(如映射的文件被截断触发SIGBUS), 本批文件在当前线程中按块读取
+                            broken = True
+                            results = hash_files(batch, use_mmap=False)
+                        self.__collect(job, digests, results)
+                    if broken:
+                        # 进程池已不可用, 其余在途批次同样会失败, 逐批重试后换用新的进程池
+                        Logger().error("integrity scan {}: hash worker exited, retrying with read()".format(
+                            job.scan_id))
+                        concurrent.futures.wait(in_flight)
+                        for future, batch in in_flight.items():
+                            try:
+                                results = future.result()
+                            except BrokenProcessPool:
+                                results = hash_files(batch, use_mmap=False)
+                            self.__collect(job, digests, results)
+                        in_flight = {}
+                        executor.shutdown(wait=False)
+                        executor = self.__create_executor()
+            finally:
+                for future in in_flight:
+                    future.cancel()
+                executor.shutdown()
+
+        if job.cancel_event.is_set():
+            job.status = 'cancelled'
+            return
+
+        # 3. 与基线比较, 只比较本次扫描的目录
+        job.phase = 'comparing'
+        if baseline is None:
+            job.baseline_created = True
+        else:
+            for path, entry in baseline.items():
+                if not self.__in_roots(path, job.roots):
+                    continue
+                current = digests.get(path)
+                if current is None:
+                    job.add_change('removed', path)
+                elif current[4] != entry[4]:
+                    job.add_change('modified', path)
+            for path in digests:
+                if path not in baseline:
+                    job.add_change('added', path)
+
+        # 4. 更新基线: 保留其他目录的记录, 替换本次扫描目录的记录
+        files = {path: entry for path, entry in cache.items() if not self.__in_roots(path, job.roots)}
+        files.update(digests)
+        self.__save_state(files)
+        job.status = 'completed'
+
+    def start(self, scan_type='quick'):
+        '''
+            启动后台扫描, 返回(任务状态, 是否新建); 本进程或其他进程已有扫描在运行时返回该扫描的状态
+        '''
+        if scan_type not in self.roots:
+            raise ValueError("unknown scan type: {}".format(scan_type))
+        with self.__lock:
+            if self.__running is not None:
+                return self.__running.to_dict(), False
+            scan_id = 'scan_{}'.format(int(time.time() * 1000))
+            job = None
+            if self.__acquire_scan_lock(scan_id):
+                job = ScanJob(scan_id, scan_type, self.__unique_roots(self.roots[scan_type]))
+                self.__jobs[scan_id] = job
+                self.__running = job
+                # 只保留最近的任务记录
+                for old_id in list(self.__jobs)[:-self.MAX_JOBS]:
+                    del self.__jobs[old_id]
+        if job is None:
+            running_id = self.__locked_scan_id()
+            status = self.get(running_id) if running_id else None
+            return status or {'scan_id': running_id, 'status': 'running'}, False
+        self.__save_job(job)
+        self.__prune_jobs()
+        thread = threading.Thread(target=self.__run, args=(job,), name='integrity-scan')
+        thread.daemon = True
+        thread.start()
+        return job.to_dict(), True
+
+    def get(self, scan_id):
+        '''
+            返回扫描状态, 扫描结束后包含差异列表; 可查询其他进程启动的扫描, 不存在时返回None
+        '''
+        with self.__lock:
+            job = self.__jobs.get(scan_id)
+        if job is not None:
+            return job.to_dict(details=job.status != 'running')
+        if not self.SCAN_ID.match(scan_id):
+            return None
+        try:
+            with open(self.__job_path(scan_id), 'r', encoding='utf-8') as f:
+                status = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if status['status'] == 'running':
+            if self.__locked_scan_id() != scan_id:
+                # 扫描进程已退出(如被终止), 状态文件停留在运行中
+                status.update(status='failed', current_file='failed', error='扫描进程已退出')
+            else:
+                status.pop('changes', None)
+        return status
+
+    def cancel(self, scan_id=None):
+        '''
+            取消指定扫描或当前运行中的扫描(可以是其他进程启动的扫描)
+            返回被取消的扫描ID, 没有可取消的扫描时返回None
+        '''
+        with self.__lock:
+            job = self.__jobs.get(scan_id) if scan_id else self.__running
+        if job is not None:
+            if job.status != 'running':
+                return None
+            job.cancel_event.set()
+            return job.scan_id
+        # 其他进程中的扫描: 写入取消标记, 由扫描进程的状态上报线程检查
+        running_id = self.__locked_scan_id()
+        if not running_id or (scan_id and scan_id != running_id):
+            return None
+        with open(self.__cancel_path(running_id), 'w'):
+            pass
+        return running_id
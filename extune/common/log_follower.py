@@ -0,0 +1,159 @@
+'''
+  Copyright (c) KylinSoft  Co., Ltd. 2024.All rights reserved.
+  extuner licensed under the Mulan Permissive Software License, Version 2.
+  See LICENSE file for more details.
+'''
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# cython:language_level=3
+
+import os
+
+
+# 日志跟随类: 记录inode和字节偏移, 每次只读取新追加的内容
+# 单次调用最多读取read_budget字节, 未读完的部分保留偏移留到下次调用, 日志突增时内存占用有上限
+class LogFollower():
+    def __init__(self, path, initial_bytes=64 * 1024, chunk_size=1024 * 1024,
+                 read_budget=8 * 1024 * 1024, max_line=64 * 1024):
+        '''
+            path: 日志文件路径
+            initial_bytes: 首次打开时从文件末尾回读的字节数, 用于填充最近日志
+            chunk_size: 单次read的最大字节数
+            read_budget: 每次read_new_lines最多读取的字节数
+            max_line: 单行最大字节数, 超出部分丢弃
+        '''
+        self.path = path
+        self.__initial_bytes = initial_bytes
+        self.__chunk_size = chunk_size
+        self.__read_budget = read_budget
+        self.__max_line = max_line
+        self.__file = None
+        self.__inode = None
+        self.__offset = 0
+        # 首次打开时开始读取的位置(行首), 之前的内容可通过read_before_start向前扫描
+        self.__start = 0
+        # 上次读取到的不完整行
+        self.__partial = b''
+        # 当前行已超过max_line, 丢弃到下一个换行符为止
+        self.__discarding = False
+
+    def __open(self, from_end):
+        '''
+            打开日志文件; from_end为True时从末尾initial_bytes处开始读取
+        '''
+        self.close()
+        f = open(self.path, 'rb')
+        st = os.fstat(f.fileno())
+        self.__file = f
+        self.__inode = (st.st_dev, st.st_ino)
+        self.__offset = 0
+        self.__partial = b''
+        self.__discarding = False
+        if from_end and st.st_size > self.__initial_bytes:
+            self.__offset = st.st_size - self.__initial_bytes
+            f.seek(self.__offset)
+            # 丢弃回读位置处被截断的半行
+            self.__offset += len(f.readline())
+        self.__start = self.__offset
+
+    def __read_available(self, budget):
+        '''
+            从当前偏移读取到文件末尾, 最多读取budget字节
+        '''
+        chunks = []
+        self.__file.seek(self.__offset)
+        while budget > 0:
+            data = self.__file.read(min(self.__chunk_size, budget))
+            if not data:
+                break
+            chunks.append(data)
+            self.__offset += len(data)
+            budget -= len(data)
+        return b''.join(chunks)
+
+    def __split_lines(self, data):
+        max_line = self.__max_line
+        if self.__discarding:
+            end = data.find(b'\n')
+            if end < 0:
+                return []
+            data = data[end + 1:]
+            self.__discarding = False
+        data = self.__partial + data
+        lines = data.split(b'\n')
+        # 最后一段没有换行符, 留到下次读取时拼接; 超长时截断输出, 其余部分丢弃
+        self.__partial = lines.pop()
+        if len(self.__partial) > max_line:
+            lines.append(self.__partial)
+            self.__partial = b''
+            self.__discarding = True
+        return [line[:max_line].decode('utf-8', 'replace') for line in lines]
+
+    def read_new_lines(self):
+        '''
+            返回自上次调用以来新追加的完整行, 单次最多读取read_budget字节
+            检测到日志轮转(inode变化)时先读完旧文件剩余内容, 再从头读取新文件;
+            检测到截断(文件变小)时从头读取
+        '''
+        budget = self.__read_budget
+        if self.__file is None:
+            self.__open(from_end=True)
+            return self.__split_lines(self.__read_available(budget))
+
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            # 轮转过程中新文件尚未创建, 继续读取旧文件
+            st = None
+
+        if st is not None and (st.st_dev, st.st_ino) != self.__inode:
+            data = self.__read_available(budget)
+            lines = self.__split_lines(data)
+            if self.__offset < os.fstat(self.__file.fileno()).st_size:
+                # 旧文件未读完, 下次调用继续读取
+                return lines
+            if self.__partial:
+                lines.append(self.__partial[:self.__max_line].decode('utf-8', 'replace'))
+            self.__open(from_end=False)
+            return lines + self.__split_lines(self.__read_available(budget - len(data)))
+
+        if os.fstat(self.__file.fileno()).st_size < self.__offset:
+            # copytruncate方式轮转, 或日志被清空
+            self.__offset = 0
+            self.__partial = b''
+            self.__discarding = False
+
+        return self.__split_lines(self.__read_available(budget))
+
+    def read_before_start(self, pattern, max_lines, max_bytes):
+        '''
+            从首次读取的起始位置向前扫描最多max_bytes字节, 按时间顺序返回最后max_lines个匹配pattern的行
+            首次打开只回读末尾initial_bytes字节, 用于补齐更早的记录(如最近的错误日志); 需在首次read_new_lines之后调用
+        '''
+        if self.__file is None:
+            return []
+        matches = []
+        position = self.__start
+        limit = max(position - max_bytes, 0)
+        # 上一块(文件中靠后的一块)开头不完整的行
+        carry = b''
+        while position > limit and len(matches) < max_lines:
+            start = max(position - self.__chunk_size, limit)
+            self.__file.seek(start)
+            lines = (self.__file.read(position - start) + carry).split(b'\n')
+            # 块开头的行可能从更前面开始, 留到读取前一块时拼接; 到达扫描范围开头时丢弃
+            carry = lines.pop(0) if start > 0 else b''
+            for line in reversed(lines):
+                text = line[:self.__max_line].decode('utf-8', 'replace')
+                if pattern.search(text):
+                    matches.append(text)
+                    if len(matches) >= max_lines:
+                        break
+            position = start
+        matches.reverse()
+        return matches
+
+    def close(self):
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
@@ -0,0 +1,407 @@
+'''
+  Copyright (c) KylinSoft  Co., Ltd. 2024.All rights reserved.
+  extuner licensed under the Mulan Permissive Software License, Version 2.
+  See LICENSE file for more details.
+'''
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# cython:language_level=3
+
+import fnmatch
+import math
+import mmap
+import os
+import struct
+import threading
+from array import array
+from .log import Logger
+
+
+# 单个精度层: 固定大小的内存映射文件, 按时间槽循环覆盖
+# 文件布局: 文件头 | 序列名表 | 各序列最近写入时间(double) | 各槽起始时间(double) |
+#           各槽各序列累加和(double) | 各槽各序列聚合值(float: min, max, count, last)
+# 累加和用double保存, 字节计数等大数值在一个槽内累加多次也不丢失精度
+# 序列数已满时, 回收整个保留时长内都没有写入的列; 回收后名表版本加1, 只读方据此重新读取名表
+class RollupTier():
+    MAGIC = b'KYROLLUP'
+    VERSION = 3
+    # magic, version, 槽数, 精度, 序列数上限, 已登记序列数, 名表版本, 被丢弃的序列数
+    HEADER = struct.Struct('<8sIIdIIII')
+    COUNT_OFFSET = struct.calcsize('<8sIIdI')
+    GENERATION_OFFSET = COUNT_OFFSET + 4
+    DROPPED_OFFSET = COUNT_OFFSET + 8
+    HEADER_SIZE = 64
+    NAME_SIZE = 64
+    # 每个聚合值的float字段: 最小值、最大值、样本数、最后值
+    FIELDS = 4
+
+    def __init__(self, path, resolution, retention, max_series, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        self.resolution = resolution
+        self.retention = retention
+        self.slots = max(int(retention // resolution), 1)
+        self.max_series = max_series
+        self.__names_off = self.HEADER_SIZE
+        self.__last_off = self.__names_off + max_series * self.NAME_SIZE
+        self.__ts_off = self.__last_off + max_series * 8
+        self.__sums_off = self.__ts_off + self.slots * 8
+        self.__sums_row_size = max_series * 8
+        self.__values_off = self.__sums_off + self.slots * self.__sums_row_size
+        self.__row_size = max_series * self.FIELDS * 4
+        self.size = self.__values_off + self.slots * self.__row_size
+        # {序列名: 列号}
+        self.index = {}
+        self.__generation = None
+        # 序列数已满时, 最早可能有列过期的时间
+        self.reclaim_after = 0.0
+        if readonly:
+            self.__open_readonly()
+        else:
+            self.__open()
+        self.__map_views()
+
+    def __header_matches(self, fd, size):
+        if size != self.size:
+            return False
+        header = os.pread(fd, self.HEADER.size, 0)
+        magic, version, slots, resolution, max_series = self.HEADER.unpack(header)[:5]
+        return (magic, version, slots, resolution, max_series) == \
+            (self.MAGIC, self.VERSION, self.slots, float(self.resolution), self.max_series)
+
+    def __open_readonly(self):
+        '''
+            只读打开由采集进程写入的文件, 布局不一致时不重建
+        '''
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            if not self.__header_matches(fd, os.fstat(fd).st_size):
+                raise ValueError("rollup file {} does not match current layout".format(self.path))
+            self.__mmap = mmap.mmap(fd, self.size, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+
+    def __open(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            st = os.fstat(fd)
+            if not self.__header_matches(fd, st.st_size):
+                if st.st_size:
+                    Logger().warning("rollup file {} does not match current layout, recreate it".format(self.path))
+                os.ftruncate(fd, 0)
+                # 稀疏文件, 未写入的槽不占用磁盘空间
+                os.ftruncate(fd, self.size)
+                os.pwrite(fd, self.HEADER.pack(self.MAGIC, self.VERSION, self.slots,
+                                               float(self.resolution), self.max_series, 0, 0, 0), 0)
+            self.__mmap = mmap.mmap(fd, self.size)
+        finally:
+            os.close(fd)
+
+    def __map_views(self):
+        # 直接在映射内存上读写, 重启后无需加载和解析
+        view = memoryview(self.__mmap)
+        self.__last_seen = view[self.__last_off:self.__ts_off].cast('d')
+        self.__ts = view[self.__ts_off:self.__sums_off].cast('d')
+        self.__sums = view[self.__sums_off:self.__values_off].cast('d')
+        self.__values = view[self.__values_off:].cast('f')
+        self.sync_index()
+
+    def sync_index(self):
+        '''
+            读取序列名表中新增的序列; 只读方据此获知写入进程新登记的序列, 名表版本变化时重新读取全部序列名
+        '''
+        count, generation = struct.unpack_from('<II', self.__mmap, self.COUNT_OFFSET)
+        if generation != self.__generation:
+            self.index = {}
+            self.__generation = generation
+        for i in range(len(self.index), min(count, self.max_series)):
+            off = self.__names_off + i * self.NAME_SIZE
+            name = bytes(self.__mmap[off:off + self.NAME_SIZE]).rstrip(b'\0').decode('utf-8')
+            self.index[name] = i
+
+    def __write_name(self, column, raw):
+        off = self.__names_off + column * self.NAME_SIZE
+        self.__mmap[off:off + self.NAME_SIZE] = raw.ljust(self.NAME_SIZE, b'\0')
+
+    def __reclaim(self, timestamp):
+        '''
+            回收整个保留时长内都没有写入的列, 清除其在各槽中的旧数据, 返回列号; 没有可回收的列时返回None
+        '''
+        last_seen = self.__last_seen
+        column = min(range(self.max_series), key=last_seen.__getitem__)
+        if last_seen[column] >= timestamp - self.retention:
+            self.reclaim_after = last_seen[column] + self.retention
+            return None
+        for name in [n for n, c in self.index.items() if c == column]:
+            del self.index[name]
+        # 未被新数据覆盖的槽中可能还有旧序列的值, 查询更早的时间范围时不能算到新序列上
+        zero = array('f', [0.0]) * self.FIELDS
+        data = self.__values
+        sums = self.__sums
+        for slot in range(self.slots):
+            sums[slot * self.max_series + column] = 0.0
+            base = (slot * self.max_series + column) * self.FIELDS
+            data[base:base + self.FIELDS] = zero
+        return column
+
+    def add_series(self, name, timestamp):
+        '''
+            登记新序列, 返回列号; 序列数已满时回收过期的列, 没有可回收的列或名称过长时返回None
+        '''
+        raw = name.encode('utf-8')
+        if len(raw) > self.NAME_SIZE:
+            return None
+        count = len(self.index)
+        if count < self.max_series:
+            column = count
+            self.__write_name(column, raw)
+            struct.pack_into('<I', self.__mmap, self.COUNT_OFFSET, count + 1)
+        else:
+            column = self.__reclaim(timestamp)
+            if column is None:
+                return None
+            self.__write_name(column, raw)
+            self.__generation = struct.unpack_from('<I', self.__mmap, self.GENERATION_OFFSET)[0] + 1
+            struct.pack_into('<I', self.__mmap, self.GENERATION_OFFSET, self.__generation)
+        self.__last_seen[column] = timestamp
+        self.index[name] = column
+        return column
+
+    def get_dropped(self):
+        return struct.unpack_from('<I', self.__mmap, self.DROPPED_OFFSET)[0]
+
+    def set_dropped(self, count):
+        struct.pack_into('<I', self.__mmap, self.DROPPED_OFFSET, count)
+
+    def update(self, timestamp, values):
+        '''
+            将一个样本合并进所在时间槽的聚合值; values为{列号: 数值}
+        '''
+        res = self.resolution
+        index = int(timestamp // res)
+        bucket = index * res
+        slot = index % self.slots
+        if self.__ts[slot] != bucket:
+            if self.__ts[slot] > bucket:
+                # 系统时间回拨, 样本早于槽内数据, 丢弃
+                return
+            # 槽位被新的时间段复用, 清空整行
+            off = self.__sums_off + slot * self.__sums_row_size
+            self.__mmap[off:off + self.__sums_row_size] = bytes(self.__sums_row_size)
+            off = self.__values_off + slot * self.__row_size
+            self.__mmap[off:off + self.__row_size] = bytes(self.__row_size)
+            self.__ts[slot] = bucket
+
+        data = self.__values
+        sums = self.__sums
+        last_seen = self.__last_seen
+        first = slot * self.max_series
+        for column, value in values.items():
+            last_seen[column] = timestamp
+            base = (first + column) * self.FIELDS
+            if data[base + 2]:
+                if value < data[base]:
+                    data[base] = value
+                if value > data[base + 1]:
+                    data[base + 1] = value
+            else:
+                data[base] = value
+                data[base + 1] = value
+            sums[first + column] += value
+            data[base + 2] += 1
+            data[base + 3] = value
+
+    def read(self, column, start, end):
+        '''
+            按时间顺序返回[start, end]内有数据的槽: [(槽起始时间, min, max, sum, count, last)]
+        '''
+        res = self.resolution
+        data = self.__values
+        result = []
+        # 超出保留时长的部分已被覆盖, 不必遍历
+        start = max(start, end - self.slots * res)
+        for bucket in range(int(start // res), int(end // res) + 1):
+            slot = bucket % self.slots
+            if self.__ts[slot] != bucket * res:
+                continue
+            cell = slot * self.max_series + column
+            base = cell * self.FIELDS
+            if data[base + 2]:
+                result.append((bucket * res, data[base], data[base + 1], self.__sums[cell],
+                               data[base + 2], data[base + 3]))
+        return result
+
+    def flush(self):
+        if not self.readonly:
+            self.__mmap.flush()
+
+    def close(self):
+        self.__last_seen.release()
+        self.__ts.release()
+        self.__sums.release()
+        self.__values.release()
+        self.__mmap.close()
+
+
+# 多精度汇总存储: 原始样本同时合并进各精度层, 每层保留时长不同, 磁盘占用固定
+# 长周期的精度层只保存整机汇总序列(名称只有两段, 如cpu.total、mem.used),
+# 按核心/设备/网卡区分的明细序列(如cpu.core.0、disk.sda.read_bytes)只保存在最细的一层
+class MetricRollup():
+    # (精度秒数, 保留秒数, 序列数上限, 是否只保存汇总序列); 序列数上限决定文件大小:
+    # 槽数 x 序列数 x 24字节, 默认三层共约100MB
+    DEFAULT_TIERS = (
+        (10, 24 * 3600, 256, False),
+        (60, 14 * 24 * 3600, 64, True),
+        (3600, 365 * 24 * 3600, 64, True)
+    )
+    AGGREGATES = ('avg', 'min', 'max', 'last')
+
+    def __init__(self, path, tiers=DEFAULT_TIERS, max_series=None, readonly=False):
+        '''
+            path: 存放各层文件的目录
+            tiers: (精度秒数, 保留秒数, 序列数上限, 是否只保存汇总序列)列表
+            max_series: 覆盖保存明细序列的层的序列数上限, 读写双方必须一致
+            readonly: 只读打开, 用于Web进程查询采集进程写入的数据, 文件不存在或布局不一致时抛出异常
+        '''
+        if not readonly and not os.path.exists(path):
+            os.makedirs(path)
+        self.readonly = readonly
+        self.__lock = threading.Lock()
+        self.__tiers = []
+        self.__aggregate_only = []
+        for resolution, retention, tier_series, aggregate_only in sorted(tiers):
+            if max_series is not None and not aggregate_only:
+                tier_series = max_series
+            self.__tiers.append(RollupTier(os.path.join(path, 'rollup_{}s.dat'.format(resolution)),
+                                           resolution, retention, tier_series, readonly))
+            self.__aggregate_only.append(aggregate_only)
+        # 各层因序列数已满而未记录的序列名
+        self.__dropped = [set() for _ in self.__tiers]
+
+    @staticmethod
+    def is_aggregate(name):
+        return name.count('.') <= 1
+
+    def get_tiers(self):
+        return [{'resolution': t.resolution, 'retention': t.retention, 'size': t.size,
+                 'max_series': t.max_series, 'aggregate_only': aggregate_only}
+                for t, aggregate_only in zip(self.__tiers, self.__aggregate_only)]
+
+    def get_min_resolution(self):
+        return self.__tiers[0].resolution
+
+    def get_dropped_count(self):
+        '''
+            因序列数已满而未记录的序列数(取各层最大值), 只读方从文件头读取采集进程的计数
+        '''
+        with self.__lock:
+            return max(tier.get_dropped() for tier in self.__tiers)
+
+    def list_series(self):
+        with self.__lock:
+            tier = self.__tiers[0]
+            if self.readonly:
+                tier.sync_index()
+            return sorted(tier.index)
+
+    def record(self, timestamp, values):
+        '''
+            合并一次采样, values为{序列名: 数值}
+        '''
+        if self.readonly:
+            raise TypeError("MetricRollup is opened read-only")
+        with self.__lock:
+            for tier, dropped, aggregate_only in zip(self.__tiers, self.__dropped, self.__aggregate_only):
+                if tier.reclaim_after and timestamp >= tier.reclaim_after:
+                    # 已有列可能过期, 之前被丢弃的序列重新尝试登记
+                    tier.reclaim_after = 0.0
+                    dropped.clear()
+                    tier.set_dropped(0)
+                columns = {}
+                for name, value in values.items():
+                    if value is None or value != value:
+                        continue
+                    if aggregate_only and not self.is_aggregate(name):
+                        continue
+                    column = tier.index.get(name)
+                    if column is None:
+                        if name in dropped:
+                            continue
+                        column = tier.add_series(name, timestamp)
+                        if column is None:
+                            dropped.add(name)
+                            tier.set_dropped(len(dropped))
+                            Logger().warning("rollup store is full ({}s), drop series {}".format(
+                                tier.resolution, name))
+                            continue
+                    columns[column] = value
+                tier.update(timestamp, columns)
+
+    def __select_tier(self, start, step, now):
+        '''
+            选择精度不高于step的最粗一层; 若该层已不覆盖start, 改用更粗的层
+        '''
+        candidates = [t for t in self.__tiers if t.resolution <= step] or self.__tiers[:1]
+        tier = candidates[-1]
+        for coarser in self.__tiers[self.__tiers.index(tier):]:
+            tier = coarser
+            if start >= now - coarser.retention:
+                break
+        return tier
+
+    def query(self, patterns, start, end, step, now, agg='avg'):
+        '''
+            查询[start, end]范围的数据, 按step秒对齐分桶
+            返回(所用精度, 对齐后的时间戳列表, {序列名: 数值列表}), 无数据的桶为None
+        '''
+        with self.__lock:
+            tier = self.__select_tier(start, step, now)
+            if self.readonly:
+                tier.sync_index()
+            step = max(step, tier.resolution)
+            first_bucket = math.floor(start / step)
+            nbuckets = max(int(math.floor(end / step) - first_bucket) + 1, 0)
+            timestamps = [(first_bucket + i) * step for i in range(nbuckets)]
+            result = {}
+            for name, column in tier.index.items():
+                if not any(fnmatch.fnmatchcase(name, p) for p in patterns):
+                    continue
+                merged = [None] * nbuckets
+                for ts, vmin, vmax, vsum, count, last in tier.read(column, start, end):
+                    i = int(math.floor(ts / step) - first_bucket)
+                    if not 0 <= i < nbuckets:
+                        continue
+                    cur = merged[i]
+                    if cur is None:
+                        merged[i] = [vmin, vmax, vsum, count, last]
+                    else:
+                        cur[0] = min(cur[0], vmin)
+                        cur[1] = max(cur[1], vmax)
+                        cur[2] += vsum
+                        cur[3] += count
+                        cur[4] = last
+                result[name] = [self.__aggregate(m, agg) for m in merged]
+        return tier.resolution, timestamps, result
+
+    @staticmethod
+    def __aggregate(merged, agg):
+        if merged is None:
+            return None
+        if agg == 'min':
+            return merged[0]
+        if agg == 'max':
+            return merged[1]
+        if agg == 'last':
+            return merged[4]
+        return merged[2] / merged[3]
+
+    def flush(self):
+        with self.__lock:
+            for tier in self.__tiers:
+                tier.flush()
+
+    def close(self):
+        with self.__lock:
+            for tier in self.__tiers:
+                tier.flush()
+                tier.close()
@@ -0,0 +1,172 @@
+'''
+  Copyright (c) KylinSoft  Co., Ltd. 2024.All rights reserved.
+  extuner licensed under the Mulan Permissive Software License, Version 2.
+  See LICENSE file for more details.
+'''
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# cython:language_level=3
+
+import fnmatch
+import math
+import threading
+from array import array
+from .decorator_wrap import DecoratorWrap
+from .log import Logger
+
+
+# 环形缓冲区: 同一采集器的所有序列共用一组时间戳, 容量固定
+class MetricRing():
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.timestamps = array('d', [0.0]) * capacity
+        # {序列名: array('f')}, 缺失值用NaN表示
+        self.series = {}
+        # {序列名: 最近一次有数值的时间}
+        self.last_seen = {}
+        self.head = 0   # 下一个写入位置
+        self.count = 0  # 已写入的点数(不超过capacity)
+
+    def add_series(self, name, timestamp):
+        self.series[name] = array('f', [math.nan]) * self.capacity
+        self.last_seen[name] = timestamp
+
+    def remove_series(self, name):
+        del self.series[name]
+        del self.last_seen[name]
+
+    def append(self, timestamp, values):
+        pos = self.head
+        self.timestamps[pos] = timestamp
+        for name, column in self.series.items():
+            value = values.get(name)
+            if value is None:
+                column[pos] = math.nan
+            else:
+                column[pos] = value
+                self.last_seen[name] = timestamp
+        self.head = (pos + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def nbytes(self):
+        return (self.timestamps.itemsize + sum(c.itemsize for c in self.series.values())) * self.capacity
+
+
+# 实时指标时序存储: 内存占用由保留时长和序列数上限决定, 不会无限增长
+@DecoratorWrap.singleton
+class MetricStore():
+    def __init__(self, retention=24 * 3600, max_series=1000, rollup=None):
+        '''
+            retention: 每个序列保留的时长(秒)
+            max_series: 序列总数上限, 超出后新序列不再记录
+            rollup: 可选的MetricRollup, 原始样本同时写入持久化的多精度汇总
+        '''
+        self.retention = retention
+        self.max_series = max_series
+        self.rollup = rollup
+        self.__lock = threading.Lock()
+        # {分组名: MetricRing}
+        self.__rings = {}
+        self.__series_count = 0
+        self.__dropped = set()
+        # 下一次检查过期序列的时间
+        self.__next_evict = 0.0
+
+    def __evict_idle(self, now):
+        '''
+            删除整个保留时长内都没有数值的序列(如已退出的进程、已拔出的网卡), 释放序列数配额
+        '''
+        oldest = now - self.retention
+        evicted = 0
+        for group, ring in list(self.__rings.items()):
+            for name in [n for n, ts in ring.last_seen.items() if ts < oldest]:
+                ring.remove_series(name)
+                evicted += 1
+            if not ring.series:
+                del self.__rings[group]
+        if evicted:
+            self.__series_count -= evicted
+            # 有空余配额后, 之前因超限被丢弃的序列可以重新记录
+            self.__dropped.clear()
+
+    def record(self, group, interval, timestamp, values):
+        '''
+            记录一次采样; group通常为采集器名称, values为{序列名: 数值}
+        '''
+        with self.__lock:
+            ring = self.__rings.get(group)
+            if ring is None:
+                ring = MetricRing(max(int(self.retention / interval), 1))
+                self.__rings[group] = ring
+            for name in values:
+                if name in ring.series or name in self.__dropped:
+                    continue
+                if self.__series_count >= self.max_series:
+                    self.__dropped.add(name)
+                    Logger().warning("metric store is full ({} series), drop series {}".format(self.max_series, name))
+                    continue
+                ring.add_series(name, timestamp)
+                self.__series_count += 1
+            ring.append(timestamp, values)
+            if timestamp >= self.__next_evict:
+                self.__evict_idle(timestamp)
+                self.__next_evict = timestamp + min(self.retention / 10, 60)
+        if self.rollup is not None:
+            self.rollup.record(timestamp, values)
+
+    def list_series(self):
+        with self.__lock:
+            return sorted(name for ring in self.__rings.values() for name in ring.series)
+
+    def get_dropped_count(self):
+        '''
+            因序列数已满而未记录的序列数
+        '''
+        with self.__lock:
+            return len(self.__dropped)
+
+    def get_memory_usage(self):
+        '''
+            已分配的缓冲区字节数
+        '''
+        with self.__lock:
+            return sum(ring.nbytes() for ring in self.__rings.values())
+
+    def query(self, patterns, start, end, step):
+        '''
+            查询指定时间范围的数据, 按step秒对齐分桶并取平均值
+            patterns: 序列名列表, 支持通配符(如 cpu.core.*)
+            返回(对齐后的时间戳列表, {序列名: 数值列表}), 无数据的桶为None
+        '''
+        step = max(float(step), 1e-3)
+        first_bucket = math.floor(start / step)
+        nbuckets = max(int(math.floor(end / step) - first_bucket) + 1, 0)
+        timestamps = [(first_bucket + i) * step for i in range(nbuckets)]
+        result = {}
+
+        # 持锁期间只复制匹配序列的缓冲区(数组整体复制), 逐点聚合在锁外进行, 不阻塞采集器写入
+        snapshots = []
+        with self.__lock:
+            for ring in self.__rings.values():
+                names = [n for n in ring.series if any(fnmatch.fnmatchcase(n, p) for p in patterns)]
+                if names:
+                    snapshots.append((ring.head, ring.count, ring.timestamps[:],
+                                      {name: ring.series[name][:] for name in names}))
+
+        for head, count, ring_timestamps, columns in snapshots:
+            # 按时间先后只遍历落在查询范围内的点
+            capacity = len(ring_timestamps)
+            first = (head - count) % capacity
+            positions = [pos for pos in ((first + i) % capacity for i in range(count))
+                         if start <= ring_timestamps[pos] <= end]
+            buckets = [int(math.floor(ring_timestamps[pos] / step) - first_bucket) for pos in positions]
+            for name, column in columns.items():
+                sums = [0.0] * nbuckets
+                counts = [0] * nbuckets
+                for pos, bucket in zip(positions, buckets):
+                    value = column[pos]
+                    if value == value and 0 <= bucket < nbuckets:  # 跳过NaN
+                        sums[bucket] += value
+                        counts[bucket] += 1
+                result[name] = [s / c if c else None for s, c in zip(sums, counts)]
+        return timestamps, result
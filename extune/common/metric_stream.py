@@ -0,0 +1,124 @@
+'''
+  Copyright (c) KylinSoft  Co., Ltd. 2024.All rights reserved.
+  extuner licensed under the Mulan Permissive Software License, Version 2.
+  See LICENSE file for more details.
+'''
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# cython:language_level=3
+
+import json
+import threading
+from .decorator_wrap import DecoratorWrap
+
+
+# 单个订阅者: 每个主题只保留最新一条未发送的消息
+# 客户端消费慢时旧消息被新消息覆盖, 内存占用不随积压增长
+class StreamSubscription():
+    def __init__(self, topics):
+        self.topics = frozenset(topics)
+        self.__cond = threading.Condition()
+        # {主题: 待发送的消息}, 按写入先后发送
+        self.__pending = {}
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, topic, message):
+        with self.__cond:
+            if topic in self.__pending:
+                # 上一条尚未发送, 直接用最新数据覆盖
+                self.dropped += 1
+                del self.__pending[topic]
+            self.__pending[topic] = message
+            self.__cond.notify()
+
+    def get(self, timeout=None):
+        '''
+            等待并取出所有待发送消息; 超时或已关闭时返回空列表
+        '''
+        with self.__cond:
+            if not self.__pending and not self.closed:
+                self.__cond.wait(timeout)
+            messages = list(self.__pending.values())
+            self.__pending.clear()
+            return messages
+
+    def close(self):
+        with self.__cond:
+            self.closed = True
+            self.__cond.notify()
+
+
+# 实时指标推送: 每个主题每次发布只序列化一次, 编码后的SSE消息由所有订阅者共享
+@DecoratorWrap.singleton
+class MetricBroadcaster():
+    TOPICS = ('cpu', 'mem', 'net', 'disk', 'alerts', 'status', 'performance', 'performance-delta')
+
+    def __init__(self, max_subscribers=100, serialize=None):
+        '''
+            serialize: 将数据序列化为JSON字节的函数, 默认使用标准库json
+        '''
+        self.max_subscribers = max_subscribers
+        self.serialize = serialize or self.__json_dumps
+        self.__lock = threading.Lock()
+        self.__subscribers = set()
+        # {主题: 最近一条消息}, 新订阅者连接后立即收到
+        self.__latest = {}
+
+    @staticmethod
+    def __json_dumps(data):
+        return json.dumps(data, separators=(',', ':'), default=str).encode('utf-8')
+
+    @staticmethod
+    def encode(topic, seq, body):
+        '''
+            编码为一条SSE消息; body为已序列化的JSON字节(不含换行)
+        '''
+        return b'id: %d\nevent: %s\ndata: %s\n\n' % (seq, topic.encode('ascii'), body)
+
+    def publish(self, topic, seq, data=None, body=None):
+        '''
+            发布一条消息, 传入data时在此序列化, 也可直接传入已序列化的body
+        '''
+        if body is None:
+            body = self.serialize(data)
+        message = self.encode(topic, seq, body)
+        with self.__lock:
+            self.__latest[topic] = message
+            subscribers = [s for s in self.__subscribers if topic in s.topics]
+        for sub in subscribers:
+            sub.put(topic, message)
+
+    def subscribe(self, topics):
+        '''
+            新建订阅, 订阅数已满时返回None
+        '''
+        sub = StreamSubscription(topics)
+        with self.__lock:
+            if len(self.__subscribers) >= self.max_subscribers:
+                return None
+            self.__subscribers.add(sub)
+            latest = [(t, m) for t, m in self.__latest.items() if t in sub.topics]
+        for topic, message in latest:
+            sub.put(topic, message)
+        return sub
+
+    def has_subscribers(self, topic):
+        '''
+            是否有订阅该主题的连接, 用于跳过无人订阅且生成开销较大的主题
+        '''
+        with self.__lock:
+            return any(topic in s.topics for s in self.__subscribers)
+
+    def unsubscribe(self, sub):
+        with self.__lock:
+            self.__subscribers.discard(sub)
+        sub.close()
+
+    def get_stats(self):
+        with self.__lock:
+            return {
+                'subscribers': len(self.__subscribers),
+                'dropped': sum(s.dropped for s in self.__subscribers),
+                'topics': sorted(self.__latest)
+            }
@@ -0,0 +1,222 @@
+'''
+  Copyright (c) KylinSoft  Co., Ltd. 2024.All rights reserved.
+  extuner licensed under the Mulan Permissive Software License, Version 2.
+  See LICENSE file for more details.
+'''
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# cython:language_level=3
+
+import math
+
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+PREFIX = 'kyops_'
+
+# 内存快照字段: 百分比和速率以外的字段单位均为字节
+MEMORY_RATE_SUFFIX = '_rate'
+# 磁盘IO快照中的瞬时值字段 -> (指标名, 说明)
+DISK_IO_GAUGES = (
+    ('r_s', 'disk_reads_per_second', 'Completed reads per second'),
+    ('w_s', 'disk_writes_per_second', 'Completed writes per second'),
+    ('rmb_s', 'disk_read_mebibytes_per_second', 'MiB read per second'),
+    ('wmb_s', 'disk_write_mebibytes_per_second', 'MiB written per second'),
+    ('rrqm_s', 'disk_read_merges_per_second', 'Merged reads per second'),
+    ('wrqm_s', 'disk_write_merges_per_second', 'Merged writes per second'),
+    ('r_await', 'disk_read_await_milliseconds', 'Average read latency'),
+    ('w_await', 'disk_write_await_milliseconds', 'Average write latency'),
+    ('aqu_sz', 'disk_queue_size', 'Average request queue size'),
+    ('utilization', 'disk_utilization_percent', 'Percentage of time the device was busy'),
+    ('in_flight', 'disk_io_in_flight', 'Requests currently in flight')
+)
+# 磁盘IO快照中的累计计数字段 -> (指标名, 说明)
+DISK_IO_COUNTERS = (
+    ('read_bytes', 'disk_read_bytes', 'Bytes read'),
+    ('write_bytes', 'disk_written_bytes', 'Bytes written'),
+    ('read_count', 'disk_reads_completed', 'Reads completed'),
+    ('write_count', 'disk_writes_completed', 'Writes completed')
+)
+# 网卡快照中的累计计数字段 -> (指标名, 说明)
+NET_IO_COUNTERS = (
+    ('bytes_recv', 'network_receive_bytes', 'Bytes received'),
+    ('bytes_sent', 'network_transmit_bytes', 'Bytes transmitted'),
+    ('packets_recv', 'network_receive_packets', 'Packets received'),
+    ('packets_sent', 'network_transmit_packets', 'Packets transmitted'),
+    ('errin', 'network_receive_errs', 'Receive errors'),
+    ('errout', 'network_transmit_errs', 'Transmit errors'),
+    ('dropin', 'network_receive_drop', 'Receive drops'),
+    ('dropout', 'network_transmit_drop', 'Transmit drops')
+)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_value(value):
+    if value is None:
+        return 'NaN'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int):
+        return str(value)
+    value = float(value)
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value)
+
+
+# OpenMetrics文本生成: 按指标族追加样本, 同名指标族只输出一次元数据
+class OpenMetricsBuilder():
+    def __init__(self):
+        # {指标族名: [元数据行, 样本行...]}, 保持首次出现的顺序
+        self.__families = {}
+
+    def __family(self, name, mtype, help_text):
+        family = self.__families.get(name)
+        if family is None:
+            family = self.__families[name] = [
+                '# TYPE {} {}'.format(name, mtype),
+                '# HELP {} {}'.format(name, help_text)
+            ]
+        return family
+
+    @staticmethod
+    def __sample(name, labels, value):
+        if labels:
+            label_text = ','.join('{}="{}"'.format(k, escape_label(v)) for k, v in labels.items())
+            return '{}{{{}}} {}'.format(name, label_text, format_value(value))
+        return '{} {}'.format(name, format_value(value))
+
+    def gauge(self, name, help_text, value, labels=None):
+        name = PREFIX + name
+        self.__family(name, 'gauge', help_text).append(self.__sample(name, labels, value))
+
+    def counter(self, name, help_text, value, labels=None):
+        name = PREFIX + name
+        self.__family(name, 'counter', help_text).append(self.__sample(name + '_total', labels, value))
+
+    def histogram(self, name, help_text, bounds, cumulative, count, total, labels=None):
+        '''
+            bounds/cumulative: 各桶上界及累计计数(不含+Inf桶)
+        '''
+        name = PREFIX + name
+        family = self.__family(name, 'histogram', help_text)
+        labels = labels or {}
+        for bound, n in zip(bounds, cumulative):
+            family.append(self.__sample(name + '_bucket', dict(labels, le=format_value(bound)), n))
+        family.append(self.__sample(name + '_bucket', dict(labels, le='+Inf'), count))
+        family.append(self.__sample(name + '_count', labels, count))
+        family.append(self.__sample(name + '_sum', labels, total))
+
+    def render(self):
+        lines = []
+        for family in self.__families.values():
+            lines.extend(family)
+        lines.append('# EOF\n')
+        return '\n'.join(lines).encode('utf-8')
+
+
+def add_cpu_metrics(builder, cpu):
+    if not cpu:
+        return
+    builder.gauge('cpu_usage_percent', 'Overall CPU usage', cpu.get('total_usage'))
+    for mode in ('usr', 'nice', 'sys', 'iowait', 'irq', 'soft', 'steal', 'guest', 'gnice', 'idle'):
+        if mode in cpu:
+            builder.gauge('cpu_mode_percent', 'CPU time share by mode', cpu[mode], {'mode': mode})
+    for core, usage in enumerate(cpu.get('core_usage') or []):
+        builder.gauge('cpu_core_usage_percent', 'Per-core CPU usage', usage, {'core': core})
+    load_avg = cpu.get('load_avg') or []
+    for period, value in zip(('1', '5', '15'), load_avg[:3]):
+        builder.gauge('load' + period, '{} minute load average'.format(period), value)
+
+
+def add_memory_metrics(builder, mem):
+    if not mem:
+        return
+    for key, value in mem.items():
+        if not isinstance(value, (int, float)):
+            continue
+        name = key[4:] if key.startswith('mem_') else key
+        if name.endswith(MEMORY_RATE_SUFFIX):
+            builder.gauge('vmstat_{}_per_second'.format(name[:-len(MEMORY_RATE_SUFFIX)]),
+                          'Rate of /proc/vmstat counter {}'.format(name[:-len(MEMORY_RATE_SUFFIX)]), value)
+        elif name.endswith('_percent') or name == 'percent':
+            builder.gauge('memory_{}'.format(name), 'Memory usage percentage ({})'.format(key), value)
+        else:
+            builder.gauge('memory_{}_bytes'.format(name), 'Memory {} in bytes'.format(key), value)
+
+
+def add_network_metrics(builder, net):
+    if not net:
+        return
+    builder.gauge('network_receive_speed_bytes_per_second', 'Total receive speed of all interfaces',
+                  net.get('total_rx_speed'))
+    builder.gauge('network_transmit_speed_bytes_per_second', 'Total transmit speed of all interfaces',
+                  net.get('total_tx_speed'))
+    for iface, stats in sorted((net.get('net_io') or {}).items()):
+        labels = {'interface': iface}
+        for key, name, help_text in NET_IO_COUNTERS:
+            if key in stats:
+                builder.counter(name, help_text, stats[key], labels)
+        if 'rx_speed' in stats:
+            builder.gauge('network_interface_receive_speed_bytes_per_second', 'Receive speed',
+                          stats['rx_speed'], labels)
+            builder.gauge('network_interface_transmit_speed_bytes_per_second', 'Transmit speed',
+                          stats['tx_speed'], labels)
+
+
+def add_disk_metrics(builder, disk):
+    if not disk:
+        return
+    builder.gauge('disk_total_utilization_percent', 'Average utilization of physical disks',
+                  disk.get('total_utilization'))
+    for device, io in sorted((disk.get('disk_io') or {}).items()):
+        labels = {'device': device}
+        for key, name, help_text in DISK_IO_COUNTERS:
+            if key in io:
+                builder.counter(name, help_text, io[key], labels)
+        for key, name, help_text in DISK_IO_GAUGES:
+            if key in io:
+                builder.gauge(name, help_text, io[key], labels)
+    for usage in disk.get('disk_usage') or []:
+        labels = {'device': usage.get('device'), 'mountpoint': usage.get('mountpoint'),
+                  'fstype': usage.get('fstype')}
+        builder.gauge('filesystem_size_bytes', 'Filesystem size', usage.get('total'), labels)
+        builder.gauge('filesystem_used_bytes', 'Filesystem used space', usage.get('used'), labels)
+        builder.gauge('filesystem_free_bytes', 'Filesystem free space', usage.get('free'), labels)
+
+
+def add_request_metrics(builder, histograms):
+    '''
+        histograms: RequestMetrics.get_histograms()的结果
+    '''
+    for key, (bounds, cumulative, count, total, stats) in sorted(histograms.items()):
+        method, _, route = key.partition(' ')
+        labels = {'method': method, 'route': route}
+        builder.histogram('http_request_duration_seconds', 'HTTP request latency',
+                          bounds, cumulative, count, total, labels)
+        builder.gauge('http_requests_in_flight', 'HTTP requests being served', stats['in_flight'], labels)
+        builder.counter('http_response_bytes', 'HTTP response body bytes', stats['response_bytes'], labels)
+        builder.counter('http_request_errors', 'HTTP requests answered with an error status',
+                        stats['client_errors'], dict(labels, **{'class': '4xx'}))
+        builder.counter('http_request_errors', 'HTTP requests answered with an error status',
+                        stats['server_errors'], dict(labels, **{'class': '5xx'}))
+
+
+def add_collector_metrics(builder, scheduler_stats):
+    '''
+        scheduler_stats: CollectorScheduler.get_stats()的结果
+    '''
+    for name, stats in sorted(scheduler_stats.items()):
+        labels = {'collector': name}
+        builder.counter('collector_runs', 'Collector executions', stats.get('runs'), labels)
+        builder.counter('collector_failures', 'Failed collector executions', stats.get('failures'), labels)
+        builder.counter('collector_skipped', 'Collector ticks skipped because the previous run was still going',
+                        stats.get('skipped'), labels)
+        builder.gauge('collector_last_duration_seconds', 'Duration of the last collector run',
+                      stats.get('last_duration'), labels)
+        builder.gauge('collector_last_success_timestamp_seconds', 'Time of the last successful collector run',
+                      stats.get('last_success'), labels)
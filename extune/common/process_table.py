@@ -0,0 +1,248 @@
+'''
+  Copyright (c) KylinSoft  Co., Ltd. 2024.All rights reserved.
+  extuner licensed under the Mulan Permissive Software License, Version 2.
+  See LICENSE file for more details.
+'''
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# cython:language_level=3
+
+import heapq
+import os
+import pwd
+import threading
+import time
+from .decorator_wrap import DecoratorWrap
+
+
+# 进程表类: 扫描/proc/[pid], 按采样间隔增量计算进程CPU占用
+@DecoratorWrap.singleton
+class ProcessTable():
+    PROC_PATH = '/proc'
+    # /proc/[pid]/stat状态字母与psutil状态名对应关系
+    STATUS_MAP = {
+        'R': 'running',
+        'S': 'sleeping',
+        'D': 'disk-sleep',
+        'T': 'stopped',
+        't': 'tracing-stop',
+        'Z': 'zombie',
+        'X': 'dead',
+        'I': 'idle',
+        'P': 'parked',
+        'W': 'waking'
+    }
+
+    def __init__(self):
+        self.__clk_tck = os.sysconf('SC_CLK_TCK')
+        self.__page_size = os.sysconf('SC_PAGE_SIZE')
+        self.__lock = threading.Lock()
+        # 保证同一时刻只有一个线程在扫描/proc
+        self.__refresh_lock = threading.Lock()
+        # 上一次扫描的每进程CPU时间 {pid: (starttime, utime + stime)}
+        self.__prev_ticks = {}
+        self.__prev_uptime = None
+        # uid -> 用户名缓存
+        self.__user_cache = {}
+        # 最近一次扫描结果
+        self.__processes = []
+        self.__timestamp = 0.0
+
+    @staticmethod
+    def __read_file(path):
+        with open(path, 'r') as f:
+            return f.read()
+
+    def __get_user(self, uid):
+        '''
+            uid转换为用户名, 带缓存
+        '''
+        name = self.__user_cache.get(uid)
+        if name is None:
+            try:
+                name = pwd.getpwuid(uid).pw_name
+            except KeyError:
+                name = str(uid)
+            self.__user_cache[uid] = name
+        return name
+
+    @staticmethod
+    def __format_time(ticks, clk_tck):
+        '''
+            CPU时间格式化为top的TIME+格式 (分:秒.百分秒)
+        '''
+        hundredths = ticks * 100 // clk_tck
+        minutes, hundredths = divmod(hundredths, 6000)
+        seconds, hundredths = divmod(hundredths, 100)
+        return "{}:{:02d}.{:02d}".format(minutes, seconds, hundredths)
+
+    def __get_mem_total(self):
+        '''
+            读取/proc/meminfo中的MemTotal, 单位字节
+        '''
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemTotal:'):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    def __read_process(self, entry, uptime, elapsed, mem_total):
+        '''
+            读取单个进程的stat和statm, 返回(进程信息, 当前CPU时间)
+        '''
+        pid = int(entry.name)
+        base = entry.path
+        stat = self.__read_file(base + '/stat')
+        statm = self.__read_file(base + '/statm').split()
+        uid = entry.stat().st_uid
+
+        # comm可能包含空格和括号, 以最后一个')'为界
+        head, _, rest = stat.rpartition(')')
+        comm = head.split('(', 1)[1]
+        fields = rest.split()
+        state = fields[0]
+        ticks = int(fields[11]) + int(fields[12])  # utime + stime
+        priority = int(fields[15])
+        nice = int(fields[16])
+        num_threads = int(fields[17])
+        starttime = int(fields[19])
+
+        prev = self.__prev_ticks.get(pid)
+        if prev is not None and prev[0] == starttime and elapsed:
+            # 与上一次扫描的差值计算区间CPU占用
+            cpu_percent = (ticks - prev[1]) * 100.0 / self.__clk_tck / elapsed
+        else:
+            # 新进程或pid被复用: 以进程生命周期平均值计算
+            lifetime = uptime - starttime / self.__clk_tck
+            cpu_percent = ticks * 100.0 / self.__clk_tck / lifetime if lifetime > 0 else 0.0
+
+        virt = int(statm[0]) * self.__page_size
+        res = int(statm[1]) * self.__page_size
+        shr = int(statm[2]) * self.__page_size
+
+        proc = {
+            'pid': pid,
+            'ppid': int(fields[1]),
+            'name': comm,
+            'user': self.__get_user(uid),
+            'uid': uid,
+            'pr': priority,
+            'ni': nice,
+            'virt': virt // 1024,
+            'res': res // 1024,
+            'shr': shr // 1024,
+            's': state,
+            'status': self.STATUS_MAP.get(state, 'unknown'),
+            'cpu_percent': round(max(cpu_percent, 0.0), 1),
+            'mem_percent': round(res * 100.0 / mem_total, 1) if mem_total else 0.0,
+            'time': self.__format_time(ticks, self.__clk_tck),
+            'threads': num_threads,
+            'create_time': time.time() - (uptime - starttime / self.__clk_tck),
+            'command': comm
+        }
+        return proc, (starttime, ticks)
+
+    def __read_cmdline(self, pid):
+        '''
+            读取完整命令行, 保留参数中的空格; 内核线程没有cmdline
+        '''
+        try:
+            with open('{}/{}/cmdline'.format(self.PROC_PATH, pid), 'rb') as f:
+                raw = f.read()
+        except OSError:
+            return ''
+        return raw.rstrip(b'\0').replace(b'\0', b' ').decode('utf-8', 'replace')
+
+    def refresh(self):
+        '''
+            扫描一次/proc, 更新进程表
+        '''
+        with self.__refresh_lock:
+            return self.__scan()
+
+    def __scan(self):
+        uptime = float(self.__read_file('/proc/uptime').split()[0])
+        mem_total = self.__get_mem_total()
+        elapsed = uptime - self.__prev_uptime if self.__prev_uptime is not None else 0.0
+
+        processes = []
+        cur_ticks = {}
+        with os.scandir(self.PROC_PATH) as it:
+            for entry in it:
+                if not entry.name.isdigit():
+                    continue
+                try:
+                    proc, ticks = self.__read_process(entry, uptime, elapsed, mem_total)
+                except (OSError, IndexError, ValueError):
+                    # 扫描期间进程退出或无权限读取
+                    continue
+                processes.append(proc)
+                cur_ticks[proc['pid']] = ticks
+
+        with self.__lock:
+            # 只保留仍存活进程的缓存, 已退出的pid自然淘汰
+            self.__prev_ticks = cur_ticks
+            self.__prev_uptime = uptime
+            self.__processes = processes
+            self.__timestamp = time.time()
+        return processes
+
+    def snapshot(self, max_age=None):
+        '''
+            返回最近一次扫描结果; 指定max_age时, 结果过期则重新扫描
+            多个线程同时发现过期时只扫描一次, 其余线程直接复用结果
+        '''
+        if max_age is not None and time.time() - self.get_timestamp() > max_age:
+            with self.__refresh_lock:
+                # 等锁期间可能已被其他线程刷新
+                if time.time() - self.get_timestamp() > max_age:
+                    self.__scan()
+        with self.__lock:
+            return self.__processes
+
+    def query(self, sort_key='cpu_percent', reverse=True, user=None, state=None,
+              name=None, offset=0, limit=None, max_age=None):
+        '''
+            按条件查询进程表, 返回(满足条件的总数, 当前页进程列表)
+            user: 用户名; state: 状态字母或状态名; name: 已编译的进程名正则
+        '''
+        processes = self.snapshot(max_age)
+        if user is not None or state is not None or name is not None:
+            processes = [p for p in processes
+                         if (user is None or p['user'] == user)
+                         and (state is None or state in (p['s'], p['status']))
+                         and (name is None or name.search(p['name']))]
+        total = len(processes)
+
+        key = lambda p: p[sort_key]
+        if limit is None:
+            page = sorted(processes, key=key, reverse=reverse)[offset:]
+        else:
+            # 分页时只需前offset + limit个, 使用堆选择代替全量排序
+            select = heapq.nlargest if reverse else heapq.nsmallest
+            page = select(offset + limit, processes, key=key)[offset:]
+        return total, page
+
+    def top(self, n=10, key='cpu_percent', max_age=None):
+        '''
+            按指定字段返回占用最高的n个进程(堆选择, 不做全量排序)
+        '''
+        processes = self.snapshot(max_age)
+        top = heapq.nlargest(n, processes, key=lambda p: p[key])
+        result = []
+        for proc in top:
+            proc = dict(proc)
+            proc['command'] = self.__read_cmdline(proc['pid']) or '[{}]'.format(proc['name'])
+            result.append(proc)
+        return result
+
+    def count(self):
+        '''
+            最近一次扫描的进程数
+        '''
+        with self.__lock:
+            return len(self.__processes)
+
+    def get_timestamp(self):
+        with self.__lock:
+            return self.__timestamp
@@ -0,0 +1,76 @@
+'''
+  Copyright (c) KylinSoft  Co., Ltd. 2024.All rights reserved.
+  extuner licensed under the Mulan Permissive Software License, Version 2.
+  See LICENSE file for more details.
+'''
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# cython:language_level=3
+
+import threading
+import time
+import psutil
+from .decorator_wrap import DecoratorWrap
+
+
+# psutil后备CPU采样: 由调度器在后台周期调用sample, 接口只读取最近一次的差值结果, 不阻塞等待
+# 自行保存cpu_times基准, 不依赖psutil.cpu_percent(interval=None)的模块级共享状态
+# 未被调度器周期调用时(如shared模式), get在结果超过max_age秒后重新采样, 避免返回冻结的旧值
+@DecoratorWrap.singleton
+class PsutilCpuSampler():
+    def __init__(self, max_age=2):
+        self.__lock = threading.Lock()
+        self.__max_age = max_age
+        self.__sampled_at = None
+        self.__prev_total = None
+        self.__prev_percpu = None
+        self.__total_percent = None
+        self.__percpu_percent = None
+
+    @staticmethod
+    def __busy_total(times):
+        '''
+            与psutil.cpu_percent相同的口径: guest已计入user, 不重复统计; idle和iowait视为空闲
+        '''
+        total = sum(times)
+        total -= getattr(times, 'guest', 0) + getattr(times, 'guest_nice', 0)
+        busy = total - times.idle - getattr(times, 'iowait', 0)
+        return busy, total
+
+    @classmethod
+    def __percent(cls, cur, prev):
+        busy, total = cls.__busy_total(cur)
+        if prev is not None:
+            prev_busy, prev_total = cls.__busy_total(prev)
+            busy -= prev_busy
+            total -= prev_total
+        if total <= 0:
+            return 0.0
+        return round(min(max(busy * 100.0 / total, 0.0), 100.0), 1)
+
+    def sample(self):
+        '''
+            采样一次, 计算与上一次采样之间的CPU使用率
+        '''
+        total = psutil.cpu_times()
+        percpu = psutil.cpu_times(percpu=True)
+        with self.__lock:
+            prev_total, prev_percpu = self.__prev_total, self.__prev_percpu
+            if prev_percpu is None or len(prev_percpu) != len(percpu):
+                prev_percpu = [None] * len(percpu)
+            self.__total_percent = self.__percent(total, prev_total)
+            self.__percpu_percent = [self.__percent(c, p) for c, p in zip(percpu, prev_percpu)]
+            self.__prev_total, self.__prev_percpu = total, percpu
+            self.__sampled_at = time.monotonic()
+
+    def get(self):
+        '''
+            返回(总体使用率, 每核心使用率列表)
+            尚未采样过时立即采样一次, 以开机以来的平均值作为结果; 结果过期时重新采样, 得到距上次采样期间的使用率
+        '''
+        with self.__lock:
+            if self.__total_percent is not None and time.monotonic() - self.__sampled_at < self.__max_age:
+                return self.__total_percent, list(self.__percpu_percent)
+        self.sample()
+        with self.__lock:
+            return self.__total_percent, list(self.__percpu_percent)
@@ -0,0 +1,158 @@
+'''
+  Copyright (c) KylinSoft  Co., Ltd. 2024.All rights reserved.
+  extuner licensed under the Mulan Permissive Software License, Version 2.
+  See LICENSE file for more details.
+'''
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# cython:language_level=3
+
+import bisect
+import threading
+import time
+from .decorator_wrap import DecoratorWrap
+
+
+# 耗时直方图桶上界(秒): 相邻桶相差2^(1/4)倍(约19%), 覆盖10微秒到约2分钟
+LATENCY_BOUNDS = [1e-5 * 2 ** (i / 4) for i in range(96)]
+
+
+# 对数分桶的耗时直方图: 记录一次只需一次二分查找和一次加法
+# 分位数按桶上界估算, 相对误差不超过一个桶宽
+class LatencyHistogram():
+    BOUNDS = LATENCY_BOUNDS
+    BUCKETS = len(LATENCY_BOUNDS)
+
+    def __init__(self):
+        # 最后一个桶记录超出上界的样本
+        self.counts = [0] * (self.BUCKETS + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.counts[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        '''
+            返回q分位数(秒), 没有样本时返回None
+        '''
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                if i >= self.BUCKETS:
+                    return self.max
+                return min(self.BOUNDS[i], self.max)
+        return self.max
+
+
+# 单个路由的统计
+class RouteStats():
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.in_flight = 0
+        self.client_errors = 0
+        self.server_errors = 0
+        self.response_bytes = 0
+
+
+# 请求统计: 按"方法 路由规则"分别记录耗时直方图、进行中请求数、响应大小和错误数
+@DecoratorWrap.singleton
+class RequestMetrics():
+    QUANTILES = (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__routes = {}
+        self.start_time = time.time()
+
+    def __get_route(self, key):
+        stats = self.__routes.get(key)
+        if stats is None:
+            stats = self.__routes[key] = RouteStats()
+        return stats
+
+    def begin(self, key):
+        '''
+            请求开始, 返回开始时间, 由end使用
+        '''
+        with self.__lock:
+            self.__get_route(key).in_flight += 1
+        return time.perf_counter()
+
+    def end(self, key, start, status, size):
+        '''
+            请求结束; size为响应字节数, 流式响应未知时为None
+        '''
+        elapsed = time.perf_counter() - start
+        with self.__lock:
+            stats = self.__get_route(key)
+            stats.latency.record(elapsed)
+            if status >= 500:
+                stats.server_errors += 1
+            elif status >= 400:
+                stats.client_errors += 1
+            if size:
+                stats.response_bytes += size
+
+    def finish(self, key):
+        '''
+            请求处理完毕(包括处理中抛出异常的情况), 减少进行中请求数
+        '''
+        with self.__lock:
+            self.__get_route(key).in_flight -= 1
+
+    def get_stats(self):
+        '''
+            返回各路由的请求数、错误数、响应字节数和耗时分位数(毫秒)
+        '''
+        with self.__lock:
+            routes = {}
+            for key, stats in self.__routes.items():
+                latency = stats.latency
+                item = {
+                    'count': latency.count,
+                    'in_flight': stats.in_flight,
+                    'client_errors': stats.client_errors,
+                    'server_errors': stats.server_errors,
+                    'response_bytes': stats.response_bytes,
+                    'mean_ms': round(latency.total * 1000 / latency.count, 3) if latency.count else None,
+                    'max_ms': round(latency.max * 1000, 3)
+                }
+                for name, q in self.QUANTILES:
+                    value = latency.quantile(q)
+                    item[name + '_ms'] = round(value * 1000, 3) if value is not None else None
+                routes[key] = item
+        return {'since': self.start_time, 'routes': routes}
+
+    def get_histograms(self, step=4):
+        '''
+            导出用的累计直方图, 每step个桶合并为一个(默认按2倍分桶, 桶上界为10微秒的2^k倍)
+            返回{路由: (桶上界列表, 累计计数列表, 样本数, 耗时总和, 其他统计)}
+        '''
+        bounds = LATENCY_BOUNDS[::step]
+        with self.__lock:
+            result = {}
+            for key, stats in self.__routes.items():
+                latency = stats.latency
+                cumulative = []
+                seen = 0
+                for i, n in enumerate(latency.counts[:latency.BUCKETS]):
+                    seen += n
+                    if i % step == 0:
+                        cumulative.append(seen)
+                result[key] = (bounds, cumulative, latency.count, latency.total, {
+                    'in_flight': stats.in_flight,
+                    'client_errors': stats.client_errors,
+                    'server_errors': stats.server_errors,
+                    'response_bytes': stats.response_bytes
+                })
+        return result
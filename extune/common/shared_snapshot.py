@@ -0,0 +1,200 @@
+'''
+  Copyright (c) KylinSoft  Co., Ltd. 2024.All rights reserved.
+  extuner licensed under the Mulan Permissive Software License, Version 2.
+  See LICENSE file for more details.
+'''
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# cython:language_level=3
+
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from .log import Logger
+from .snapshot import Snapshot
+
+
+# 共享快照文件: 采集进程写入, 多个Web进程只读
+# 文件布局: 文件头 | 区域表 | 各区域(区域头 + 数据)
+# 每个区域用顺序锁(seqlock)保护: 写入前序号加1变为奇数, 写完再加1变为偶数;
+# 读取方前后两次读到相同的偶数序号且校验和一致, 才认为读到了完整数据
+class SharedSnapshotLayout():
+    MAGIC = b'KYSNAPSH'
+    VERSION = 1
+    # magic, version, 区域数, 区域容量, 写入进程pid, 最近写入时间
+    HEADER = struct.Struct('<8sIIQQd')
+    HEADER_SIZE = 64
+    NAME_SIZE = 32
+    # 顺序锁序号, 数据长度, crc32, 快照序号, 快照时间
+    REGION_HEADER = struct.Struct('<QIIQd')
+    REGION_HEADER_SIZE = 64
+
+    def __init__(self, names, capacity):
+        self.names = list(names)
+        self.capacity = capacity
+        table_size = len(self.names) * self.NAME_SIZE
+        # 区域起始位置按8字节对齐
+        self.regions_off = (self.HEADER_SIZE + table_size + 7) // 8 * 8
+        self.region_size = self.REGION_HEADER_SIZE + capacity
+        self.size = self.regions_off + len(self.names) * self.region_size
+        self.offsets = {name: self.regions_off + i * self.region_size for i, name in enumerate(self.names)}
+
+
+class SharedSnapshotWriter():
+    def __init__(self, path, names, capacity=1024 * 1024):
+        '''
+            path: 共享文件路径, 建议位于/dev/shm
+            names: 区域名称列表, 通常为采集器名称
+            capacity: 每个区域可写入的最大字节数
+        '''
+        self.path = path
+        self.layout = SharedSnapshotLayout(names, capacity)
+        # 先在临时文件中建好布局再改名, 读取方不会映射到大小或文件头不完整的文件;
+        # 也不会截断读取方正在映射的旧文件(访问截断部分会触发SIGBUS)
+        tmp_path = '{}.{}'.format(path, os.getpid())
+        fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, self.layout.size)
+            self.__mmap = mmap.mmap(fd, self.layout.size)
+        finally:
+            os.close(fd)
+
+        layout = self.layout
+        for i, name in enumerate(layout.names):
+            off = layout.HEADER_SIZE + i * layout.NAME_SIZE
+            self.__mmap[off:off + layout.NAME_SIZE] = name.encode('utf-8').ljust(layout.NAME_SIZE, b'\0')
+        self.__write_header()
+        os.rename(tmp_path, path)
+
+    def __write_header(self):
+        layout = self.layout
+        layout.HEADER.pack_into(self.__mmap, 0, layout.MAGIC, layout.VERSION, len(layout.names),
+                                layout.capacity, os.getpid(), time.time())
+
+    def write(self, name, snapshot):
+        '''
+            写入一个快照(单写者, 不需要额外加锁)
+        '''
+        body = json.dumps(snapshot, separators=(',', ':'), default=str).encode('utf-8')
+        layout = self.layout
+        if len(body) > layout.capacity:
+            Logger().error("shared snapshot {} is too large ({} bytes)".format(name, len(body)))
+            return False
+        off = layout.offsets[name]
+        lock_seq = struct.unpack_from('<Q', self.__mmap, off)[0]
+        # 序号变为奇数, 表示正在写入
+        struct.pack_into('<Q', self.__mmap, off, lock_seq + 1)
+        data_off = off + layout.REGION_HEADER_SIZE
+        self.__mmap[data_off:data_off + len(body)] = body
+        layout.REGION_HEADER.pack_into(self.__mmap, off, lock_seq + 1, len(body), zlib.crc32(body),
+                                       getattr(snapshot, 'seq', 0), getattr(snapshot, 'timestamp', time.time()))
+        # 序号变回偶数, 写入完成
+        struct.pack_into('<Q', self.__mmap, off, lock_seq + 2)
+        self.__write_header()
+        return True
+
+    def close(self):
+        self.__mmap.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+class SharedSnapshotReader():
+    # 读到写入中的数据时的最大重试次数
+    MAX_RETRIES = 100
+
+    def __init__(self, path):
+        self.path = path
+        # 多个线程共用一个读取方, 重新映射期间不能读取
+        self.__lock = threading.Lock()
+        self.__mmap = None
+        self.__ino = None
+        self.layout = None
+        # {区域名: 上次读取的顺序锁序号}
+        self.__last = {}
+
+    def __open(self):
+        '''
+            打开共享文件; 写入进程重启后文件被重建, 按inode判断是否需要重新映射
+        '''
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if self.__mmap is not None and st.st_ino == self.__ino:
+            return True
+        self.__unmap()
+        try:
+            with open(self.path, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return False
+        magic, version, count, capacity, _, _ = SharedSnapshotLayout.HEADER.unpack_from(mm, 0)
+        if magic != SharedSnapshotLayout.MAGIC or version != SharedSnapshotLayout.VERSION:
+            mm.close()
+            return False
+        names = []
+        for i in range(count):
+            off = SharedSnapshotLayout.HEADER_SIZE + i * SharedSnapshotLayout.NAME_SIZE
+            names.append(mm[off:off + SharedSnapshotLayout.NAME_SIZE].rstrip(b'\0').decode('utf-8'))
+        self.layout = SharedSnapshotLayout(names, capacity)
+        self.__mmap = mm
+        self.__ino = st.st_ino
+        self.__last = {}
+        return True
+
+    def get_writer_info(self):
+        '''
+            返回(写入进程pid, 最近写入时间), 共享文件不存在时返回None
+        '''
+        with self.__lock:
+            if not self.__open():
+                return None
+            _, _, _, _, pid, heartbeat = SharedSnapshotLayout.HEADER.unpack_from(self.__mmap, 0)
+            return pid, heartbeat
+
+    def read(self, name, only_new=True):
+        '''
+            读取一个区域的快照; only_new为True时, 自上次读取后没有更新则返回None
+        '''
+        with self.__lock:
+            if not self.__open() or name not in self.layout.offsets:
+                return None
+            return self.__read(name, only_new)
+
+    def __read(self, name, only_new):
+        mm = self.__mmap
+        off = self.layout.offsets[name]
+        data_off = off + SharedSnapshotLayout.REGION_HEADER_SIZE
+        for _ in range(self.MAX_RETRIES):
+            lock_seq, length, crc, seq, timestamp = SharedSnapshotLayout.REGION_HEADER.unpack_from(mm, off)
+            if lock_seq == 0:
+                # 尚未写入过
+                return None
+            if lock_seq & 1:
+                time.sleep(0)
+                continue
+            if only_new and self.__last.get(name) == lock_seq:
+                return None
+            body = mm[data_off:data_off + length]
+            if struct.unpack_from('<Q', mm, off)[0] == lock_seq and zlib.crc32(body) == crc:
+                break
+        else:
+            return None
+        self.__last[name] = lock_seq
+        return Snapshot(json.loads(body), seq=seq, timestamp=timestamp)
+
+    def __unmap(self):
+        if self.__mmap is not None:
+            self.__mmap.close()
+            self.__mmap = None
+
+    def close(self):
+        with self.__lock:
+            self.__unmap()
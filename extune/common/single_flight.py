@@ -0,0 +1,93 @@
+'''
+  Copyright (c) KylinSoft  Co., Ltd. 2024.All rights reserved.
+  extuner licensed under the Mulan Permissive Software License, Version 2.
+  See LICENSE file for more details.
+'''
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# cython:language_level=3
+
+import threading
+import time
+
+
+# 一次进行中或已完成的调用
+class FlightCall():
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        # 结果的过期时间(time.monotonic), 未完成时为None
+        self.expires = None
+
+
+# 请求合并: 相同key的并发调用只执行一次, 其余调用等待并共享同一结果(包括异常)
+# ttl大于0时结果在完成后继续保留ttl秒, 期间的调用直接返回该结果
+class SingleFlight():
+    def __init__(self, max_entries=256):
+        '''
+            max_entries: 保留结果的条目数超过该值时清理已过期的条目
+        '''
+        self.max_entries = max_entries
+        self.__lock = threading.Lock()
+        self.__calls = {}
+        self.__stats = {'executed': 0, 'shared': 0, 'cached': 0}
+
+    def __purge(self, now):
+        expired = [key for key, call in self.__calls.items()
+                   if call.expires is not None and call.expires <= now]
+        for key in expired:
+            del self.__calls[key]
+
+    def do(self, key, func, ttl=0, cacheable=None):
+        '''
+            执行func()或等待相同key的进行中调用, 返回其结果
+            ttl: 结果保留秒数, 0表示只合并并发调用
+            cacheable: 判断结果是否可以保留的函数, 如不保留错误响应
+        '''
+        now = time.monotonic()
+        with self.__lock:
+            call = self.__calls.get(key)
+            if call is not None and call.expires is not None and call.expires <= now:
+                del self.__calls[key]
+                call = None
+            if call is not None:
+                if call.done.is_set():
+                    self.__stats['cached'] += 1
+                else:
+                    self.__stats['shared'] += 1
+                owner = False
+            else:
+                if len(self.__calls) >= self.max_entries:
+                    self.__purge(now)
+                call = self.__calls[key] = FlightCall()
+                self.__stats['executed'] += 1
+                owner = True
+
+        if not owner:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+        with self.__lock:
+            keep = ttl > 0 and call.error is None and (cacheable is None or cacheable(call.result))
+            if keep:
+                call.expires = time.monotonic() + ttl
+            elif self.__calls.get(key) is call:
+                del self.__calls[key]
+        call.done.set()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def get_stats(self):
+        '''
+            执行次数、与进行中调用合并的次数、直接使用保留结果的次数
+        '''
+        with self.__lock:
+            return dict(self.__stats, entries=len(self.__calls))
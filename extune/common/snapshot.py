@@ -0,0 +1,79 @@
+'''
+  Copyright (c) KylinSoft  Co., Ltd. 2024.All rights reserved.
+  extuner licensed under the Mulan Permissive Software License, Version 2.
+  See LICENSE file for more details.
+'''
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# cython:language_level=3
+
+import itertools
+import threading
+import time
+
+
+# 全局递增序号, 所有采集器共用; 以启动时的毫秒时间为起点, 进程重启后序号(ETag)不会与之前重复
+_seq_counter = itertools.count(int(time.time() * 1000))
+_seq_lock = threading.Lock()
+
+
+# 采集结果快照: 发布后只读, seq随每次发布单调递增
+# 继承dict, 原有按键读取和jsonify的用法保持不变
+class Snapshot(dict):
+    def __init__(self, data, seq=None, timestamp=None):
+        '''
+            seq/timestamp: 从其他进程读取的快照沿用原有的序号和时间
+        '''
+        super().__init__(data)
+        if seq is None:
+            with _seq_lock:
+                seq = next(_seq_counter)
+        self.seq = seq
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    def __readonly(self, *args, **kwargs):
+        raise TypeError("Snapshot is read-only")
+
+    __setitem__ = __readonly
+    __delitem__ = __readonly
+    clear = __readonly
+    pop = __readonly
+    popitem = __readonly
+    setdefault = __readonly
+    update = __readonly
+
+
+def snapshot_key(*snapshots):
+    '''
+        多个快照的序号组合; 任一数据不是快照(采集未运行)时返回None
+    '''
+    if not all(isinstance(s, Snapshot) for s in snapshots):
+        return None
+    return tuple(s.seq for s in snapshots)
+
+
+# 序列化结果缓存: 同一组快照只序列化一次, 以序号组合作为ETag
+class SerializedCache():
+    def __init__(self):
+        self.__lock = threading.Lock()
+        # {名称: (key, 序列化字节, etag)}
+        self.__entries = {}
+
+    def get(self, name, key, build):
+        '''
+            返回(序列化字节, etag); key为None时不缓存, etag为None
+            build: 无参函数, 返回序列化后的字节
+        '''
+        if key is None:
+            return build(), None
+
+        with self.__lock:
+            entry = self.__entries.get(name)
+        if entry is not None and entry[0] == key:
+            return entry[1], entry[2]
+
+        body = build()
+        etag = '{}-{}'.format(name, '-'.join(str(k) for k in key))
+        with self.__lock:
+            self.__entries[name] = (key, body, etag)
+        return body, etag
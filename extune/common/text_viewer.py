@@ -0,0 +1,273 @@
+'''
+  Copyright (c) KylinSoft  Co., Ltd. 2024.All rights reserved.
+  extuner licensed under the Mulan Permissive Software License, Version 2.
+  See LICENSE file for more details.
+'''
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# cython:language_level=3
+
+import bisect
+import codecs
+import collections
+import hashlib
+import os
+import threading
+
+
+def sniff_encoding(sample, truncated):
+    '''
+        根据文件开头的一段字节判断编码, 含NUL字节时视为二进制文件返回None
+        truncated: 样本是否在文件中间截断, 截断处的半个多字节字符不算解码失败
+    '''
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if b'\x00' in sample:
+        return None
+    # gb2312是gbk的子集, ascii是utf-8的子集; latin-1可以解码任意字节, 作为最后的选择
+    for encoding in ('utf-8', 'gbk'):
+        try:
+            sample.decode(encoding)
+            return encoding
+        except UnicodeDecodeError as e:
+            if truncated and e.reason == 'unexpected end of data' and e.start >= len(sample) - 3:
+                return encoding
+    return 'latin-1'
+
+
+# 稀疏行索引: 每隔step字节记录一个检查点(字节偏移, 该偏移前的换行数)
+# 只在需要时向后扫描, 定位任意行最多再读取step字节
+class LineIndex():
+    def __init__(self, step):
+        self.step = step
+        self.offsets = [0]
+        self.newlines = [0]
+        self.complete = False
+        self.total_lines = None
+        # 扫描完成时的文件大小
+        self.size = None
+
+    def resize(self, size):
+        '''
+            文件在末尾追加了内容时保留已有检查点, 只需从最后一个检查点继续扫描新增部分
+        '''
+        if self.complete and size > self.size:
+            self.complete = False
+            self.total_lines = None
+
+    def extend(self, f, size, line=None, offset=None):
+        '''
+            向后扫描直到覆盖第line行(从0开始)或字节偏移offset, 均为None时扫描到文件末尾
+        '''
+        while not self.complete:
+            if line is not None and self.newlines[-1] >= line:
+                break
+            if offset is not None and self.offsets[-1] >= offset:
+                break
+            position = self.offsets[-1]
+            f.seek(position)
+            data = f.read(min(self.step, size - position))
+            if not data:
+                # 最后一行没有换行符时也算一行
+                self.complete = True
+                self.size = size
+                self.total_lines = self.newlines[-1]
+                if size:
+                    f.seek(size - 1)
+                    if f.read(1) != b'\n':
+                        self.total_lines += 1
+                break
+            self.offsets.append(position + len(data))
+            self.newlines.append(self.newlines[-1] + data.count(b'\n'))
+
+    def line_offset(self, f, size, line):
+        '''
+            第line行(从0开始)的起始字节偏移, 超出文件行数时返回size
+        '''
+        if line == 0:
+            return 0
+        self.extend(f, size, line=line)
+        # 第line行从第line个换行符之后开始, 找到该换行符所在的检查点区间
+        i = bisect.bisect_left(self.newlines, line) - 1
+        if i + 1 >= len(self.offsets):
+            return size
+        position = self.offsets[i]
+        f.seek(position)
+        data = f.read(self.offsets[i + 1] - position)
+        parts = data.split(b'\n', line - self.newlines[i])
+        return position + len(data) - len(parts[-1])
+
+    def line_number(self, f, size, offset):
+        '''
+            字节偏移offset所在行的行号(从0开始)
+        '''
+        self.extend(f, size, offset=offset)
+        i = bisect.bisect_right(self.offsets, offset) - 1
+        position = self.offsets[i]
+        f.seek(position)
+        return self.newlines[i] + f.read(offset - position).count(b'\n')
+
+
+# 单个文件版本的编码和行索引
+class TextFileState():
+    def __init__(self, signature, encoding, index, fingerprint):
+        self.signature = signature
+        self.encoding = encoding
+        self.index = index
+        # 文件开头和已索引部分末尾的摘要, 用于确认文件变大时原有内容未被改写
+        self.fingerprint = fingerprint
+        self.lock = threading.Lock()
+
+
+# 大文件分段查看: 按字节偏移、行号或从末尾向前读取一个窗口, 内存和耗时只与窗口大小有关
+# 编码只在文件首次打开时根据开头sniff_bytes字节判断一次, 与行索引一起按(设备, inode, 修改时间, 大小)缓存
+# 同一inode只是变大(日志追加)且原有内容的首尾采样未变时沿用编码和行索引, 不重新扫描已索引的部分;
+# copytruncate轮转后重新写到超过原大小的文件首尾采样不同, 重新建立索引
+class TextFileViewer():
+    # 校验原有内容时在文件开头和原末尾各读取的字节数
+    FINGERPRINT_BYTES = 4096
+
+    def __init__(self, max_files=32, sniff_bytes=64 * 1024, index_step=1024 * 1024):
+        '''
+            max_files: 缓存编码和行索引的文件数
+            sniff_bytes: 判断编码时读取的字节数
+            index_step: 行索引检查点间隔(字节)
+        '''
+        self.max_files = max_files
+        self.sniff_bytes = sniff_bytes
+        self.index_step = index_step
+        self.__lock = threading.Lock()
+        self.__files = collections.OrderedDict()
+
+    def __fingerprint(self, f, size):
+        '''
+            文件开头和size之前各FINGERPRINT_BYTES字节的摘要
+        '''
+        digest = hashlib.sha1()
+        f.seek(0)
+        digest.update(f.read(min(self.FINGERPRINT_BYTES, size)))
+        tail = max(size - self.FINGERPRINT_BYTES, 0)
+        f.seek(tail)
+        digest.update(f.read(size - tail))
+        return digest.digest()
+
+    def __get_state(self, path, f, st):
+        signature = (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+        with self.__lock:
+            state = self.__files.get(path)
+            if state is not None and state.signature == signature:
+                self.__files.move_to_end(path)
+                return state
+        # 编码判断用的样本已完整且原有内容未被改写时, 末尾追加的内容不影响编码和已有检查点
+        if state is not None and state.signature[:2] == signature[:2] and \
+                self.sniff_bytes <= state.signature[3] < st.st_size and \
+                self.__fingerprint(f, state.signature[3]) == state.fingerprint:
+            fingerprint = self.__fingerprint(f, st.st_size)
+            with self.__lock:
+                state.signature = signature
+                state.fingerprint = fingerprint
+                self.__files.move_to_end(path)
+            return state
+        f.seek(0)
+        sample = f.read(self.sniff_bytes)
+        state = TextFileState(signature, sniff_encoding(sample, st.st_size > len(sample)),
+                              LineIndex(self.index_step), self.__fingerprint(f, st.st_size))
+        with self.__lock:
+            self.__files[path] = state
+            self.__files.move_to_end(path)
+            while len(self.__files) > self.max_files:
+                self.__files.popitem(last=False)
+        return state
+
+    def detect_encoding(self, path):
+        '''
+            返回文件编码, 二进制文件返回None
+        '''
+        with open(path, 'rb') as f:
+            return self.__get_state(path, f, os.fstat(f.fileno())).encoding
+
+    @staticmethod
+    def __align_forward(f, offset, max_bytes):
+        '''
+            将offset移到下一行的开头; max_bytes内没有换行符(超长行)时保持原位置
+        '''
+        if offset == 0:
+            return 0
+        f.seek(offset - 1)
+        data = f.read(max_bytes + 1)
+        newline = data.find(b'\n')
+        return offset + newline if newline >= 0 else offset
+
+    def read_window(self, path, offset=None, line=None, before=None, max_bytes=64 * 1024, max_lines=1000):
+        '''
+            读取一个文本窗口, 窗口总是从行首开始, 不在文件末尾时以完整行结束
+            offset: 从该字节偏移之后的第一个行首开始向后读取
+            line: 从第line行(从1开始)开始向后读取
+            before: 读取结束于该字节偏移之前的窗口(传入文件大小即为查看末尾)
+            三者都未指定时从文件开头读取; 二进制文件抛出ValueError
+        '''
+        with open(path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            size = st.st_size
+            state = self.__get_state(path, f, st)
+            if state.encoding is None:
+                raise ValueError("binary file")
+            with state.lock:
+                state.index.resize(size)
+                first_line = None
+                if before is not None:
+                    end = min(max(before, 0), size)
+                    start = max(end - max_bytes, 0)
+                    f.seek(start)
+                    data = f.read(end - start)
+                    if start > 0:
+                        # 丢弃窗口开头被截断的半行
+                        newline = data.find(b'\n')
+                        if 0 <= newline < len(data) - 1:
+                            data = data[newline + 1:]
+                            start += newline + 1
+                    lines = data.split(b'\n')
+                    if lines[-1] == b'':
+                        lines.pop()
+                    if len(lines) > max_lines:
+                        skipped = sum(len(part) + 1 for part in lines[:len(lines) - max_lines])
+                        data = data[skipped:]
+                        start += skipped
+                else:
+                    if line is not None:
+                        line = max(line, 1)
+                        start = state.index.line_offset(f, size, line - 1)
+                        first_line = line if start < size else None
+                    else:
+                        start = self.__align_forward(f, min(max(offset or 0, 0), size), max_bytes)
+                    f.seek(start)
+                    data = f.read(min(max_bytes, size - start))
+                    if start + len(data) < size:
+                        # 只保留完整行; 超长行无法在窗口内结束时原样截断
+                        newline = data.rfind(b'\n')
+                        if newline >= 0:
+                            data = data[:newline + 1]
+                    lines = data.split(b'\n', max_lines)
+                    if len(lines) > max_lines:
+                        data = data[:len(data) - len(lines[-1])]
+                end = start + len(data)
+                # 行号只在索引已覆盖或最多再扫描一个检查点间隔(如追加后查看末尾)时给出
+                if first_line is None and (state.index.complete or
+                                           start - state.index.offsets[-1] <= state.index.step):
+                    first_line = state.index.line_number(f, size, start) + 1
+                total_lines = state.index.total_lines
+
+        line_count = data.count(b'\n') + (1 if data and not data.endswith(b'\n') else 0)
+        return {
+            'content': data.decode(state.encoding, 'replace'),
+            'encoding': state.encoding,
+            'lines': line_count,
+            'window': {
+                'start': start,
+                'end': end,
+                'first_line': first_line,
+                'total_lines': total_lines,
+                'has_previous': start > 0,
+                'has_next': end < size
+            }
+        }
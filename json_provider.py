@@ -0,0 +1,121 @@
+"""
+JSON序列化与响应压缩 - 安装orjson时使用orjson加速序列化，否则使用标准库json
+"""
+import gzip
+import threading
+import zlib
+from collections import OrderedDict
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON提供者：优先使用orjson，遇到orjson不支持的类型时退回标准库"""
+
+    def __orjson_option(self):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    def dumps_bytes(self, obj, **kwargs):
+        """序列化为UTF-8编码的字节"""
+        if orjson is not None and not kwargs:
+            try:
+                return orjson.dumps(obj, default=self.default, option=self.__orjson_option())
+            except TypeError:
+                # 如namedtuple等orjson不支持的类型
+                pass
+        return super().dumps(obj, **kwargs).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            return self.dumps_bytes(obj).decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
+
+
+class ResponseCompressor:
+    """按Accept-Encoding对较大的响应进行gzip/deflate压缩
+    带ETag的响应按(ETag, 编码)缓存压缩结果，多个客户端请求同一数据时只压缩一次
+    """
+
+    COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'image/svg+xml',
+                         'application/openmetrics-text')
+
+    def __init__(self, min_size=1024, level=6, cache_size=64):
+        self.min_size = min_size
+        self.level = level
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+
+    @staticmethod
+    def choose_encoding(accept_encoding):
+        """从Accept-Encoding中选择gzip或deflate（q=0表示不接受）"""
+        accepted = {}
+        for item in accept_encoding.split(','):
+            name, _, params = item.strip().partition(';')
+            quality = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+            accepted[name.strip().lower()] = quality
+        for encoding in ('gzip', 'deflate'):
+            if accepted.get(encoding, accepted.get('*', 0.0)) > 0:
+                return encoding
+        return None
+
+    def compress(self, data, encoding):
+        if encoding == 'gzip':
+            return gzip.compress(data, compresslevel=self.level, mtime=0)
+        return zlib.compress(data, self.level)
+
+    def __call__(self, request, response):
+        """after_request钩子：满足条件时压缩响应体"""
+        if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+                or 'Content-Encoding' in response.headers
+                or not response.mimetype.startswith(self.COMPRESSIBLE_TYPES)):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self.choose_encoding(request.headers.get('Accept-Encoding', ''))
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+
+        etag, weak = response.get_etag()
+        cache_key = (etag, encoding) if etag else None
+        with self._lock:
+            body = self._cache.get(cache_key) if cache_key else None
+        if body is None:
+            body = self.compress(data, encoding)
+            if cache_key:
+                with self._lock:
+                    self._cache[cache_key] = body
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        if etag and not weak:
+            # 压缩后字节不同，改为弱ETag，If-None-Match按弱比较仍可命中
+            response.set_etag(etag, weak=True)
+        return response
@@ -111,7 +111,6 @@ class Windows10Desktop {
 
         // 定期更新时间和系统状态
         setInterval(() => this.updateDateTime(), 1000);
-        setInterval(() => this.loadSystemStatus(), 30000);
         
         // 初始化主题图标
         setTimeout(() => this.updateThemeIcon(), 100);
@@ -266,14 +265,17 @@ class Windows10Desktop {
         try {
             const response = await fetch('/api/system-status');
             const data = await response.json();
-            
-            // 这里可以更新系统状态显示
-            console.log('系统状态:', data);
+            this.updateSystemStatus(data);
         } catch (error) {
             console.error('获取系统状态失败:', error);
         }
     }
 
+    updateSystemStatus(data) {
+        // 这里可以更新系统状态显示
+        console.log('系统状态:', data);
+    }
+
     async loadAlertNotification() {
         try {
             const xhr2 = new XMLHttpRequest();
@@ -369,10 +371,9 @@ class Windows10Desktop {
     }
 
     startAutoUpdate() {
-        // 每2秒自动更新一次，提高刷新频率
-        this.updateInterval = setInterval(() => {
-            this.loadAlertNotification();
-        }, 1000);
+        // 报警和系统状态通过页面共享的推送连接接收，不支持推送时由metricStream退回轮询
+        window.metricStream.subscribe('alerts', (alerts) => this.updateAlert(alerts));
+        window.metricStream.subscribe('status', (data) => this.updateSystemStatus(data));
     }
 
 
@@ -108,6 +108,12 @@ class FileManager {
         this.clipboard = null;
         this.updateInterval = null;
         this.currentAlerts = new Map(); // 存储当前活动的告警
+        this.loadedItems = []; // 当前目录已加载的项（分页加载）
+        this.nextCursor = null; // 下一页游标，为null表示已全部加载
+        this.totalItems = 0;
+        this.loadingMore = false;
+        this.searchQuery = ''; // 名称过滤串，由服务端在整个目录中过滤
+        this.searchTimer = null;
         this.alertTypeMap = {
             'cpu-overload': { type: 'warning', title: 'CPU 过载' },
             'memory-overload': { type: 'error', title: '内存不足' },
@@ -161,6 +167,16 @@ class FileManager {
             }
         });
 
+        // 滚动到底部时加载下一页
+        const fileArea = document.querySelector('.file-area');
+        if (fileArea) {
+            fileArea.addEventListener('scroll', () => {
+                if (fileArea.scrollTop + fileArea.clientHeight >= fileArea.scrollHeight - 200) {
+                    this.loadMoreFiles();
+                }
+            });
+        }
+
         // 搜索事件
         document.getElementById('search-input').addEventListener('input', (e) => {
             this.searchFiles(e.target.value);
@@ -313,17 +329,28 @@ class FileManager {
         });
     }
     startAutoUpdate() {
-        // 每1秒自动更新一次，提高刷新频率
-        this.updateInterval = setInterval(() => {
-            this.loadAlertNotification();
-        }, 1000);
+        // 报警通过页面共享的推送连接接收，不支持推送时由metricStream退回轮询
+        window.metricStream.subscribe('alerts', (alerts) => this.updateAlert(alerts));
+    }
+
+    filesUrl(path, cursor = null) {
+        let url = `/api/files?path=${encodeURIComponent(path)}`;
+        if (this.searchQuery) {
+            url += `&q=${encodeURIComponent(this.searchQuery)}`;
+        }
+        if (cursor) {
+            url += `&cursor=${encodeURIComponent(cursor)}`;
+        }
+        return url;
     }
 
     async loadDirectory(path) {
+        this.nextCursor = null;
+        this.loadedItems = [];
         try {
             this.showLoading();
             
-            const response = await fetch(`/api/files?path=${encodeURIComponent(path)}`);
+            const response = await fetch(this.filesUrl(path));
             
             if (!response.ok) {
                 // 处理不同类型的HTTP错误
@@ -395,8 +422,11 @@ class FileManager {
                 this.showWarning(data.warning);
             }
             
-            this.renderFiles(data.items || []);
-            this.updateStatusBar(data.items || []);
+            this.loadedItems = data.items || [];
+            this.nextCursor = data.next_cursor || null;
+            this.totalItems = data.total_items || this.loadedItems.length;
+            this.renderFiles(this.loadedItems);
+            this.updateStatusBar(this.loadedItems);
             this.currentPath = data.current_path || path;
             this.updateAddressBar();
             
@@ -465,6 +495,48 @@ class FileManager {
         }
     }
 
+    async loadMoreFiles() {
+        if (!this.nextCursor || this.loadingMore) {
+            return;
+        }
+        this.loadingMore = true;
+        const path = this.currentPath;
+        const query = this.searchQuery;
+        try {
+            const response = await fetch(this.filesUrl(path, this.nextCursor));
+            if (!response.ok) {
+                throw new Error(`HTTP错误: ${response.status}`);
+            }
+            const data = await response.json();
+            // 加载期间已切换目录或修改搜索条件则丢弃结果
+            if (path !== this.currentPath || query !== this.searchQuery || !this.nextCursor) {
+                return;
+            }
+            const items = data.items || [];
+            this.nextCursor = data.next_cursor || null;
+            this.totalItems = data.total_items || this.totalItems;
+            this.appendFiles(items);
+            this.loadedItems = this.loadedItems.concat(items);
+            this.updateStatusBar(this.loadedItems);
+        } catch (error) {
+            console.error('加载更多文件失败:', error);
+            this.nextCursor = null;
+        } finally {
+            this.loadingMore = false;
+        }
+    }
+
+    appendFiles(items) {
+        const fileGrid = document.getElementById('file-grid');
+        if (!fileGrid) {
+            return;
+        }
+        items.forEach((item, index) => {
+            const fileElement = this.createFileElement(item, Math.min(index, 20));
+            fileGrid.appendChild(fileElement);
+        });
+    }
+
     renderFiles(items) {
         const fileGrid = document.getElementById('file-grid');
         if (!fileGrid) {
@@ -744,14 +816,16 @@ class FileManager {
     }
 
     searchFiles(query) {
-        const fileItems = document.querySelectorAll('.file-item');
-        
-        fileItems.forEach(item => {
-            const fileName = item.querySelector('.file-name').textContent.toLowerCase();
-            const matches = fileName.includes(query.toLowerCase());
-            
-            item.style.display = matches || query === '' ? 'flex' : 'none';
-        });
+        // 搜索由服务端在整个目录中过滤（不限于已加载的页），输入停顿后重新加载第一页
+        clearTimeout(this.searchTimer);
+        this.searchTimer = setTimeout(() => {
+            query = query.trim();
+            if (query === this.searchQuery) {
+                return;
+            }
+            this.searchQuery = query;
+            this.loadDirectory(this.currentPath);
+        }, 300);
     }
 
     showContextMenu(event, item = null) {
@@ -898,6 +972,12 @@ class FileManager {
             const folderCount = items.filter(item => item.is_dir).length;
             const fileCount = items.length - folderCount;
             itemCount.textContent = `${items.length} 个对象 (${folderCount} 个文件夹, ${fileCount} 个文件)`;
+            if (this.searchQuery) {
+                itemCount.textContent = `名称包含 "${this.searchQuery}" 的 ` + itemCount.textContent;
+            }
+            if (this.nextCursor && this.totalItems > items.length) {
+                itemCount.textContent += `，共 ${this.totalItems} 个，滚动加载更多`;
+            }
         }
         
         if (selectedInfo) {
@@ -1294,16 +1374,65 @@ class FileManager {
 
     renderTextPreview(data, container) {
         const fileInfo = data.file_info;
+        const win = data.window || {};
+        const paged = win.has_previous || win.has_next;
+        let lineInfo = `${data.lines}`;
+        if (win.first_line) {
+            lineInfo = `${data.lines}（第 ${win.first_line} 行起${win.total_lines ? `，共 ${win.total_lines} 行` : ''}）`;
+        }
         
         container.innerHTML = `
             <div class="text-preview">${this.escapeHtml(data.content)}</div>
+            ${paged ? `
+            <div class="text-preview-nav" style="display: flex; gap: 6px; margin: 8px 0;">
+                <button data-window="head" ${win.has_previous ? '' : 'disabled'}>开头</button>
+                <button data-window="previous" ${win.has_previous ? '' : 'disabled'}>上一页</button>
+                <button data-window="next" ${win.has_next ? '' : 'disabled'}>下一页</button>
+                <button data-window="tail" ${win.has_next ? '' : 'disabled'}>末尾</button>
+            </div>` : ''}
             <div class="image-info">
                 <div>文件大小: ${fileInfo.size_formatted}</div>
-                <div>行数: ${data.lines}</div>
+                <div>行数: ${lineInfo}</div>
+                ${paged ? `<div>位置: ${win.start} - ${win.end} 字节</div>` : ''}
                 <div>编码: ${data.encoding}</div>
                 <div>修改时间: ${fileInfo.modified}</div>
             </div>
         `;
+        
+        // 大文件分段查看：翻页时按窗口起止偏移请求相邻窗口
+        const queries = {
+            head: 'offset=0',
+            previous: `before=${win.start}`,
+            next: `offset=${win.end}`,
+            tail: 'tail=1'
+        };
+        container.querySelectorAll('.text-preview-nav button').forEach(btn => {
+            btn.addEventListener('click', () => this.loadTextWindow(fileInfo.path, queries[btn.dataset.window]));
+        });
+    }
+
+    async loadTextWindow(path, query) {
+        const previewContent = document.getElementById('preview-content');
+        try {
+            const response = await fetch(`/api/file-preview?path=${encodeURIComponent(path)}&${query}`);
+            if (!response.ok) {
+                const errorData = await response.json();
+                throw new Error(errorData.error || '预览失败');
+            }
+            const data = await response.json();
+            // 加载期间已切换预览文件则丢弃结果
+            if (!this.currentPreviewFile || this.currentPreviewFile.path !== path) {
+                return;
+            }
+            this.renderPreview(data);
+            const textPreview = previewContent.querySelector('.text-preview');
+            if (textPreview) {
+                textPreview.scrollTop = query.startsWith('before=') || query === 'tail=1' ? textPreview.scrollHeight : 0;
+            }
+        } catch (error) {
+            console.error('加载文件内容失败:', error);
+            this.showPreviewError(error.message);
+        }
     }
 
     renderImagePreview(data, container) {
@@ -0,0 +1,114 @@
+// 实时数据订阅：每个页面只保持一个到/api/stream/metrics的SSE连接，各模块按主题注册回调
+// 浏览器不支持EventSource或连接被服务端拒绝（如订阅数已满）时，按主题退回定时轮询对应接口
+
+// 各主题轮询时使用的接口和间隔（毫秒）
+const METRIC_STREAM_POLLING = {
+    'alerts': { url: '/api/check-alert', interval: 1000 },
+    'status': { url: '/api/system-status', interval: 30000 },
+    'performance': { url: '/api/performance-data', interval: 1000 }
+};
+
+class MetricStream {
+    constructor() {
+        this.handlers = {}; // {主题: [回调]}
+        this.pollers = {}; // {主题: 自定义轮询函数}
+        this.eventSource = null;
+        this.connectedTopics = '';
+        this.connectTimer = null;
+        this.pollTimers = {};
+        this.polling = !window.EventSource;
+    }
+
+    subscribe(topic, callback, poll = null) {
+        // poll：轮询模式下代替默认接口的函数（如需要携带参数的增量帧请求）
+        if (!this.handlers[topic]) {
+            this.handlers[topic] = [];
+        }
+        this.handlers[topic].push(callback);
+        if (poll) {
+            this.pollers[topic] = poll;
+        }
+        if (this.polling) {
+            this.startPolling(topic);
+        } else {
+            // 同一页面初始化时的多个订阅合并为一个连接
+            clearTimeout(this.connectTimer);
+            this.connectTimer = setTimeout(() => this.connect(), 0);
+        }
+    }
+
+    dispatch(topic, data) {
+        (this.handlers[topic] || []).forEach(callback => {
+            try {
+                callback(data);
+            } catch (error) {
+                console.error(`处理推送数据失败(${topic}):`, error);
+            }
+        });
+    }
+
+    connect() {
+        const topics = Object.keys(this.handlers).sort().join(',');
+        if (this.eventSource && topics === this.connectedTopics) {
+            return;
+        }
+        if (this.eventSource) {
+            this.eventSource.close();
+        }
+        this.connectedTopics = topics;
+        this.eventSource = new EventSource(`/api/stream/metrics?topics=${encodeURIComponent(topics)}`);
+        Object.keys(this.handlers).forEach(topic => {
+            this.eventSource.addEventListener(topic, (event) => {
+                try {
+                    this.dispatch(topic, JSON.parse(event.data));
+                } catch (parseError) {
+                    console.error('解析推送数据失败:', parseError);
+                }
+            });
+        });
+        this.eventSource.onerror = () => {
+            // 断线重连由浏览器自动处理，连接被拒绝时才改为轮询
+            if (this.eventSource && this.eventSource.readyState === EventSource.CLOSED) {
+                console.error('推送连接已关闭，改为定时轮询');
+                this.eventSource = null;
+                this.polling = true;
+                Object.keys(this.handlers).forEach(topic => this.startPolling(topic));
+            }
+        };
+    }
+
+    startPolling(topic) {
+        if (this.pollTimers[topic]) {
+            return;
+        }
+        const config = METRIC_STREAM_POLLING[topic] || { interval: 1000 };
+        const poll = this.pollers[topic] || (config.url ? () => this.fetchTopic(topic, config.url) : null);
+        if (!poll) {
+            console.error(`主题${topic}没有可用的轮询接口`);
+            return;
+        }
+        this.pollTimers[topic] = setInterval(poll, config.interval);
+    }
+
+    async fetchTopic(topic, url) {
+        try {
+            const response = await fetch(url, { headers: { 'Accept': 'application/json' } });
+            if (response.ok) {
+                this.dispatch(topic, await response.json());
+            }
+        } catch (error) {
+            console.error(`轮询${url}失败:`, error);
+        }
+    }
+
+    close() {
+        if (this.eventSource) {
+            this.eventSource.close();
+            this.eventSource = null;
+        }
+        Object.values(this.pollTimers).forEach(timer => clearInterval(timer));
+        this.pollTimers = {};
+    }
+}
+
+window.metricStream = new MetricStream();
@@ -786,8 +786,9 @@ class NetworkMonitor {
         // 每2秒更新一次数据
         this.updateInterval = setInterval(() => {
             this.loadNetworkStats();
-            this.loadAlertNotification();
         }, 2000);
+        // 报警通过页面共享的推送连接接收，不支持推送时由metricStream退回轮询
+        window.metricStream.subscribe('alerts', (alerts) => this.updateAlert(alerts));
         
         // 每10秒更新一次连接列表
         setInterval(() => {
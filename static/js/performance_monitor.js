@@ -101,6 +101,10 @@ class PerformanceMonitor {
         this.currentSection = 'overview';
         this.charts = {};
         this.updateInterval = null;
+        // 增量帧状态：当前帧号、动态数据和单独获取的静态信息
+        this.frameSeq = null;
+        this.frameData = null;
+        this.staticData = {};
         this.performanceData = {
             cpu: [],
             memory: [],
@@ -143,7 +147,8 @@ class PerformanceMonitor {
             console.log('初始主题应用完成');
         }, 100);
         
-        this.loadPerformanceData();
+        // 先取静态信息，首帧即可完整显示
+        this.loadStaticData().then(() => this.loadPerformanceData());
         console.log('首次数据加载完成');
         this.loadAlertNotification();
         console.log('首次状态加载成功');
@@ -611,49 +616,91 @@ class PerformanceMonitor {
 
     async loadPerformanceData() {
         try {
-            console.log('开始加载性能数据...', new Date().toLocaleTimeString());
-            
-            // 使用XMLHttpRequest替代fetch
+            // 携带已有帧号请求增量帧，服务端无法计算增量时返回完整帧
             const xhr = new XMLHttpRequest();
-            xhr.open('GET', '/api/performance-data', true);
+            xhr.open('GET', `/api/performance-data?since=${encodeURIComponent(this.frameSeq || '')}`, true);
             xhr.setRequestHeader('Accept', 'application/json');
-            xhr.setRequestHeader('Content-Type', 'application/json');
-            console.log('XMLHttpRequest已配置，准备发送请求...');
             
             xhr.onreadystatechange = () => {
                 if (xhr.readyState === 4) {
                     if (xhr.status === 200) {
                         try {
-                            const data = JSON.parse(xhr.responseText); // 解析JSON数据
-                            console.log('成功获取数据:', data);
-                            console.log('CPU核心数据:', data.cpu_percent);
-                            console.log('CPU平均使用率:', data.cpu_average);
-                            this.updatePerformanceData(data);
-                            this.updateUI(data);
+                            this.applyFrame(JSON.parse(xhr.responseText));
                         } catch (parseError) {
                             console.error('解析JSON失败:', parseError);
-                            //this.generateMockData();
                         }
                     } else {
                         console.error('HTTP错误:', xhr.status, xhr.statusText);
-                        //this.generateMockData();
                     }
                 }
             };
             
             xhr.onerror = () => {
                 console.error('网络错误');
-                //this.generateMockData();
             };
             
             xhr.send(); // 使用异步请求
         } catch (error) {
             console.error('加载性能数据失败:', error);
-            // 使用模拟数据继续运行
-            //this.generateMockData();
         }
     }
 
+    async loadStaticData() {
+        // CPU型号、网卡地址等静态信息不包含在增量帧中，支持ETag，未变化时浏览器直接使用缓存
+        try {
+            const response = await fetch('/api/performance-data/static');
+            if (response.ok) {
+                this.staticData = await response.json();
+            }
+        } catch (error) {
+            console.error('加载静态性能信息失败:', error);
+        }
+    }
+
+    applyFrame(frame) {
+        // 应用完整帧或增量帧；增量帧的基准不是当前帧时返回false，由调用方重新请求
+        if (frame.type === 'full') {
+            this.frameData = frame.data;
+            // 完整帧（关键帧）时顺带刷新静态信息
+            this.loadStaticData();
+        } else if (frame.type === 'delta' && this.frameData && frame.base === this.frameSeq) {
+            this.frameData = this.applyJsonPatch(this.frameData, frame.patch);
+        } else {
+            return false;
+        }
+        this.frameSeq = frame.seq;
+        const data = Object.assign({}, this.staticData, this.frameData);
+        this.updatePerformanceData(data);
+        this.updateUI(data);
+        return true;
+    }
+
+    applyJsonPatch(doc, ops) {
+        // 只需支持服务端生成的add/replace/remove操作（RFC 6902）
+        for (const op of ops) {
+            if (op.path === '') {
+                doc = op.value;
+                continue;
+            }
+            const keys = op.path.split('/').slice(1).map(k => k.replace(/~1/g, '/').replace(/~0/g, '~'));
+            const last = keys.pop();
+            let target = doc;
+            for (const key of keys) {
+                target = target[key];
+            }
+            if (op.op === 'remove') {
+                if (Array.isArray(target)) {
+                    target.splice(Number(last), 1);
+                } else {
+                    delete target[last];
+                }
+            } else {
+                target[last] = op.value;
+            }
+        }
+        return doc;
+    }
+
     generateMockData() {
         // 生成更真实的CPU核心数据 - 使用32核心匹配实际系统
         const coreCount = 32; // 匹配实际的32逻辑核心
@@ -1278,18 +1325,18 @@ updateNetworkInterfaces(interfaces) {
     }
 
     startAutoUpdate() {
-        // 每1秒自动更新一次，提高刷新频率
-        this.updateInterval = setInterval(() => {
-            this.loadPerformanceData();
-            this.loadAlertNotification();
-        }, 1000);
+        // 增量帧和报警通过页面共享的推送连接接收，不支持推送时由metricStream退回轮询
+        window.metricStream.subscribe('performance-delta', (frame) => {
+            // 错过了某一帧（如重连或推送被合并）时按当前帧号补齐
+            if (!this.applyFrame(frame)) {
+                this.loadPerformanceData();
+            }
+        }, () => this.loadPerformanceData());
+        window.metricStream.subscribe('alerts', (alerts) => this.updateAlert(alerts));
     }
 
     stopAutoUpdate() {
-        if (this.updateInterval) {
-            clearInterval(this.updateInterval);
-            this.updateInterval = null;
-        }
+        window.metricStream.close();
     }
 
     showNotification(message, type = 'info') {
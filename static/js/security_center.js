@@ -364,7 +364,8 @@ class SecurityCenter {
 
             const data = await response.json();
             
-            if (data.error) {
+            // 已有扫描正在进行时继续显示该扫描的进度
+            if (data.error && !(response.status === 409 && data.scan_id)) {
                 console.error('启动扫描失败:', data.error);
                 return;
             }
@@ -401,6 +402,8 @@ class SecurityCenter {
                     this.closeScanModal();
                     this.showScanResults(data);
                 }, 2000);
+            } else if (data.status === 'cancelled' || data.status === 'failed' || response.status === 404) {
+                this.closeScanModal();
             }
         } catch (error) {
             console.error('检查扫描状态失败:', error);
@@ -531,11 +534,17 @@ class SecurityCenter {
         // 显示确认对话框
         const confirmText = window.languageManager ? window.languageManager.translate('security-center-cancel-scan-confirm') : '确定要取消扫描吗？';
         if (confirm(confirmText)) {
+            const scanId = this.currentScanId;
             // 停止扫描并关闭弹窗
             this.closeScanModal();
             
-            // 可以在这里添加取消扫描的API调用
-            // 例如: fetch('/api/cancel-scan', { method: 'POST' });
+            fetch('/api/cancel-scan', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({ scan_id: scanId })
+            }).catch(error => console.error('取消扫描失败:', error));
         }
     }
 
@@ -926,10 +935,8 @@ class SecurityCenter {
         });
     }
     startAutoUpdate() {
-        // 每2秒自动更新一次，提高刷新频率
-        this.updateInterval = setInterval(() => {
-            this.loadAlertNotification();
-        }, 1000);
+        // 报警通过页面共享的推送连接接收，不支持推送时由metricStream退回轮询
+        window.metricStream.subscribe('alerts', (alerts) => this.updateAlert(alerts));
     }
     // 切换主题
     toggleTheme() {
@@ -393,11 +393,9 @@ class SettingsManager {
     }
 
     startAutoUpdate() {
-        // 每1秒自动更新一次，提高刷新频率
-        this.updateInterval = setInterval(() => {
-            this.loadPerformanceData();
-            this.loadAlertNotification();
-        }, 1000);
+        // 报警和系统状态通过页面共享的推送连接接收，不支持推送时由metricStream退回轮询
+        window.metricStream.subscribe('alerts', (alerts) => this.updateAlert(alerts));
+        window.metricStream.subscribe('status', (data) => this.updateSystemInfo(data));
     }
 
     async loadSettings() {
@@ -655,17 +653,19 @@ class SettingsManager {
         try {
             const response = await fetch('/api/system-status');
             if (response.ok) {
-                const data = await response.json();
-                
-                document.getElementById('system-version').textContent = `${data.system} ${data.version || ''}`;
-                document.getElementById('system-uptime').textContent = data.uptime || '未知';
-                document.getElementById('memory-usage').textContent = `${data.memory_percent}% (${data.memory_used}/${data.memory_total})`;
+                this.updateSystemInfo(await response.json());
             }
         } catch (error) {
             console.error('加载系统信息失败:', error);
         }
     }
 
+    updateSystemInfo(data) {
+        document.getElementById('system-version').textContent = `${data.system} ${data.version || ''}`;
+        document.getElementById('system-uptime').textContent = data.uptime || '未知';
+        document.getElementById('memory-usage').textContent = `${data.memory_percent}% (${data.memory_used}/${data.memory_total})`;
+    }
+
     updateConnectionTime() {
         // 模拟连接时间更新
         const now = new Date();
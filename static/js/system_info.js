@@ -572,11 +572,9 @@ class SystemInfoManager {
         });
     }
     startAutoUpdate() {
-        // 每1秒自动更新一次，提高刷新频率
-        this.updateInterval = setInterval(() => {
-            this.loadPerformanceData();
-            this.loadAlertNotification();
-        }, 1000);
+        // 性能数据和报警通过页面共享的推送连接接收，不支持推送时由metricStream退回轮询
+        window.metricStream.subscribe('performance', (data) => this.updateSwapDisplay(data));
+        window.metricStream.subscribe('alerts', (alerts) => this.updateAlert(alerts));
     }
 
     async loadSystemInfo() {
@@ -721,8 +721,9 @@ class TaskManager {
         // 每1秒自动更新一次
         this.updateInterval = setInterval(() => {
             this.loadProcesses();
-            this.loadAlertNotification();
         }, 1000);
+        // 报警通过页面共享的推送连接接收，不支持推送时由metricStream退回轮询
+        window.metricStream.subscribe('alerts', (alerts) => this.updateAlert(alerts));
     }
 
     stopAutoUpdate() {
@@ -350,10 +350,8 @@ updateThemeIcon() {
         });
     }
     startAutoUpdate() {
-        // 每1秒自动更新一次，提高刷新频率
-        this.updateInterval = setInterval(() => {
-            this.loadAlertNotification();
-        }, 1000);
+        // 报警通过页面共享的推送连接接收，不支持推送时由metricStream退回轮询
+        window.metricStream.subscribe('alerts', (alerts) => this.updateAlert(alerts));
     }
 
     async loadTerminalInfo() {